@@ -0,0 +1,146 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+import logging
+
+from metrics import LLM_QUEUE_SECONDS, LLM_SHED
+
+logger = logging.getLogger(__name__)
+
+# Request classes sharing the LLM, highest priority first: live phone turns,
+# text chat API requests, and background work such as history summaries
+VOICE = "voice"
+CHAT = "chat"
+BACKGROUND = "background"
+PRIORITIES = (VOICE, CHAT, BACKGROUND)
+
+class Overloaded(Exception):
+    """No LLM capacity for a request in time; the caller should back off and retry"""
+
+    def __init__(self, priority: str, reason: str, retry_after: int):
+        super().__init__(f"LLM capacity exhausted for {priority} requests ({reason})")
+        self.priority = priority
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """Bounded, prioritized admission of requests to the LLM
+
+    At most `capacity` requests run at once, and each class at most its own
+    limit. By default chat gets 5/8 of the capacity and background work
+    1/8, so together they leave a quarter of the slots to voice at all
+    times. When a slot frees up it goes to the oldest waiter of the highest
+    priority class that is under its limit. Requests are shed with
+    Overloaded when their class queue is full or they have waited longer
+    than the class allows.
+    """
+
+    def __init__(
+        self,
+        capacity: Optional[int] = None,
+        limits: Optional[Dict[str, int]] = None,
+        max_queue: Optional[Dict[str, int]] = None,
+        max_wait: Optional[Dict[str, float]] = None,
+    ):
+        self.capacity = capacity or int(os.getenv("LLM_CONCURRENCY", "32"))
+        self.limits = limits or {
+            VOICE: self.capacity,
+            CHAT: int(os.getenv("LLM_CHAT_CONCURRENCY", str(max(1, self.capacity * 5 // 8)))),
+            BACKGROUND: int(os.getenv("LLM_BACKGROUND_CONCURRENCY", str(max(1, self.capacity // 8)))),
+        }
+        if self.limits[CHAT] + self.limits[BACKGROUND] >= self.capacity:
+            logger.warning(
+                f"Chat ({self.limits[CHAT]}) and background ({self.limits[BACKGROUND]}) LLM limits "
+                f"can fill all {self.capacity} slots, leaving none guaranteed for voice"
+            )
+        self.max_queue = max_queue or {
+            VOICE: int(os.getenv("LLM_VOICE_QUEUE_MAX", "1000")),
+            CHAT: int(os.getenv("LLM_CHAT_QUEUE_MAX", "64")),
+            BACKGROUND: int(os.getenv("LLM_BACKGROUND_QUEUE_MAX", "256")),
+        }
+        self.max_wait = max_wait or {
+            VOICE: float(os.getenv("LLM_VOICE_QUEUE_WAIT", "10")),
+            CHAT: float(os.getenv("LLM_CHAT_QUEUE_WAIT", "5")),
+            BACKGROUND: float(os.getenv("LLM_BACKGROUND_QUEUE_WAIT", "60")),
+        }
+        self.active = 0
+        self.in_flight = {priority: 0 for priority in PRIORITIES}
+        self._queues: Dict[str, Deque[asyncio.Future]] = {priority: deque() for priority in PRIORITIES}
+
+    def _has_room(self, priority: str) -> bool:
+        return self.active < self.capacity and self.in_flight[priority] < self.limits[priority]
+
+    def _grant(self, priority: str):
+        self.active += 1
+        self.in_flight[priority] += 1
+
+    async def acquire(self, priority: str):
+        """Wait for a slot for this class, raising Overloaded if it cannot get one in time"""
+        queue = self._queues[priority]
+        higher = PRIORITIES[:PRIORITIES.index(priority)]
+        # Take a free slot unless someone of the same class is already waiting, or
+        # of a higher class that is under its own limit and could take the slot
+        waiting = queue or any(self._queues[other] and self.in_flight[other] < self.limits[other] for other in higher)
+        if self._has_room(priority) and not waiting:
+            self._grant(priority)
+            LLM_QUEUE_SECONDS.observe(0.0, priority)
+            return
+        if len(queue) >= self.max_queue[priority]:
+            self._shed(priority, "queue_full")
+
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.max_wait[priority])
+        except asyncio.TimeoutError:
+            self._forget(queue, waiter)
+            self._shed(priority, "queue_timeout")
+        except asyncio.CancelledError:
+            self._forget(queue, waiter)
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as the caller gave up
+                self.release(priority)
+            raise
+        LLM_QUEUE_SECONDS.observe(time.perf_counter() - started, priority)
+
+    def release(self, priority: str):
+        """Free a slot and hand it to the next eligible waiter"""
+        self.active -= 1
+        self.in_flight[priority] -= 1
+        for candidate in PRIORITIES:
+            queue = self._queues[candidate]
+            while queue and self._has_room(candidate):
+                waiter = queue.popleft()
+                if waiter.done():
+                    continue
+                self._grant(candidate)
+                waiter.set_result(None)
+            if self.active >= self.capacity:
+                return
+
+    def _forget(self, queue: Deque[asyncio.Future], waiter: asyncio.Future):
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            pass
+
+    def _shed(self, priority: str, reason: str):
+        LLM_SHED.inc(priority, reason)
+        logger.info(f"Shedding {priority} LLM request: {reason} ({self.in_flight[priority]} running, {len(self._queues[priority])} queued)")
+        raise Overloaded(priority, reason, retry_after=max(1, math.ceil(self.max_wait[priority])))
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Running and queued requests per class"""
+        return {
+            priority: {
+                "in_flight": self.in_flight[priority],
+                "queued": len(self._queues[priority]),
+                "limit": self.limits[priority],
+            }
+            for priority in PRIORITIES
+        }
@@ -0,0 +1,71 @@
+import argparse
+import asyncio
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Concurrent batch runner for chat turns. Items are grouped by key (the lead
+# id) so each lead's turns run one after another in submission order, while
+# up to `concurrency` leads are worked on at once. Results are yielded as
+# they complete rather than when the whole batch is done.
+
+async def run_batch(
+    items: Sequence[Any],
+    handle: Callable[[Any], Awaitable[Any]],
+    key: Callable[[Any], str],
+    concurrency: int,
+) -> AsyncIterator[Tuple[int, Any, Optional[Exception]]]:
+    """Yield (index, result, error) for every item, in completion order"""
+    if concurrency < 1:
+        # No worker would ever pick up an item
+        raise ValueError(f"concurrency must be at least 1, got {concurrency}")
+    by_key: Dict[str, List[int]] = {}
+    for index, item in enumerate(items):
+        by_key.setdefault(key(item), []).append(index)
+    pending: asyncio.Queue = asyncio.Queue()
+    for indexes in by_key.values():
+        pending.put_nowait(indexes)
+    results: asyncio.Queue = asyncio.Queue()
+
+    async def worker():
+        while not pending.empty():
+            for index in pending.get_nowait():
+                try:
+                    results.put_nowait((index, await handle(items[index]), None))
+                except Exception as e:
+                    results.put_nowait((index, None, e))
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(concurrency, len(by_key)))]
+    try:
+        for _ in range(len(items)):
+            yield await results.get()
+    finally:
+        # The consumer may stop early (e.g. the client disconnected)
+        for task in workers:
+            task.cancel()
+
+async def run_file(path: str, output: str, concurrency: Optional[int]):
+    """Run a JSONL file of {"lead_id", "message"} items through the app, writing JSONL results"""
+    import main
+    from main import ConversationMessage
+
+    with open(path) as f:
+        messages = [ConversationMessage(**json.loads(line)) for line in f if line.strip()]
+    with open(output, "w") as out:
+        async for result in main.chat_batch(messages, concurrency):
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+
+def positive_int(value: str) -> int:
+    """argparse type for counts that must be at least 1, like the HTTP batch request's"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of lead messages in one batch")
+    parser.add_argument("path", help='JSONL file with one {"lead_id": ..., "message": ...} per line')
+    parser.add_argument("--output", default="/dev/stdout", help="Where to write one JSON result per line")
+    parser.add_argument("--concurrency", type=positive_int, default=None)
+    args = parser.parse_args()
+    asyncio.run(run_file(args.path, args.output, args.concurrency))
@@ -0,0 +1,116 @@
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+
+from admission import CHAT, VOICE, Overloaded
+from fake_llm_server import FakeLLMServer
+
+# Admission control benchmark: live voice turns and a flood of text chat
+# requests share one LLM that serves only a few requests at a time (the
+# stand-in server's capacity). Without admission control every request goes
+# straight to the model and voice turns wait behind the chat backlog; with it
+# voice turns are admitted first and excess chat requests are shed with 429s.
+
+LLM_PORT = 8776
+MESSAGES = [{"role": "user", "content": "Which printer suits dental models?"}]
+
+def make_client(base_url: str, **settings):
+    """LLMClient configured through the same environment variables as the app"""
+    env = {
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": base_url,
+        "LLM_HEDGE_PERCENTILE": "0",
+        **{key: str(value) for key, value in settings.items()},
+    }
+    previous = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    try:
+        from llm_client import LLMClient
+
+        return LLMClient()
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+async def run(client, args):
+    voice_latencies, voice_failures = [], 0
+    chat_latencies, chat_shed, chat_failures = [], 0, 0
+    stop_at = time.perf_counter() + args.seconds
+
+    async def caller():
+        nonlocal voice_failures
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                await client.complete(MESSAGES, max_tokens=50, deadline=args.voice_deadline, priority=VOICE)
+                voice_latencies.append(time.perf_counter() - started)
+            except Exception:
+                voice_failures += 1
+            await asyncio.sleep(args.think_time)
+
+    async def chat():
+        nonlocal chat_shed, chat_failures
+        started = time.perf_counter()
+        try:
+            await client.complete(MESSAGES, max_tokens=50, priority=CHAT)
+            chat_latencies.append(time.perf_counter() - started)
+        except Overloaded:
+            chat_shed += 1
+        except Exception:
+            chat_failures += 1
+
+    async def chat_traffic():
+        tasks = []
+        while time.perf_counter() < stop_at:
+            tasks.append(asyncio.create_task(chat()))
+            await asyncio.sleep(1 / args.chat_rate)
+        await asyncio.gather(*tasks)
+
+    await asyncio.gather(chat_traffic(), *(caller() for _ in range(args.callers)))
+    await client.aclose()
+    return voice_latencies, voice_failures, chat_latencies, chat_shed, chat_failures
+
+def report(name: str, results):
+    voice, voice_failures, chat, chat_shed, chat_failures = results
+    voice_cuts = statistics.quantiles(voice, n=100) if len(voice) > 1 else [0.0] * 99
+    chat_p50 = statistics.median(chat) if chat else 0.0
+    print(
+        f"{name:<20} {len(voice):>6} {voice_cuts[49] * 1000:>8.0f} {voice_cuts[94] * 1000:>8.0f} {max(voice, default=0) * 1000:>8.0f} "
+        f"{voice_failures:>7} {len(chat):>7} {chat_p50 * 1000:>8.0f} {chat_shed:>6} {chat_failures:>7}"
+    )
+
+async def main(args):
+    logging.getLogger("admission").setLevel(logging.ERROR)
+    print(
+        f"🧪 LLM serving {args.capacity} at a time ({args.latency * 1000:.0f} ms each), {args.callers} callers, "
+        f"{args.chat_rate:.0f} chats/s for {args.seconds:.0f}s"
+    )
+    print(
+        f"{'admission':<20} {'turns':>6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'failed':>7} "
+        f"{'chats':>7} {'p50 ms':>8} {'shed':>6} {'failed':>7}"
+    )
+    with FakeLLMServer(port=LLM_PORT, latency=args.latency, token_interval=0.0, capacity=args.capacity) as llm:
+        report("unlimited", await run(make_client(llm.base_url, LLM_CONCURRENCY=100000, LLM_CHAT_CONCURRENCY=100000, LLM_CHAT_QUEUE_MAX=100000), args))
+        report(f"{args.capacity} slots, priority", await run(make_client(
+            llm.base_url,
+            LLM_CONCURRENCY=args.capacity,
+            LLM_CHAT_QUEUE_MAX=args.capacity * 4,
+            LLM_CHAT_QUEUE_WAIT=2,
+        ), args))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLM admission control benchmark")
+    parser.add_argument("--capacity", type=int, default=8, help="Requests the stand-in LLM serves at once")
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--callers", type=int, default=6)
+    parser.add_argument("--think-time", type=float, default=0.5)
+    parser.add_argument("--chat-rate", type=float, default=50, help="Chat requests per second")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--voice-deadline", type=float, default=8)
+    asyncio.run(main(parser.parse_args()))
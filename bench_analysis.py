@@ -0,0 +1,144 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from fake_llm_server import FakeLLMServer
+from fake_twilio import WebhookCallDriver
+
+# Post-call analysis benchmark: throughput and queue lag of analyzing a
+# backlog of finished calls at several batch sizes, then live voice turn
+# latency with and without the pipeline working through a backlog at the
+# same time. Runs the app in-process against a stand-in LLM that serves a
+# limited number of requests at once, so analysis and callers compete for it.
+
+LLM_PORT = 8779
+QUESTIONS = [
+    "What printers do you have for dental labs?",
+    "How much does the Form 4 cost?",
+    "Can you send me a quote?",
+]
+
+def seed_calls(store, count: int, prefix: str):
+    """Finished calls of six turns each; returns (call_sid, lead_id, start, end) tuples"""
+    calls = []
+    for index in range(count):
+        lead_id = f"{prefix}_{index:05d}"
+        store.extend(lead_id, [
+            (role, f"{role} turn {turn} about the Form 4, dental resins and a budget of about six thousand dollars")
+            for turn in range(3)
+            for role in ("user", "assistant")
+        ])
+        calls.append((f"CA{prefix}{index:05d}", lead_id, 0, store.length(lead_id)))
+    return calls
+
+async def drain(analyzer, calls):
+    """Submit every call and wait until all are analyzed; returns (seconds, lags)"""
+    started = time.perf_counter()
+    for call in calls:
+        await analyzer.submit(*call)
+    while True:
+        counts = (await analyzer.stats())["calls"]
+        if not counts["pending"] and not counts["running"]:
+            break
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    lags = [row["analyzed_at"] - row["queued_at"] for row in (analyzer.store.get(call[0]) for call in calls)]
+    return elapsed, lags
+
+async def run_calls(client, run: str, callers: int, calls_each: int, status_callback=None):
+    """Simulated phone calls through the voice webhooks; returns every turn's latency"""
+    driver = WebhookCallDriver(client, status_callback=status_callback)
+    turns = []
+
+    async def caller(index: int):
+        for call in range(calls_each):
+            # Distinct questions, so no turn is answered from the response cache
+            questions = [f"{question} This is caller {index}, {run} call {call}." for question in QUESTIONS]
+            result = await driver.play_call(f"+1666{index:07d}", questions)
+            turns.extend(result["turns"])
+
+    # The voice webhooks print a trace of every turn
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(caller(index) for index in range(callers)))
+    return turns
+
+def turn_line(name: str, turns):
+    cuts = statistics.quantiles(turns, n=100)
+    print(f"{name:<30} {len(turns):>6} {cuts[49] * 1000:>8.0f} {cuts[94] * 1000:>8.0f} {cuts[98] * 1000:>8.0f}")
+
+async def main(args):
+    workdir = tempfile.mkdtemp()
+    with FakeLLMServer(port=LLM_PORT, latency=args.latency, token_interval=0.002, capacity=args.capacity) as llm:
+        os.environ.update(
+            OPENAI_API_KEY="bench",
+            OPENAI_BASE_URL=llm.base_url,
+            LEADS_DB_PATH=os.path.join(workdir, "leads.db"),
+            SESSION_DB_PATH=os.path.join(workdir, "sessions.db"),
+            ANALYSIS_DB_PATH=os.path.join(workdir, "analysis.db"),
+            LLM_CONCURRENCY=str(args.capacity),
+            LLM_HEDGE_PERCENTILE="0",
+        )
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import httpx
+        import main as app_module
+        from call_analysis import AnalysisStore, CallAnalyzer
+
+        print(f"🧪 LLM serving {args.capacity} at a time, {args.latency * 1000:.0f} ms per request")
+        print(f"\n{args.calls} finished calls, {args.workers} workers")
+        print(f"{'batch size':<12} {'seconds':>8} {'calls/s':>8} {'LLM reqs':>9} {'lag p50':>8} {'lag p95':>8}")
+        for batch_size in args.batch_sizes:
+            store = AnalysisStore(os.path.join(workdir, f"analysis_{batch_size}.db"))
+            analyzer = CallAnalyzer(
+                app_module.conversation_store, app_module.llm_client, store,
+                workers=args.workers, batch_size=batch_size, batch_wait=0.5,
+            )
+            calls = seed_calls(app_module.conversation_store, args.calls, f"b{batch_size}")
+            analyzer.start()
+            elapsed, lags = await drain(analyzer, calls)
+            await analyzer.stop()
+            cuts = statistics.quantiles(lags, n=100)
+            requests = -(-args.calls // batch_size)
+            print(
+                f"{batch_size:<12} {elapsed:>8.1f} {args.calls / elapsed:>8.1f} {requests:>9} "
+                f"{cuts[49]:>7.1f}s {cuts[94]:>7.1f}s"
+            )
+
+        for index in range(args.callers):
+            app_module.lead_store.upsert({
+                "id": f"caller_{index:04d}", "name": f"Caller {index}", "email": f"caller{index}@example.com",
+                "phone": f"+1666{index:07d}", "company": "Acme Dental", "inquiry": "Dental resin printers",
+            })
+        print(f"\n{args.callers} callers x {args.calls_each} calls x {len(QUESTIONS)} turns")
+        print(f"{'pipeline':<30} {'turns':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            turn_line("off", await run_calls(client, "first", args.callers, args.calls_each))
+
+            analyzer = app_module.call_analyzer
+            analyzer.start()
+            for call in seed_calls(app_module.conversation_store, args.backlog, "backlog"):
+                await analyzer.submit(*call)
+            turns = await run_calls(client, "second", args.callers, args.calls_each, status_callback="/voice/status")
+            turn_line(f"on, {args.backlog} call backlog", turns)
+            stats = await analyzer.stats()
+            print(f"   analyzed meanwhile: {stats['calls']['done']}, still queued: {stats['queued']}")
+            await analyzer.stop()
+        await app_module.llm_client.aclose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Post-call analysis pipeline benchmark")
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--capacity", type=int, default=8, help="Requests the stand-in LLM serves at once")
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--callers", type=int, default=6)
+    parser.add_argument("--calls-each", type=int, default=4)
+    parser.add_argument("--backlog", type=int, default=500, help="Finished calls queued before the callers start")
+    asyncio.run(main(parser.parse_args()))
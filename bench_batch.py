@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+from fake_llm_server import FakeLLMServer
+
+# Batch chat benchmark: answering a nightly follow-up batch one
+# /conversation/chat request at a time versus one /conversation/chat/batch
+# request at increasing concurrency, against the stand-in LLM. Also checks
+# that every lead's turns were recorded in submission order. The app runs
+# in-process on temporary lead and session databases.
+
+LLM_PORT = 8778
+
+async def sequential(client, items):
+    for item in items:
+        response = await client.post("/conversation/chat", json=item)
+        response.raise_for_status()
+
+async def batched(client, items, concurrency: int) -> int:
+    failed = 0
+    async with client.stream("POST", "/conversation/chat/batch", json={"messages": items, "concurrency": concurrency}) as response:
+        async for line in response.aiter_lines():
+            if line and "error" in json.loads(line):
+                failed += 1
+    return failed
+
+def in_order(store, items) -> bool:
+    expected = {}
+    for item in items:
+        expected.setdefault(item["lead_id"], []).append(item["message"])
+    for lead_id, messages in expected.items():
+        recorded = [message["content"] for message in store.transcript(lead_id) if message["role"] == "user"]
+        if recorded[-len(messages):] != messages:
+            return False
+    return True
+
+async def main(args):
+    workdir = tempfile.mkdtemp()
+    with FakeLLMServer(port=LLM_PORT, latency=args.latency, token_interval=0.0) as llm:
+        os.environ.update(
+            OPENAI_API_KEY="bench",
+            OPENAI_BASE_URL=llm.base_url,
+            LEADS_DB_PATH=os.path.join(workdir, "leads.db"),
+            SESSION_DB_PATH=os.path.join(workdir, "sessions.db"),
+            # Let the batch, not admission control, set the parallelism
+            LLM_CONCURRENCY="256",
+            LLM_CHAT_CONCURRENCY="256",
+            LLM_BACKGROUND_CONCURRENCY="256",
+            LLM_HEDGE_PERCENTILE="0",
+        )
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import httpx
+        import main as app_module
+
+        for lead in range(args.leads):
+            app_module.lead_store.upsert({
+                "id": f"batch_{lead:04d}", "name": f"Lead {lead}", "email": f"lead{lead}@example.com",
+                "phone": f"+1555{lead:07d}", "company": "Acme Dental", "inquiry": "Dental resin printers",
+            })
+
+        def make_items(run: str):
+            return [
+                {"lead_id": f"batch_{lead:04d}", "message": f"{run} follow-up {turn} for lead {lead}"}
+                for turn in range(args.turns)
+                for lead in range(args.leads)
+            ]
+
+        print(f"🧪 {args.leads} leads x {args.turns} turns, LLM latency {args.latency * 1000:.0f} ms")
+        print(f"{'mode':<22} {'seconds':>8} {'turns/s':>8} {'failed':>7} {'ordered':>8}")
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            items = make_items("sequential")
+            started = time.perf_counter()
+            await sequential(client, items)
+            elapsed = time.perf_counter() - started
+            ordered = in_order(app_module.conversation_store, items)
+            print(f"{'one request per turn':<22} {elapsed:>8.1f} {len(items) / elapsed:>8.1f} {0:>7} {'✅' if ordered else '❌':>7}")
+            for concurrency in args.concurrency:
+                items = make_items(f"batch-{concurrency}")
+                started = time.perf_counter()
+                failed = await batched(client, items, concurrency)
+                elapsed = time.perf_counter() - started
+                ordered = in_order(app_module.conversation_store, items)
+                print(f"{f'batch, concurrency {concurrency}':<22} {elapsed:>8.1f} {len(items) / elapsed:>8.1f} {failed:>7} {'✅' if ordered else '❌':>7}")
+        await app_module.llm_client.aclose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch chat throughput benchmark")
+    parser.add_argument("--leads", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 100])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,73 @@
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+
+from fake_twilio import FakeTwilioServer
+
+# Campaign dialer run against the local fake Twilio REST API: imports a batch
+# of leads, dials them through POST /campaigns with a CPS cap and injected
+# failures, pauses and resumes mid-run, and checks the carrier-side rate.
+
+LEADS = 200
+CALLS_PER_SECOND = 50
+CONCURRENCY = 20
+FAILURE_RATE = 0.2
+PORT = 8767
+
+data_dir = tempfile.mkdtemp()
+os.environ.update({
+    "TWILIO_ACCOUNT_SID": "ACfake",
+    "TWILIO_AUTH_TOKEN": "fake",
+    "TWILIO_PHONE_NUMBER": "+15550000000",
+    "TWILIO_API_BASE_URL": f"http://127.0.0.1:{PORT}",
+    "WEBHOOK_BASE_URL": "https://example.invalid",
+    "LEADS_DB_PATH": os.path.join(data_dir, "leads.db"),
+    "SESSION_DB_PATH": os.path.join(data_dir, "sessions.db"),
+    "CAMPAIGN_RETRY_BACKOFF": "0.2",
+})
+
+import main
+
+async def run():
+    main.lead_store.upsert_many(
+        {"id": f"bench_{i:05d}", "name": f"Lead {i}", "phone": f"+1617555{i:04d}", "company": "Bench Co"}
+        for i in range(LEADS)
+    )
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post("/campaigns", json={
+            "company": "Bench Co",
+            "concurrency": CONCURRENCY,
+            "calls_per_second": CALLS_PER_SECOND,
+        })
+        campaign_id = response.json()["campaign_id"]
+        started = time.perf_counter()
+
+        await asyncio.sleep(1)
+        paused = (await client.post(f"/campaigns/{campaign_id}/pause")).json()
+        await asyncio.sleep(1)
+        still_paused = (await client.get(f"/campaigns/{campaign_id}")).json()
+        print(f"⏸️  Paused at {paused['completed']}/{paused['total_leads']}, after 1s paused: {still_paused['completed']}")
+        await client.post(f"/campaigns/{campaign_id}/resume")
+
+        while True:
+            progress = (await client.get(f"/campaigns/{campaign_id}")).json()
+            if progress["status"] == "completed":
+                break
+            await asyncio.sleep(0.2)
+        elapsed = time.perf_counter() - started
+
+    call_log = httpx.get(f"http://127.0.0.1:{PORT}/calls").json()
+    print(f"✅ Campaign finished in {elapsed:.1f}s (including 1s paused)")
+    print(f"📞 {progress['succeeded']} initiated, {progress['failed']} failed, "
+          f"{progress['attempts']} attempts, {progress['retries']} retries")
+    print(f"📊 Peak calls started in one second at the fake carrier: "
+          f"{call_log['peak_calls_per_second']} (cap {CALLS_PER_SECOND})")
+
+if __name__ == "__main__":
+    print(f"🧪 Campaign dialer: {LEADS} leads, {CALLS_PER_SECOND} CPS, {FAILURE_RATE:.0%} injected failures")
+    with FakeTwilioServer(port=PORT, failure_rate=FAILURE_RATE):
+        asyncio.run(run())
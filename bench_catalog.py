@@ -0,0 +1,93 @@
+import random
+import statistics
+import time
+
+from context_window import count_tokens
+from prompts import CUSTOMER_SECTION, ProductCatalog
+
+# Catalog retrieval benchmark: prompt size and prompt-building latency as the
+# product catalog grows, inlining every product versus retrieving the top-k
+# per turn from the BM25 index. Catalogs are synthetic mixes of printers,
+# resins, service plans and accessories; queries are typical caller turns.
+
+SIZES = [3, 30, 300, 3000]
+TOP_K = 5
+QUERIES = [
+    "Looking for a printer for dental models. Which resin works for surgical guides?",
+    "We make jewelry prototypes, what is the most accurate printer?",
+    "Do you have a service plan that covers on-site repairs?",
+    "We need durable nylon parts for an automotive production line",
+    "What does a large-format printer cost and how big is the build volume?",
+    "Is there a biocompatible resin for hearing aid shells?",
+    "Can we get a spare resin tank and build platform?",
+    "How fast can the printer make engineering prototypes?",
+]
+FAMILIES = {
+    "printer": ["desktop SLA printer", "large-format SLA printer", "industrial SLS printer", "benchtop SLS printer"],
+    "resin": ["dental resin", "engineering resin", "castable jewelry resin", "biocompatible resin", "flexible resin", "tough resin"],
+    "service": ["service plan", "on-site repair plan", "training package", "extended warranty"],
+    "accessory": ["resin tank", "build platform", "wash station", "cure station", "powder sifter"],
+}
+USES = [
+    "dental models", "surgical guides", "jewelry prototypes", "automotive production parts",
+    "engineering prototypes", "hearing aid shells", "nylon end-use parts", "education labs",
+    "medical devices", "consumer product design", "tooling and jigs", "dentures and crowns",
+]
+
+def synthetic_catalog(size: int, seed: int = 7):
+    rng = random.Random(seed)
+    products = {}
+    for number in range(size):
+        family = rng.choice(list(FAMILIES))
+        kind = rng.choice(FAMILIES[family])
+        uses = rng.sample(USES, 2)
+        products[f"{family}_{number:05d}"] = {
+            "name": f"{kind.title()} {number}",
+            "price": rng.randint(50, 60000),
+            "description": (
+                f"{kind.capitalize()} suited to {uses[0]} and {uses[1]}, "
+                f"with {rng.choice(['high accuracy', 'fast print speed', 'low cost per part', 'large build volume'])}."
+            ),
+        }
+    return products
+
+def prompt_for(catalog: ProductCatalog, query: str) -> str:
+    """System prompt plus retrieved products, as build_messages assembles them"""
+    prompt = catalog.prompt_prefix + CUSTOMER_SECTION.format(name="Pat", company="Acme Dental", inquiry=query)
+    return prompt + catalog.relevant_products(query)
+
+def measure(catalog: ProductCatalog):
+    tokens = [count_tokens(prompt_for(catalog, query)) for query in QUERIES]
+    timings = []
+    for _ in range(20):
+        for query in QUERIES:
+            started = time.perf_counter()
+            prompt_for(catalog, query)
+            timings.append(time.perf_counter() - started)
+    return statistics.mean(tokens), statistics.median(timings) * 1e6
+
+if __name__ == "__main__":
+    print(f"🧪 Prompt size and build time vs catalog size (top-k {TOP_K})")
+    print(
+        f"{'products':>9} {'inline tokens':>14} {'top-k tokens':>13} {'reduction':>10} "
+        f"{'inline (us)':>12} {'top-k (us)':>11} {'index build (ms)':>17}"
+    )
+    for size in SIZES:
+        products = synthetic_catalog(size)
+        inline = ProductCatalog(products, inline_max=size, top_k=TOP_K)
+        started = time.perf_counter()
+        retrieval = ProductCatalog(products, inline_max=0, top_k=TOP_K)
+        build_ms = (time.perf_counter() - started) * 1000
+        inline_tokens, inline_us = measure(inline)
+        retrieval_tokens, retrieval_us = measure(retrieval)
+        print(
+            f"{size:>9} {inline_tokens:>14.0f} {retrieval_tokens:>13.0f} {inline_tokens / retrieval_tokens:>9.1f}x "
+            f"{inline_us:>12.1f} {retrieval_us:>11.1f} {build_ms:>17.1f}"
+        )
+
+    catalog = ProductCatalog(synthetic_catalog(3000), inline_max=0, top_k=TOP_K)
+    started = time.perf_counter()
+    for number in range(100):
+        catalog.upsert_product(f"resin_new_{number}", {"name": f"Ceramic Resin {number}", "price": 299, "description": "Ceramic-filled resin for heat-resistant tooling."})
+    print(f"\n🔁 Incremental update: {(time.perf_counter() - started) * 10:.2f} ms per product upsert at 3000 products")
+    print(f"🔍 'ceramic tooling resin' now retrieves: {catalog.index.search('ceramic tooling resin', 1)[0][0]}")
@@ -0,0 +1,124 @@
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from fake_llm_server import FakeLLMServer, wait_until_listening
+
+# Webhook latency benchmark: plays N simultaneous /voice/process-speech turns
+# against a single app worker backed by the stand-in LLM server.
+#   before = the old blocking completion call inside the async endpoint
+#   after  = the pooled async LLM client
+
+LEVELS = [1, 10, 50]
+ROUNDS = 3
+LLM_LATENCY = 0.2
+LLM_PORT = 8765
+APP_PORT = 8766
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def serve(mode: str):
+    """Run one app worker, optionally with the previous blocking LLM call"""
+    import uvicorn
+    from openai import OpenAI
+
+    import main
+    from llm_client import LLMClient
+
+    class BlockingLLMClient(LLMClient):
+        """Reproduces the previous synchronous completion call"""
+
+        def __init__(self):
+            super().__init__()
+            self.sync_client = OpenAI(api_key=self.api_key, base_url=self.base_url, http_client=httpx.Client())
+
+        async def complete(self, messages, max_tokens=200, temperature=0.7, deadline=None, priority=None, response_format=None):
+            response = self.sync_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+            )
+            return response.choices[0].message.content
+
+    if mode == "before":
+        main.llm_client = BlockingLLMClient()
+    uvicorn.run(main.app, host="127.0.0.1", port=APP_PORT, log_level="warning")
+
+async def run_level(client: httpx.AsyncClient, concurrency: int):
+    """Fire `concurrency` simultaneous webhooks, ROUNDS times"""
+    latencies = []
+
+    async def one_call(round_number: int, call_number: int):
+        started = time.perf_counter()
+        # A new question every round, so no turn is answered from the response cache
+        response = await client.post(
+            "/voice/process-speech",
+            data={
+                "lead_id": "lead_001",
+                "SpeechResult": f"What does the Form 4 cost? ({concurrency} calls, round {round_number}, call {call_number})",
+            },
+        )
+        response.raise_for_status()
+        if "technical difficulties" in response.text:
+            # The endpoint answers errors with an apology and HTTP 200; timing those measures nothing
+            raise RuntimeError(f"Turn failed, the app answered with its error TwiML: {response.text}")
+        latencies.append(time.perf_counter() - started)
+
+    for round_number in range(ROUNDS):
+        await asyncio.gather(*(one_call(round_number, i) for i in range(concurrency)))
+    return latencies
+
+async def drive():
+    results = {}
+    limits = httpx.Limits(max_connections=max(LEVELS))
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", limits=limits, timeout=60) as client:
+        for concurrency in LEVELS:
+            results[concurrency] = await run_level(client, concurrency)
+    return results
+
+def run_mode(mode: str):
+    env = dict(os.environ, OPENAI_API_KEY="bench", OPENAI_BASE_URL=f"http://127.0.0.1:{LLM_PORT}/v1")
+    process = subprocess.Popen(
+        [sys.executable, __file__, "--serve", mode],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_listening(f"http://127.0.0.1:{APP_PORT}/", process)
+        return asyncio.run(drive())
+    finally:
+        process.terminate()
+        process.wait()
+
+def report(name: str, results):
+    print(f"\n📊 {name}")
+    print(f"{'calls':>6} {'p50 (ms)':>10} {'p99 (ms)':>10} {'mean (ms)':>10}")
+    for concurrency, latencies in results.items():
+        print(
+            f"{concurrency:>6} {percentile(latencies, 50) * 1000:>10.0f} "
+            f"{percentile(latencies, 99) * 1000:>10.0f} {statistics.mean(latencies) * 1000:>10.0f}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Webhook concurrency benchmark")
+    parser.add_argument("--serve", choices=["before", "after"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+    else:
+        print(f"🧪 Webhook concurrency benchmark (LLM latency {LLM_LATENCY * 1000:.0f} ms)")
+        with FakeLLMServer(port=LLM_PORT, latency=LLM_LATENCY):
+            report("Before: blocking completion call", run_mode("before"))
+            report("After: pooled async LLM client", run_mode("after"))
@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+from typing import Dict
+
+from fake_llm_server import FakeLLMServer
+from metrics import LLM_HEDGES, LLM_REQUESTS
+
+# LLM resilience benchmark against local stand-in servers: completion latency
+# with and without hedging when the model has a long latency tail, and
+# success rate when the primary backend fails or slows down and a fallback
+# backend is configured. Requests per completion shows what hedging and
+# failover cost in extra load.
+
+PRIMARY_PORT = 8771
+FALLBACK_PORT = 8772
+MESSAGES = [{"role": "user", "content": "Which printer suits dental models?"}]
+
+def make_client(primary: FakeLLMServer, fallback: FakeLLMServer = None, **settings):
+    """LLMClient configured through the same environment variables as the app"""
+    env = {
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": primary.base_url,
+        "LLM_MODEL": "primary",
+        "LLM_FALLBACKS": f"fallback@{fallback.base_url}" if fallback else "",
+        **{key: str(value) for key, value in settings.items()},
+    }
+    previous = {key: os.environ.get(key) for key in env}
+    os.environ.update(env)
+    try:
+        from llm_client import LLMClient
+
+        return LLMClient()
+    finally:
+        for key, value in previous.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+def counter_snapshot(counter) -> Dict:
+    return dict(counter._values)
+
+def counted(before: Dict, after: Dict, match) -> float:
+    return sum(value - before.get(labels, 0) for labels, value in after.items() if match(labels))
+
+async def run(client, count: int, concurrency: int, deadline: float):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await client.complete(MESSAGES, max_tokens=50, deadline=deadline)
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                failures += 1
+
+    # Warm the connection pool and the latency window first
+    await asyncio.gather(*(one() for _ in range(concurrency * 2)))
+    latencies.clear()
+    failures = 0
+    requests_before, hedges_before = counter_snapshot(LLM_REQUESTS), counter_snapshot(LLM_HEDGES)
+    await asyncio.gather(*(one() for _ in range(count)))
+    requests = counter_snapshot(LLM_REQUESTS)
+    sent = counted(requests_before, requests, lambda labels: labels[1] in ("ok", "error", "cancelled"))
+    to_fallback = counted(requests_before, requests, lambda labels: labels[0].startswith("fallback") and labels[1] != "skipped")
+    hedges = counted(hedges_before, counter_snapshot(LLM_HEDGES), lambda labels: labels == ("launched",))
+    await client.aclose()
+    return latencies, failures, sent, to_fallback, hedges
+
+def report(name: str, count: int, results):
+    latencies, failures, sent, to_fallback, hedges = results
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    print(
+        f"{name:<34} {cuts[49] * 1000:>7.0f} {cuts[94] * 1000:>7.0f} {cuts[98] * 1000:>7.0f} "
+        f"{(count - failures) / count:>8.1%} {sent / count:>9.2f} {hedges:>7.0f} {to_fallback:>9.0f}"
+    )
+
+async def main(args):
+    # Each failover logs a warning; the table below is the summary
+    logging.getLogger("llm_client").setLevel(logging.ERROR)
+    print(f"🧪 {args.requests} completions, {args.concurrency} at a time, {args.deadline:.0f}s deadline")
+    print(f"{'scenario':<34} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'success':>8} {'req/call':>9} {'hedges':>7} {'fallback':>9}")
+
+    with FakeLLMServer(port=PRIMARY_PORT, latency=args.latency, latency_sigma=args.sigma, token_interval=0.005) as primary:
+        report("long tail, no hedging", args.requests, await run(
+            make_client(primary, LLM_HEDGE_PERCENTILE=0), args.requests, args.concurrency, args.deadline))
+        report(f"long tail, hedge at p{args.percentile:.0f}", args.requests, await run(
+            make_client(primary, LLM_HEDGE_PERCENTILE=args.percentile), args.requests, args.concurrency, args.deadline))
+
+    with FakeLLMServer(port=FALLBACK_PORT, latency=args.latency, token_interval=0.005) as fallback:
+        for failure_rate in (0.2, 1.0):
+            with FakeLLMServer(port=PRIMARY_PORT, latency=args.latency, token_interval=0.005, failure_rate=failure_rate) as primary:
+                report(f"primary {failure_rate:.0%} errors, no fallback", args.requests, await run(
+                    make_client(primary), args.requests, args.concurrency, args.deadline))
+                report(f"primary {failure_rate:.0%} errors, fallback", args.requests, await run(
+                    make_client(primary, fallback), args.requests, args.concurrency, args.deadline))
+
+        # Every primary request is slower than the breaker's slow threshold
+        with FakeLLMServer(port=PRIMARY_PORT, latency=args.latency * 8, token_interval=0.005) as primary:
+            report("primary 8x slower, fallback", args.requests, await run(
+                make_client(primary, fallback, LLM_BREAKER_SLOW_SECONDS=args.latency * 4), args.requests, args.concurrency, args.deadline))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LLM hedging and failover benchmark")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2, help="Median LLM latency in seconds")
+    parser.add_argument("--sigma", type=float, default=0.8, help="Lognormal spread of LLM latency")
+    parser.add_argument("--percentile", type=float, default=90, help="Hedge after this latency percentile")
+    parser.add_argument("--deadline", type=float, default=10)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,96 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Conversation history sync benchmark: a CRM polling every lead's transcript,
+# comparing full fetches with incremental "since" fetches that send the last
+# ETag (most transcripts are unchanged between polls and get 304s), and the
+# memory needed to export every conversation as streamed NDJSON versus
+# building the whole dump in memory. Runs the app in-process on a temporary
+# SQLite session database.
+
+def seed(store, leads: int, messages: int):
+    rng = random.Random(3)
+    for lead in range(leads):
+        turns = [
+            (role, f"{role} message {number} about resin {rng.randint(1, 999)} and build volume " * 2)
+            for number in range(messages)
+            for role in ("user", "assistant")
+        ][:messages]
+        store.extend(f"lead_{lead:05d}", turns)
+
+async def poll(client, lead_ids, state, incremental: bool):
+    """One sync pass over every lead; returns (bytes received, 304 count, seconds)"""
+    received = not_modified = 0
+    started = time.perf_counter()
+    for lead_id in lead_ids:
+        params, headers = {}, {}
+        if incremental and lead_id in state:
+            etag, total = state[lead_id]
+            params["since"] = total
+            headers["If-None-Match"] = etag
+        response = await client.get(f"/conversation/history/{lead_id}", params=params, headers=headers)
+        received += len(response.content)
+        if response.status_code == 304:
+            not_modified += 1
+            continue
+        body = response.json()
+        state[lead_id] = (response.headers.get("etag"), body["total_messages"])
+    return received, not_modified, time.perf_counter() - started
+
+def export_memory(conversation_store, lead_ids):
+    """Peak Python memory for streaming the export versus materializing it"""
+    tracemalloc.start()
+    lines = 0
+    for lead_id, seq, message in conversation_store.export():
+        json.dumps({"lead_id": lead_id, "seq": seq, **message})
+        lines += 1
+    streamed = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    dump = json.dumps({lead_id: conversation_store.transcript(lead_id) for lead_id in lead_ids})
+    materialized = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return lines, streamed, materialized, len(dump)
+
+async def main(args):
+    os.environ["SESSION_BACKEND"] = "sqlite"
+    os.environ["SESSION_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "sessions.db")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import httpx
+    import main as app_module
+
+    store = app_module.conversation_store
+    seed(store, args.leads, args.messages)
+    lead_ids = [f"lead_{lead:05d}" for lead in range(args.leads)]
+    print(f"🧪 {args.leads} leads x {args.messages} messages, {args.changed:.0%} of leads change between polls")
+    print(f"{'sync':<24} {'KB received':>12} {'304s':>6} {'ms':>8}")
+
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        state = {}
+        received, _, seconds = await poll(client, lead_ids, state, incremental=False)
+        print(f"{'first full sync':<24} {received / 1024:>12.0f} {0:>6} {seconds * 1000:>8.0f}")
+        for lead_id in random.Random(5).sample(lead_ids, int(len(lead_ids) * args.changed)):
+            store.extend(lead_id, [("user", "One more question about pricing."), ("assistant", "Happy to help with that.")])
+        received, _, seconds = await poll(client, lead_ids, {}, incremental=False)
+        print(f"{'full re-sync':<24} {received / 1024:>12.0f} {0:>6} {seconds * 1000:>8.0f}")
+        received, not_modified, seconds = await poll(client, lead_ids, state, incremental=True)
+        print(f"{'incremental + ETag':<24} {received / 1024:>12.0f} {not_modified:>6} {seconds * 1000:>8.0f}")
+
+    lines, streamed, materialized, dump_bytes = export_memory(store, lead_ids)
+    print(f"\n📦 Export of {lines} messages ({dump_bytes / 1024 / 1024:.1f} MB of JSON)")
+    print(f"   streamed NDJSON peak memory: {streamed / 1024:.0f} KB")
+    print(f"   materialized dump peak memory: {materialized / 1024:.0f} KB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conversation history sync benchmark")
+    parser.add_argument("--leads", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=40)
+    parser.add_argument("--changed", type=float, default=0.05, help="Share of leads with new messages between polls")
+    asyncio.run(main(parser.parse_args()))
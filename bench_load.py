@@ -0,0 +1,188 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from bench_concurrency import percentile
+from fake_llm_server import FakeLLMServer, wait_until_listening
+from fake_twilio import WebhookCallDriver
+
+# Synthetic load test: one app worker backed by the stand-in LLM server, driven
+# by simulated Twilio calls. Waves of concurrent multi-turn calls go through
+# /voice/gather and /voice/process-speech (and /voice/continue when streaming),
+# each from a different lead. Reports throughput, per-turn latency percentiles
+# and the app's resident memory after every wave. Runs fully offline; pass
+# --max-p99-ms to fail the run (exit code 1) when p99 turn latency regresses.
+
+LLM_PORT = 8765
+APP_PORT = 8766
+QUESTIONS = [
+    "What printers do you have for dental labs?",
+    "How much does the Form 4 cost?",
+    "What build volume do I get?",
+    "Which resins work for surgical guides?",
+    "How fast can you ship one?",
+    "Do you offer financing?",
+    "Can I get a demo next week?",
+]
+
+def caller_number(index: int) -> str:
+    return f"+1555{index:07d}"
+
+def rss_bytes(pid: int) -> int:
+    """Resident memory of a process, from /proc"""
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+def seed_leads(client: httpx.Client, count: int):
+    """Import one lead per simulated caller through the bulk import endpoint"""
+    lines = (
+        json.dumps({
+            "id": f"load_{index:06d}",
+            "name": f"Caller {index}",
+            "phone": caller_number(index),
+            "company": "Load Test Labs",
+            "inquiry": "Looking for a printer for dental models",
+        })
+        for index in range(count)
+    )
+    response = client.post("/leads/import", files={"file": ("leads.jsonl", "\n".join(lines), "application/x-ndjson")})
+    response.raise_for_status()
+
+async def run_wave(driver: WebhookCallDriver, first_caller: int, calls: int, turns: int, repeat_questions: bool = False):
+    async def one_call(index: int):
+        caller = first_caller + index
+        questions = [QUESTIONS[(caller + turn) % len(QUESTIONS)] for turn in range(turns)]
+        if not repeat_questions:
+            # Make every question unique so each turn reaches the LLM
+            questions = [f"{question} We are lab {caller}." for question in questions]
+        return await driver.play_call(caller_number(caller), questions)
+
+    return await asyncio.gather(*(one_call(index) for index in range(calls)))
+
+async def drive(args, app_pid: int):
+    limits = httpx.Limits(max_connections=args.calls)
+    waves = []
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{APP_PORT}", limits=limits, timeout=60) as client:
+        driver = WebhookCallDriver(client, think_time=args.think_time)
+        # Warm-up call so imports, pools and caches are not billed to wave 1
+        await run_wave(driver, args.calls * args.waves, 1, 1)
+        baseline = rss_bytes(app_pid)
+        for wave in range(args.waves):
+            started = time.perf_counter()
+            results = await run_wave(driver, wave * args.calls, args.calls, args.turns, args.repeat_questions)
+            waves.append({
+                "results": results,
+                "elapsed": time.perf_counter() - started,
+                "rss": rss_bytes(app_pid),
+            })
+    return baseline, waves
+
+def serve():
+    import uvicorn
+
+    import main
+    uvicorn.run(main.app, host="127.0.0.1", port=APP_PORT, log_level="warning")
+
+def report(args, baseline: int, waves) -> float:
+    turn_latencies = [latency for wave in waves for result in wave["results"] for latency in result["turns"]]
+    first_responses = [latency for wave in waves for result in wave["results"] for latency in result["first_response"]]
+    errors = sum(result["errors"] for wave in waves for result in wave["results"])
+    hung_up = sum(result["hung_up"] for wave in waves for result in wave["results"])
+    elapsed = sum(wave["elapsed"] for wave in waves)
+    total_calls = args.calls * args.waves
+
+    print(f"\n📊 {total_calls} calls, {len(turn_latencies)} turns in {elapsed:.1f}s")
+    print(f"   throughput: {len(turn_latencies) / elapsed:.1f} turns/s, {total_calls / elapsed:.2f} calls/s")
+    print(f"   errors: {errors}, calls ended early: {hung_up}")
+    print(f"\n{'latency (ms)':<16} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8} {'mean':>8}")
+    for name, latencies in [("turn", turn_latencies), ("first response", first_responses)]:
+        if not latencies:
+            continue
+        print(
+            f"{name:<16} {percentile(latencies, 50) * 1000:>8.0f} {percentile(latencies, 90) * 1000:>8.0f} "
+            f"{percentile(latencies, 99) * 1000:>8.0f} {max(latencies) * 1000:>8.0f} "
+            f"{statistics.mean(latencies) * 1000:>8.0f}"
+        )
+
+    print(f"\n{'wave':>6} {'calls/s':>8} {'RSS (MB)':>9} {'growth (MB)':>12}")
+    for index, wave in enumerate(waves, 1):
+        print(
+            f"{index:>6} {args.calls / wave['elapsed']:>8.2f} {wave['rss'] / 2**20:>9.1f} "
+            f"{(wave['rss'] - baseline) / 2**20:>12.1f}"
+        )
+    growth = waves[-1]["rss"] - baseline
+    print(f"   memory growth: {growth / 2**20:.1f} MB total, {growth / total_calls / 1024:.1f} KB per call")
+    return percentile(turn_latencies, 99) * 1000 if turn_latencies else float("inf")
+
+def main(args) -> int:
+    data_dir = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        OPENAI_API_KEY="loadtest",
+        OPENAI_BASE_URL=f"http://127.0.0.1:{LLM_PORT}/v1",
+        LEADS_DB_PATH=os.path.join(data_dir, "leads.db"),
+        SESSION_DB_PATH=os.path.join(data_dir, "sessions.db"),
+        VOICE_STREAMING="true" if args.streaming else "false",
+    )
+    print(
+        f"🧪 Load test: {args.waves} waves of {args.calls} concurrent calls, {args.turns} turns each "
+        f"(LLM {args.llm_latency * 1000:.0f} ms median, sigma {args.llm_sigma}, "
+        f"{1 / args.token_interval:.0f} tokens/s, streaming {'on' if args.streaming else 'off'})"
+    )
+    with FakeLLMServer(
+        port=LLM_PORT,
+        latency=args.llm_latency,
+        token_interval=args.token_interval,
+        latency_sigma=args.llm_sigma,
+    ):
+        process = subprocess.Popen(
+            [sys.executable, __file__, "--serve"],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_until_listening(f"http://127.0.0.1:{APP_PORT}/", process)
+            with httpx.Client(base_url=f"http://127.0.0.1:{APP_PORT}", timeout=60) as client:
+                seed_leads(client, args.calls * args.waves + 1)
+            baseline, waves = asyncio.run(drive(args, process.pid))
+        finally:
+            process.terminate()
+            process.wait()
+
+    p99_ms = report(args, baseline, waves)
+    if args.max_p99_ms and p99_ms > args.max_p99_ms:
+        print(f"❌ p99 turn latency {p99_ms:.0f} ms exceeds {args.max_p99_ms:.0f} ms")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic voice load test against stand-in LLM and Twilio")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--calls", type=int, default=50, help="concurrent calls per wave")
+    parser.add_argument("--waves", type=int, default=4)
+    parser.add_argument("--turns", type=int, default=5, help="speech turns per call")
+    parser.add_argument("--think-time", type=float, default=0.0, help="seconds the caller waits before speaking")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="median LLM time to first token (s)")
+    parser.add_argument("--llm-sigma", type=float, default=0.5, help="lognormal sigma of LLM latency (0 = fixed)")
+    parser.add_argument("--token-interval", type=float, default=0.02, help="seconds between streamed tokens")
+    parser.add_argument("--repeat-questions", action="store_true", help="let repeated questions hit the response cache")
+    parser.add_argument("--streaming", action="store_true", help="run the app with VOICE_STREAMING on")
+    parser.add_argument("--max-p99-ms", type=float, help="exit non-zero if p99 turn latency is above this")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve()
+    else:
+        sys.exit(main(args))
@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+# Phrase audio benchmark: the greeting and "I didn't catch that" turns of
+# many calls, answered with <Say> (synthesized for every call, modelled by
+# the local stand-in TTS taking --tts-latency per phrase) and with <Play> of
+# audio rendered once. Time to audio is the webhook response plus either a
+# synthesis or a fetch of the audio file from /voice/audio (first fetch,
+# then a revalidation answered with 304 as Twilio's media cache would).
+# Runs the app in-process.
+
+PLAY_URL = re.compile(r"<Play>https?://[^/<]+(/voice/audio/[^<]+)</Play>")
+
+async def timed(request):
+    started = time.perf_counter()
+    response = await request
+    if response.status_code >= 400:
+        response.raise_for_status()
+    return time.perf_counter() - started, response
+
+async def run_calls(client, mode: str, args, tts):
+    """(seconds to audio per turn, syntheses done on the calls' behalf)"""
+    to_audio = []
+    syntheses = 0
+    etags = {}
+    for call in range(args.calls):
+        lead_id = f"caller_{call % args.leads:04d}"
+        # Fresh CallSids per mode, or retried-webhook protection replays earlier answers
+        call_sid = f"CA{mode}{call:08d}"
+        turns = [
+            client.post("/voice/gather", data={"CallSid": call_sid, "lead_id": lead_id}),
+            client.post(f"/voice/process-speech?lead_id={lead_id}&turn=1", data={"CallSid": call_sid, "SpeechResult": ""}),
+        ]
+        for turn in turns:
+            seconds, response = await timed(turn)
+            match = PLAY_URL.search(response.text)
+            if match is None:
+                # <Say>: Twilio synthesizes the phrase before the caller hears anything
+                started = time.perf_counter()
+                tts.synthesize("phrase")
+                seconds += time.perf_counter() - started
+                syntheses += 1
+            else:
+                url = match.group(1)
+                headers = {"If-None-Match": etags[url]} if url in etags else {}
+                fetch, audio = await timed(client.get(url, headers=headers))
+                etags.setdefault(url, audio.headers["etag"])
+                seconds += fetch
+            to_audio.append(seconds)
+    return to_audio, syntheses
+
+async def main(args):
+    workdir = tempfile.mkdtemp()
+    os.environ.update(
+        OPENAI_API_KEY="bench",
+        LEADS_DB_PATH=os.path.join(workdir, "leads.db"),
+        SESSION_DB_PATH=os.path.join(workdir, "sessions.db"),
+        ANALYSIS_DB_PATH=os.path.join(workdir, "analysis.db"),
+        WEBHOOK_BASE_URL="https://bench.example.com",
+    )
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import httpx
+    import main as app_module
+    from phrase_audio import LocalTTS, PhraseAudioCache
+
+    for index in range(args.leads):
+        app_module.lead_store.upsert({
+            "id": f"caller_{index:04d}", "name": f"Caller {index}", "email": f"caller{index}@example.com",
+            "phone": f"+1999{index:07d}", "company": "Acme Dental", "inquiry": "Dental resin printers",
+        })
+
+    tts = LocalTTS(latency=args.tts_latency)
+    print(
+        f"🧪 {args.calls} calls to {args.leads} leads, 2 fixed-phrase turns each, "
+        f"TTS {args.tts_latency * 1000:.0f} ms per phrase"
+    )
+    print(f"{'mode':<8} {'turns':>6} {'p50 ms':>8} {'p95 ms':>8} {'syntheses':>10} {'phrases':>8} {'disk KB':>8}")
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for mode in ("say", "play"):
+            cache = None
+            if mode == "play":
+                cache = PhraseAudioCache(directory=os.path.join(workdir, "audio"), backend=tts, allow_other_voice=True)
+            app_module.phrase_audio = app_module.twilio_client.phrase_audio = cache
+            if cache:
+                cache.prewarm(app_module.FIXED_PHRASES)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for index in range(args.leads):
+                        # What dial_lead does while the phone rings
+                        app_module.greeting_twiml(f"caller_{index:04d}")
+                while cache.stats()["pending"]:
+                    await asyncio.sleep(0.05)
+            rendered = cache.stats()["phrases"] if cache else 0
+            # The voice webhooks print a trace of every turn
+            with contextlib.redirect_stdout(io.StringIO()):
+                to_audio, syntheses = await run_calls(client, mode, args, tts)
+            disk = sum(os.path.getsize(os.path.join(cache.directory, name)) for name in os.listdir(cache.directory)) if cache else 0
+            cuts = statistics.quantiles(to_audio, n=100)
+            print(
+                f"{mode:<8} {len(to_audio):>6} {cuts[49] * 1000:>8.1f} {cuts[94] * 1000:>8.1f} "
+                f"{syntheses + rendered:>10} {rendered:>8} {disk / 1000:>8.0f}"
+            )
+            if cache:
+                cache.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-synthesized phrase audio benchmark")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--leads", type=int, default=20)
+    parser.add_argument("--tts-latency", type=float, default=0.3, help="Seconds to synthesize one phrase")
+    asyncio.run(main(parser.parse_args()))
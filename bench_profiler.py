@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from fake_llm_server import FakeLLMServer
+
+# Request profiler overhead benchmark: chat turns (async handler, stand-in
+# LLM) and lead list pages (sync handler, worker thread) at several profiler
+# sample rates. Reports throughput, latency, how many stack samples were
+# taken and the time spent taking them, then the hottest stacks of both from
+# the fully profiled run. Runs the app in-process.
+
+LLM_PORT = 8781
+
+async def run_load(client, run: str, args):
+    latencies = []
+
+    async def worker(index: int):
+        for request in range(args.requests):
+            started = time.perf_counter()
+            if request % 2 == 0:
+                # Distinct messages, so no turn is answered from the response cache
+                response = await client.post("/conversation/chat", json={
+                    "lead_id": f"profiled_{index:04d}",
+                    "message": f"Which resin suits dental models? ({run}, request {request})",
+                })
+            else:
+                response = await client.get("/leads", params={"limit": 100})
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(index) for index in range(args.concurrency)))
+    return time.perf_counter() - started, latencies
+
+async def main(args):
+    workdir = tempfile.mkdtemp()
+    with FakeLLMServer(port=LLM_PORT, latency=args.latency, token_interval=0.0) as llm:
+        os.environ.update(
+            OPENAI_API_KEY="bench",
+            OPENAI_BASE_URL=llm.base_url,
+            LEADS_DB_PATH=os.path.join(workdir, "leads.db"),
+            SESSION_DB_PATH=os.path.join(workdir, "sessions.db"),
+            ANALYSIS_DB_PATH=os.path.join(workdir, "analysis.db"),
+            LLM_HEDGE_PERCENTILE="0",
+            # The benchmark measures up to every request being profiled
+            PROFILE_MAX_SAMPLE_RATE="1",
+        )
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import httpx
+        import main as app_module
+
+        for index in range(max(args.concurrency, 500)):
+            app_module.lead_store.upsert({
+                "id": f"profiled_{index:04d}", "name": f"Lead {index}", "email": f"lead{index}@example.com",
+                "phone": f"+1888{index:07d}", "company": "Acme Dental", "inquiry": "Dental resin printers",
+            })
+
+        profiler = app_module.request_profiler
+        print(
+            f"🧪 {args.concurrency} clients x {args.requests} requests (chat and lead pages), "
+            f"LLM {args.latency * 1000:.0f} ms, sampling every {profiler.interval * 1000:.0f} ms"
+        )
+        print(f"{'sample rate':>11} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'profiled':>9} {'samples':>8} {'sampling ms':>12}")
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            await run_load(client, "warm-up", args)
+            for rate in args.rates:
+                profiler.configure(sample_rate=rate)
+                profiler.reset()
+                elapsed, latencies = await run_load(client, f"rate {rate}", args)
+                stats = profiler.stats()
+                profiled = sum(endpoint["requests"] for endpoint in stats["endpoints"].values())
+                cuts = statistics.quantiles(latencies, n=100)
+                print(
+                    f"{rate:>11.0%} {len(latencies) / elapsed:>8.0f} {cuts[49] * 1000:>8.1f} {cuts[94] * 1000:>8.1f} "
+                    f"{profiled:>9} {stats['samples']:>8} {stats['sampling_seconds'] * 1000:>12.0f}"
+                )
+
+        print()
+        for endpoint, counts in sorted(profiler.stats()["endpoints"].items()):
+            print(f"📊 {endpoint}: {counts['requests']} requests, {counts['samples']} stack samples")
+        for endpoint in ("POST /conversation/chat", "GET /leads"):
+            print(f"🔥 Hottest {endpoint} stacks (innermost 3 frames):")
+            for line in profiler.collapsed(endpoint).splitlines()[:args.top]:
+                stack, count = line.rsplit(" ", 1)
+                print(f"  {count:>5}  {' <- '.join(reversed(stack.split(';')[-3:]))}")
+        await app_module.llm_client.aclose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Request profiler overhead benchmark")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=100, help="Requests per client")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--rates", type=float, nargs="+", default=[0.0, 0.01, 0.1, 1.0])
+    parser.add_argument("--top", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,104 @@
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from fake_redis import FakeRedisServer
+from session_backends import MemoryBackend, RedisBackend, SQLiteBackend
+from session_store import ConversationStore
+
+# Session backend contention check: several worker processes append turns to
+# the same few conversations at once, the way uvicorn workers (or pods)
+# handling Twilio webhooks for the same calls would. Every turn must land
+# exactly once, in order per worker, and each worker must see the others'
+# turns. Redis runs against the local stand-in server.
+
+WORKERS = 4
+TURNS = 100
+LEADS = 3
+REDIS_PORT = 6390
+
+def make_backend(name: str, location: str):
+    if name == "sqlite":
+        return SQLiteBackend(location)
+    return RedisBackend(location, prefix="bench:")
+
+def worker(name: str, location: str, worker_id: int, barrier):
+    store = ConversationStore(make_backend(name, location))
+    barrier.wait()
+    for turn in range(TURNS):
+        lead_id = f"lead_{turn % LEADS}"
+        store.extend(lead_id, [("user", f"w{worker_id} t{turn} question"), ("assistant", f"w{worker_id} t{turn} answer")])
+    store.close()
+
+def check(store: ConversationStore, workers: int) -> int:
+    """Number of turns lost, duplicated or split across another turn"""
+    problems = 0
+    for lead in range(LEADS):
+        transcript = store.transcript(f"lead_{lead}")
+        seen = set()
+        for question, answer in zip(transcript[::2], transcript[1::2]):
+            turn = question["content"].rsplit(" ", 1)[0]
+            if answer["content"].rsplit(" ", 1)[0] != turn or turn in seen:
+                problems += 1
+            seen.add(turn)
+        expected = {f"w{w} t{t}" for w in range(workers) for t in range(lead, TURNS, LEADS)}
+        problems += len(expected - seen)
+    return problems
+
+def run(name: str, location: str, workers: int):
+    barrier = multiprocessing.Barrier(workers)
+    processes = [
+        multiprocessing.Process(target=worker, args=(name, location, worker_id, barrier))
+        for worker_id in range(workers)
+    ]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    store = ConversationStore(make_backend(name, location))
+    problems = check(store, workers)
+    total = sum(store.length(f"lead_{lead}") for lead in range(LEADS)) // 2
+    print(
+        f"{name:<8} {workers:>7} {total:>7} {workers * TURNS / elapsed:>10.0f} {problems:>9}"
+        + ("  ✅" if problems == 0 and total == workers * TURNS else "  ❌")
+    )
+    store.close()
+
+def run_memory():
+    """Threads sharing one in-process backend, for comparison"""
+    import threading
+
+    store = ConversationStore(MemoryBackend())
+    barrier = threading.Barrier(WORKERS)
+
+    def thread_worker(worker_id: int):
+        barrier.wait()
+        for turn in range(TURNS):
+            store.extend(f"lead_{turn % LEADS}", [("user", f"w{worker_id} t{turn} question"), ("assistant", f"w{worker_id} t{turn} answer")])
+
+    threads = [threading.Thread(target=thread_worker, args=(worker_id,)) for worker_id in range(WORKERS)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    problems = check(store, WORKERS)
+    print(f"{'memory':<8} {WORKERS:>7} {WORKERS * TURNS:>7} {WORKERS * TURNS / elapsed:>10.0f} {problems:>9}" + ("  ✅" if not problems else "  ❌"))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Session backend contention check")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    print(f"🧪 {args.workers} workers x {TURNS} turns over {LEADS} shared conversations")
+    print(f"{'backend':<8} {'workers':>7} {'turns':>7} {'turns/s':>10} {'problems':>9}")
+    run_memory()
+    run("sqlite", os.path.join(tempfile.mkdtemp(), "sessions.db"), args.workers)
+    with FakeRedisServer(port=REDIS_PORT) as redis_server:
+        run("redis", redis_server.url, args.workers)
@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+
+from fake_llm_server import FakeLLMServer
+from fake_twilio import WebhookCallDriver
+
+# Speculative reply benchmark: simulated callers speak each question word by
+# word and Twilio's final transcript arrives after an end-of-speech delay.
+# Without speculation the reply is generated only once the final transcript
+# is in; with it, Twilio's interim transcripts start a draft while the caller
+# is still talking. Turn latency runs from the end of speech to the reply.
+# Also runs with some final transcripts revised at the last moment, which
+# makes those drafts misses. Runs the app in-process against the stand-in LLM.
+
+LLM_PORT = 8780
+QUESTIONS = [
+    "What printers do you have for dental labs?",
+    "How much does the Form 4 cost with the wash and cure?",
+    "Can you send me a quote for two of them?",
+]
+
+async def run_calls(client, run: str, args, revision_rate: float):
+    driver = WebhookCallDriver(
+        client,
+        words_per_second=args.words_per_second,
+        endpoint_delay=args.endpoint_delay,
+        revision_rate=revision_rate,
+    )
+    turns = []
+
+    async def caller(index: int):
+        for call in range(args.calls_each):
+            # Distinct questions, so no turn is answered from the response cache
+            questions = [f"{question} This is caller {index} on {run} call {call}." for question in QUESTIONS]
+            result = await driver.play_call(f"+1777{index:07d}", questions)
+            turns.extend(result["turns"])
+
+    # The voice webhooks print a trace of every turn
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(caller(index) for index in range(args.callers)))
+    return turns
+
+async def main(args):
+    workdir = tempfile.mkdtemp()
+    with FakeLLMServer(port=LLM_PORT, latency=args.latency, token_interval=0.0) as llm:
+        os.environ.update(
+            OPENAI_API_KEY="bench",
+            OPENAI_BASE_URL=llm.base_url,
+            LEADS_DB_PATH=os.path.join(workdir, "leads.db"),
+            SESSION_DB_PATH=os.path.join(workdir, "sessions.db"),
+            ANALYSIS_DB_PATH=os.path.join(workdir, "analysis.db"),
+            LLM_HEDGE_PERCENTILE="0",
+        )
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import httpx
+        import main as app_module
+
+        for index in range(args.callers):
+            app_module.lead_store.upsert({
+                "id": f"speaker_{index:04d}", "name": f"Caller {index}", "email": f"caller{index}@example.com",
+                "phone": f"+1777{index:07d}", "company": "Acme Dental", "inquiry": "Dental resin printers",
+            })
+
+        print(
+            f"🧪 {args.callers} callers x {args.calls_each} calls x {len(QUESTIONS)} turns, "
+            f"{args.words_per_second:.1f} words/s, final transcript {args.endpoint_delay * 1000:.0f} ms after speech, "
+            f"LLM {args.latency * 1000:.0f} ms"
+        )
+        print(f"{'speculation':<26} {'turns':>6} {'p50 ms':>8} {'p95 ms':>8} {'drafts':>7} {'hits':>5} {'misses':>7} {'hit rate':>9}")
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for name, enabled, revision_rate in (
+                ("off", False, 0.0),
+                ("on", True, 0.0),
+                (f"on, {args.revision_rate:.0%} revised", True, args.revision_rate),
+            ):
+                app_module.twilio_client.partial_results = enabled
+                app_module.twilio_client._response_cache.clear()
+                before = dict(app_module.speculative_replies.counts)
+                turns = await run_calls(client, name, args, revision_rate)
+                counts = {key: value - before[key] for key, value in app_module.speculative_replies.counts.items()}
+                decided = counts["hit"] + counts["miss"] + counts["failed"]
+                cuts = statistics.quantiles(turns, n=100)
+                print(
+                    f"{name:<26} {len(turns):>6} {cuts[49] * 1000:>8.0f} {cuts[94] * 1000:>8.0f} {counts['started']:>7} "
+                    f"{counts['hit']:>5} {counts['miss']:>7} {(counts['hit'] / decided if decided else 0):>9.0%}"
+                )
+        await app_module.llm_client.aclose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Speculative voice reply benchmark")
+    parser.add_argument("--callers", type=int, default=5)
+    parser.add_argument("--calls-each", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.6)
+    parser.add_argument("--words-per-second", type=float, default=3.0)
+    parser.add_argument("--endpoint-delay", type=float, default=0.8, help="Seconds from end of speech to the final transcript")
+    parser.add_argument("--revision-rate", type=float, default=0.2)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,101 @@
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from collections import deque
+
+from session_store import _Session
+
+# Session memory benchmark: Python memory held by the hot conversation tails
+# of 10k and 100k leads, stored as one {"role", "content"} dict per message
+# (the layout before transcript.Transcript), in the compact layout, and
+# compact with idle sessions zlib-compressed. Also compares the store's own
+# size estimate (which drives SESSION_MAX_BYTES eviction) with the measured
+# memory, and the cost of rebuilding a prompt's message list from each form.
+
+WORDS = (
+    "the form 4 resin printer build volume dental models surgical guides quote price shipping "
+    "financing demo next week accuracy micron layer speed post-processing wash cure tank "
+    "platform service plan lab production prototype materials biocompatible clear rigid"
+).split()
+
+class DictSession:
+    """The previous hot session layout: a bounded deque of message dicts"""
+
+    __slots__ = ("recent", "size", "total", "last_access", "summary", "summary_upto")
+
+    def __init__(self, ring_size: int):
+        self.recent = deque(maxlen=ring_size)
+        self.size = 0
+        self.total = 0
+        self.last_access = time.monotonic()
+        self.summary = ""
+        self.summary_upto = 0
+
+    def push(self, role: str, content: str):
+        self.recent.append({"role": role, "content": content})
+        self.size += len(content) + 100
+        self.total += 1
+
+def make_message(rng: random.Random, turn: int) -> str:
+    return f"{turn}: " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 40)))
+
+def build(layout: str, sessions: int, messages: int, ring_size: int):
+    rng = random.Random(7)
+    store = {}
+    for lead in range(sessions):
+        if layout == "dict":
+            session = DictSession(ring_size)
+            for turn in range(messages):
+                session.push("user" if turn % 2 == 0 else "assistant", make_message(rng, turn))
+        else:
+            session = _Session()
+            for turn in range(messages):
+                session.push("user" if turn % 2 == 0 else "assistant", make_message(rng, turn), ring_size)
+            if layout == "compressed":
+                session.recent.compress()
+        store[f"lead_{lead:06d}"] = session
+    return store
+
+def measure(layout: str, sessions: int, messages: int, ring_size: int):
+    """(measured bytes, estimated bytes, µs to build a message list for one session)"""
+    gc.collect()
+    tracemalloc.start()
+    store = build(layout, sessions, messages, ring_size)
+    measured = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    estimated = sum(session.size for session in store.values())
+
+    sample = list(store.values())[:2000]
+    started = time.perf_counter()
+    for session in sample:
+        if layout == "dict":
+            list(session.recent)
+        else:
+            session.recent.messages()
+            if layout == "compressed":
+                session.recent.compress()
+    per_session = (time.perf_counter() - started) / len(sample) * 1e6
+    del store, sample
+    gc.collect()
+    return measured, estimated, per_session
+
+def main(args):
+    print(f"🧪 {args.messages} messages per session (ring of {args.ring_size}), 8-40 words each")
+    print(f"{'sessions':>9} {'layout':<12} {'measured MB':>12} {'bytes/msg':>10} {'estimate MB':>12} {'µs/prompt':>10}")
+    for sessions in args.sessions:
+        for layout in ("dict", "compact", "compressed"):
+            measured, estimated, per_session = measure(layout, sessions, args.messages, args.ring_size)
+            kept = sessions * min(args.messages, args.ring_size)
+            print(
+                f"{sessions:>9} {layout:<12} {measured / 1e6:>12.1f} {measured / kept:>10.0f} "
+                f"{estimated / 1e6:>12.1f} {per_session:>10.1f}"
+            )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hot session memory benchmark")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--messages", type=int, default=10, help="Messages per conversation")
+    parser.add_argument("--ring-size", type=int, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,53 @@
+import timeit
+
+from twilio.twiml.voice_response import VoiceResponse
+
+from twilio_client import TwilioVoiceClient
+
+# TwiML rendering micro-benchmark: the previous VoiceResponse element-tree
+# path versus the precompiled templates in twiml.py. Outputs are checked to
+# be byte-identical before timing.
+
+NUMBER = 20000
+AI_REPLY = "The Form 4 is a great fit for dental models & prototypes. What build volume do you need?"
+FALLBACK = "I apologize for the technical difficulties. Please call us back later. Thank you!"
+
+def voice_response_gather(message: str):
+    response = VoiceResponse()
+    gather = response.gather(
+        input='speech',
+        timeout=10,
+        speech_timeout='auto',
+        action='/voice/process-speech',
+        method='POST'
+    )
+    gather.say(message, voice='Google.en-US-Neural2-F', language='en-US')
+    response.say("Thank you for your time. Goodbye!", voice='Google.en-US-Neural2-F', language='en-US')
+    response.hangup()
+    return str(response)
+
+def voice_response_final(message: str):
+    response = VoiceResponse()
+    response.say(message, voice='Google.en-US-Neural2-F', language='en-US')
+    response.hangup()
+    return str(response)
+
+def time_per_call(function) -> float:
+    return min(timeit.repeat(function, number=NUMBER, repeat=3)) / NUMBER * 1e6
+
+if __name__ == "__main__":
+    client = TwilioVoiceClient()
+
+    cases = [
+        ("gather (AI reply)", lambda: voice_response_gather(AI_REPLY), lambda: client.create_gather_response(AI_REPLY)),
+        ("final (fallback)", lambda: voice_response_final(FALLBACK), lambda: client.create_final_response(FALLBACK)),
+        ("final (cached)", lambda: voice_response_final(FALLBACK), lambda: client.cached_final_response(FALLBACK)),
+    ]
+
+    print("🧪 TwiML rendering benchmark")
+    print(f"{'response':<20} {'VoiceResponse (us)':>19} {'template (us)':>14} {'speedup':>8}")
+    for name, old, new in cases:
+        assert old() == new(), f"Output mismatch for {name}"
+        old_us = time_per_call(old)
+        new_us = time_per_call(new)
+        print(f"{name:<20} {old_us:>19.2f} {new_us:>14.2f} {old_us / new_us:>7.0f}x")
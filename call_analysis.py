@@ -0,0 +1,389 @@
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import logging
+
+from admission import BACKGROUND
+from metrics import ANALYSIS_BATCH_SIZE, ANALYSIS_CALLS, ANALYSIS_LAG_SECONDS
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_FIELDS = ("intent", "budget", "recommended_product", "outcome", "summary")
+# What the call ended with, per the sales process in prompts.py
+OUTCOMES = ("quote", "follow_up", "none")
+
+ANALYSIS_SYSTEM_PROMPT = """You review finished phone calls between a Formlabs sales representative and a customer.
+
+For every call below, extract:
+- intent: what the customer wants, in one short sentence
+- budget: the budget the customer mentioned, or null
+- recommended_product: the product the representative recommended, or null
+- outcome: "quote" if a quote is to be sent, "follow_up" if a follow-up call was scheduled, otherwise "none"
+- summary: the call in at most two sentences
+
+Answer with one JSON object of the form
+{"calls": [{"call_sid": "...", "intent": "...", "budget": null, "recommended_product": "...", "outcome": "quote", "summary": "..."}]}
+with exactly one entry per call, using the call ids given."""
+
+class AnalysisStore:
+    """SQLite table of finished calls and their post-call analysis
+
+    Calls are recorded as pending when they end and updated once analyzed,
+    so work queued before a restart is picked up again. A worker claims a
+    pending call (status running) before analyzing it, so with several
+    app workers sharing the table each call is analyzed once; a claim not
+    finished by `claimed_until` is released for the others to take.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("ANALYSIS_DB_PATH", "data/analysis.db")
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS call_analyses (
+                call_sid TEXT PRIMARY KEY,
+                lead_id TEXT NOT NULL,
+                start_seq INTEGER NOT NULL,
+                end_seq INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                intent TEXT,
+                budget TEXT,
+                recommended_product TEXT,
+                outcome TEXT,
+                summary TEXT,
+                error TEXT,
+                queued_at REAL NOT NULL,
+                analyzed_at REAL,
+                claimed_by TEXT,
+                claimed_until REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_call_analyses_lead ON call_analyses (lead_id);
+            CREATE INDEX IF NOT EXISTS idx_call_analyses_status ON call_analyses (status);
+        """)
+        # Tables created before claims were added
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(call_analyses)")}
+        for column, kind in (("claimed_by", "TEXT"), ("claimed_until", "REAL")):
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE call_analyses ADD COLUMN {column} {kind}")
+        self._conn.commit()
+
+    def enqueue(self, call_sid: str, lead_id: str, start_seq: int, end_seq: int) -> Optional[Dict]:
+        """Record a finished call as pending; returns None if it was already recorded"""
+        job = {
+            "call_sid": call_sid, "lead_id": lead_id, "start_seq": start_seq,
+            "end_seq": end_seq, "queued_at": time.time(),
+        }
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO call_analyses (call_sid, lead_id, start_seq, end_seq, status, queued_at) "
+                "VALUES (:call_sid, :lead_id, :start_seq, :end_seq, 'pending', :queued_at)",
+                job,
+            )
+            self._conn.commit()
+        return job if cursor.rowcount else None
+
+    def pending(self) -> List[Dict]:
+        """Calls still waiting for analysis, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT call_sid, lead_id, start_seq, end_seq, queued_at FROM call_analyses "
+                "WHERE status = 'pending' ORDER BY queued_at"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def claim(self, call_sids: List[str], worker: str, until: float) -> List[str]:
+        """Mark calls as running for `worker` until `until`; returns the ones it got
+
+        A call is only taken if still pending, so concurrent workers never
+        both analyze it; claiming a call again extends the worker's own claim.
+        """
+        claimed = []
+        with self._lock:
+            for call_sid in call_sids:
+                cursor = self._conn.execute(
+                    "UPDATE call_analyses SET status = 'running', claimed_by = ?, claimed_until = ? "
+                    "WHERE call_sid = ? AND (status = 'pending' OR (status = 'running' AND claimed_by = ?))",
+                    (worker, until, call_sid, worker),
+                )
+                if cursor.rowcount:
+                    claimed.append(call_sid)
+            self._conn.commit()
+        return claimed
+
+    def release_stale(self) -> int:
+        """Put calls whose claim ran out back to pending; returns how many"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE call_analyses SET status = 'pending', claimed_by = NULL, claimed_until = NULL "
+                "WHERE status = 'running' AND claimed_until < ?",
+                (time.time(),),
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def save(self, call_sid: str, status: str, result: Optional[Dict] = None, error: Optional[str] = None):
+        values = {field: (result or {}).get(field) for field in ANALYSIS_FIELDS}
+        with self._lock:
+            self._conn.execute(
+                "UPDATE call_analyses SET status = :status, intent = :intent, budget = :budget, "
+                "recommended_product = :recommended_product, outcome = :outcome, summary = :summary, "
+                "error = :error, analyzed_at = :analyzed_at WHERE call_sid = :call_sid",
+                {**values, "status": status, "error": error, "analyzed_at": time.time(), "call_sid": call_sid},
+            )
+            self._conn.commit()
+
+    def get(self, call_sid: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM call_analyses WHERE call_sid = ?", (call_sid,)).fetchone()
+        return dict(row) if row else None
+
+    def for_lead(self, lead_id: str) -> List[Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM call_analyses WHERE lead_id = ? ORDER BY queued_at", (lead_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM call_analyses GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def format_transcript(messages: List[Dict[str, str]], max_chars: int) -> str:
+    """Call transcript as speaker lines, keeping its start and end if too long"""
+    text = "\n".join(
+        f"{'Customer' if message['role'] == 'user' else 'Representative'}: {message['content']}"
+        for message in messages
+    )
+    if len(text) <= max_chars:
+        return text
+    # Intent comes up early in a call and the outcome late
+    half = max_chars // 2
+    return f"{text[:half]}\n[...]\n{text[-half:]}"
+
+def parse_analyses(content: str) -> Dict[str, Dict]:
+    """Analyses from the model's JSON answer, keyed by call SID"""
+    try:
+        calls = json.loads(content).get("calls")
+    except (ValueError, AttributeError):
+        return {}
+    results = {}
+    for call in calls if isinstance(calls, list) else []:
+        if not isinstance(call, dict) or not call.get("call_sid"):
+            continue
+        result = {field: call.get(field) for field in ANALYSIS_FIELDS}
+        for field in ANALYSIS_FIELDS:
+            if result[field] is not None and not isinstance(result[field], str):
+                result[field] = json.dumps(result[field])
+        if result["outcome"] not in OUTCOMES:
+            result["outcome"] = "none"
+        results[str(call["call_sid"])] = result
+    return results
+
+class CallAnalyzer:
+    """Worker pool analyzing finished calls off the live-turn path
+
+    Finished calls are queued by submit() and picked up by `workers` tasks.
+    Each worker takes up to `batch_size` calls, waiting at most `batch_wait`
+    seconds for the batch to fill, and analyzes them in one background
+    priority LLM request, so the analysis never takes the LLM slots kept
+    for callers. Calls the model skipped or failed on are retried with
+    backoff, up to `max_attempts` times.
+
+    Calls are claimed in the store before they are analyzed. Every
+    `claim_timeout` seconds the pending calls are picked up again, after
+    releasing claims that ran out, e.g. those of a worker that crashed.
+    """
+
+    def __init__(
+        self,
+        conversation_store,
+        llm_client,
+        store: Optional[AnalysisStore] = None,
+        workers: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        batch_wait: Optional[float] = None,
+    ):
+        self.conversation_store = conversation_store
+        self.llm_client = llm_client
+        self.store = store or AnalysisStore()
+        self.workers = workers or int(os.getenv("ANALYSIS_WORKERS", "2"))
+        self.batch_size = batch_size or int(os.getenv("ANALYSIS_BATCH_SIZE", "8"))
+        self.batch_wait = float(os.getenv("ANALYSIS_BATCH_WAIT", "2")) if batch_wait is None else batch_wait
+        self.max_chars = int(os.getenv("ANALYSIS_MAX_TRANSCRIPT_CHARS", "6000"))
+        self.tokens_per_call = int(os.getenv("ANALYSIS_TOKENS_PER_CALL", "200"))
+        self.max_attempts = int(os.getenv("ANALYSIS_MAX_ATTEMPTS", "3"))
+        self.retry_backoff = float(os.getenv("ANALYSIS_RETRY_BACKOFF", "30"))
+        self.claim_timeout = float(os.getenv("ANALYSIS_CLAIM_TIMEOUT", "300"))
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.queue: asyncio.Queue = asyncio.Queue()
+        # Calls in the queue, and calls claimed by this analyzer and not yet
+        # finished, so the periodic pickup does not add them again
+        self._queued = set()
+        self._held = set()
+        self.busy = 0
+        self._tasks: List[asyncio.Task] = []
+        self._retry_tasks = set()
+
+    def start(self):
+        """Start the workers, and the pickup of pending calls (including those left by a previous run)"""
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._pick_up_pending()))
+
+    async def stop(self):
+        tasks = self._tasks + list(self._retry_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, call_sid: str, lead_id: str, start_seq: int, end_seq: int) -> bool:
+        """Queue a finished call for analysis; False if it was already queued"""
+        job = await asyncio.to_thread(self.store.enqueue, call_sid, lead_id, start_seq, end_seq)
+        if job is None:
+            return False
+        self._queue(job)
+        return True
+
+    def _queue(self, job: Dict):
+        if job["call_sid"] not in self._queued and job["call_sid"] not in self._held:
+            self._queued.add(job["call_sid"])
+            self.queue.put_nowait(job)
+
+    async def _pick_up_pending(self):
+        while True:
+            released = await asyncio.to_thread(self.store.release_stale)
+            if released:
+                logger.warning(f"Released {released} analysis claims that ran out")
+            for job in await asyncio.to_thread(self.store.pending):
+                self._queue(job)
+            await asyncio.sleep(self.claim_timeout)
+
+    async def _next_batch(self) -> List[Dict]:
+        batch = [await self.queue.get()]
+        give_up_at = time.monotonic() + self.batch_wait
+        while len(batch) < self.batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        for job in batch:
+            self._queued.discard(job["call_sid"])
+        return batch
+
+    async def _worker(self):
+        while True:
+            batch = await self._next_batch()
+            unclaimed = [job["call_sid"] for job in batch if job["call_sid"] not in self._held]
+            claimed = await asyncio.to_thread(
+                self.store.claim, unclaimed, self.worker_id, time.time() + self.claim_timeout
+            )
+            self._held.update(claimed)
+            # The rest were taken by another worker (or already analyzed)
+            batch = [job for job in batch if job["call_sid"] in self._held]
+            if not batch:
+                continue
+            self.busy += 1
+            try:
+                await self._analyze(batch)
+            except Exception as e:
+                logger.error(f"Error analyzing {len(batch)} calls: {e}")
+                for job in batch:
+                    await self._retry(job, str(e))
+            finally:
+                self.busy -= 1
+
+    async def _analyze(self, batch: List[Dict]):
+        transcripts = {}
+        for job in batch:
+            messages = await asyncio.to_thread(
+                self.conversation_store.messages_between, job["lead_id"], job["start_seq"], job["end_seq"]
+            )
+            if messages:
+                transcripts[job["call_sid"]] = format_transcript(messages, self.max_chars)
+            else:
+                # Voicemail or a hang-up before the first answer: nothing to analyze
+                await self._finish(job, "empty", {"outcome": "none"})
+        jobs = [job for job in batch if job["call_sid"] in transcripts]
+        if not jobs:
+            return
+
+        ANALYSIS_BATCH_SIZE.observe(len(jobs))
+        prompt = "\n\n".join(f"### Call {call_sid}\n{transcript}" for call_sid, transcript in transcripts.items())
+        content = await self.llm_client.complete(
+            [{"role": "system", "content": ANALYSIS_SYSTEM_PROMPT}, {"role": "user", "content": prompt}],
+            max_tokens=self.tokens_per_call * len(jobs),
+            temperature=0.0,
+            priority=BACKGROUND,
+            response_format={"type": "json_object"},
+        )
+        results = parse_analyses(content)
+        for job in jobs:
+            result = results.get(job["call_sid"])
+            if result:
+                await self._finish(job, "done", result)
+            else:
+                await self._retry(job, "missing from the model's answer")
+
+    async def _finish(self, job: Dict, status: str, result: Optional[Dict] = None, error: Optional[str] = None):
+        await asyncio.to_thread(self.store.save, job["call_sid"], status, result, error)
+        self._held.discard(job["call_sid"])
+        ANALYSIS_CALLS.inc(status)
+        ANALYSIS_LAG_SECONDS.observe(time.time() - job["queued_at"])
+
+    async def _retry(self, job: Dict, error: str):
+        """Requeue a call after exponential backoff with jitter, or give up on it"""
+        job["attempts"] = job.get("attempts", 0) + 1
+        if job["attempts"] >= self.max_attempts:
+            logger.warning(f"Giving up on analyzing call {job['call_sid']} after {job['attempts']} attempts: {error}")
+            await self._finish(job, "failed", error=error)
+            return
+        ANALYSIS_CALLS.inc("retried")
+        delay = self.retry_backoff * (2 ** (job["attempts"] - 1)) * random.uniform(0.8, 1.2)
+
+        async def requeue():
+            # Keep the call claimed through the backoff
+            await asyncio.to_thread(
+                self.store.claim, [job["call_sid"]], self.worker_id, time.time() + delay + self.claim_timeout
+            )
+            await asyncio.sleep(delay)
+            self.queue.put_nowait(job)
+
+        task = asyncio.create_task(requeue())
+        self._retry_tasks.add(task)
+        task.add_done_callback(self._retry_tasks.discard)
+
+    async def stats(self) -> Dict:
+        counts = await asyncio.to_thread(self.store.counts)
+        return {
+            "queued": self.queue.qsize(),
+            "retrying": len(self._retry_tasks),
+            "workers": self.workers,
+            "busy_workers": self.busy,
+            "batch_size": self.batch_size,
+            "calls": {status: counts.get(status, 0) for status in ("pending", "running", "done", "empty", "failed")},
+        }
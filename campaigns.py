@@ -0,0 +1,247 @@
+import asyncio
+import os
+import random
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+class RateLimiter:
+    """Spaces calls evenly so at most `rate` start per second"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        # Waiters queue on the lock, and the next slot is measured from when
+        # this call actually goes out, so late wake-ups never cause bursts
+        async with self._lock:
+            wait = self._next_slot - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_slot = time.monotonic() + self.interval
+
+def is_permanent(error: Exception) -> bool:
+    """Whether a dial failure would fail again, e.g. an unknown lead (404) or invalid number
+
+    Client errors (HTTPException.status_code, or the HTTP status on Twilio's
+    REST errors) other than 429 Too Many Requests are not retried.
+    """
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    return isinstance(status, int) and 400 <= status < 500 and status != 429
+
+class Campaign:
+    """A batch of leads to dial, with progress and per-lead results"""
+
+    def __init__(
+        self,
+        lead_ids: List[str],
+        concurrency: int,
+        calls_per_second: float,
+        max_attempts: int,
+        retry_backoff: float,
+    ):
+        self.id = f"campaign_{uuid.uuid4().hex[:12]}"
+        self.lead_ids = lead_ids
+        self.concurrency = concurrency
+        self.calls_per_second = calls_per_second
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.status = "running"
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.results: Dict[str, Dict] = {}
+        self.attempts = 0
+        self.retries = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.in_flight = 0
+
+        self.limiter = RateLimiter(calls_per_second)
+        self.resumed = asyncio.Event()
+        self.resumed.set()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.task: Optional[asyncio.Task] = None
+        self._retry_tasks = set()
+
+    @property
+    def completed(self) -> int:
+        return self.succeeded + self.failed
+
+    def progress(self) -> Dict:
+        total = len(self.lead_ids)
+        return {
+            "campaign_id": self.id,
+            "status": self.status,
+            "total_leads": total,
+            "completed": self.completed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "in_flight": self.in_flight,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "percent_complete": round(100 * self.completed / total, 1) if total else 100.0,
+            "concurrency": self.concurrency,
+            "calls_per_second": self.calls_per_second,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+class CampaignDialer:
+    """Dials campaigns of leads with bounded concurrency, a CPS cap and retries
+
+    `dial` is a blocking function taking a lead id and returning the call SID
+    (e.g. a wrapper around TwilioVoiceClient.make_call); it runs in a worker
+    thread so the event loop stays free for webhooks. Every call placed
+    through the dialer, campaign or single (place_call), shares one limiter
+    at CAMPAIGN_CALLS_PER_SECOND, the account's limit. Finished campaigns are
+    kept for CAMPAIGN_RETENTION seconds.
+    """
+
+    def __init__(self, dial: Callable[[str], str]):
+        self.dial = dial
+        self.default_concurrency = int(os.getenv("CAMPAIGN_CONCURRENCY", "10"))
+        self.calls_per_second = float(os.getenv("CAMPAIGN_CALLS_PER_SECOND", "1"))
+        self.default_max_attempts = int(os.getenv("CAMPAIGN_MAX_ATTEMPTS", "3"))
+        self.default_retry_backoff = float(os.getenv("CAMPAIGN_RETRY_BACKOFF", "30"))
+        self.retention = float(os.getenv("CAMPAIGN_RETENTION", "86400"))
+        self.limiter = RateLimiter(self.calls_per_second)
+        self.campaigns: Dict[str, Campaign] = {}
+
+    async def place_call(self, lead_id: str) -> str:
+        """Dial one lead once a slot under the account-wide rate limit is free"""
+        await self.limiter.acquire()
+        return await asyncio.to_thread(self.dial, lead_id)
+
+    def start(
+        self,
+        lead_ids: Iterable[str],
+        concurrency: Optional[int] = None,
+        calls_per_second: Optional[float] = None,
+        max_attempts: Optional[int] = None,
+        retry_backoff: Optional[float] = None,
+    ) -> Campaign:
+        """Create a campaign and begin dialing in the background
+
+        `calls_per_second` can only slow a campaign below the account-wide limit.
+        """
+        self._prune()
+        campaign = Campaign(
+            lead_ids=list(dict.fromkeys(lead_ids)),
+            concurrency=concurrency or self.default_concurrency,
+            calls_per_second=min(calls_per_second or self.calls_per_second, self.calls_per_second),
+            max_attempts=max_attempts or self.default_max_attempts,
+            retry_backoff=self.default_retry_backoff if retry_backoff is None else retry_backoff,
+        )
+        for lead_id in campaign.lead_ids:
+            campaign.results[lead_id] = {"status": "pending", "attempts": 0, "call_sid": None, "error": None}
+            campaign.queue.put_nowait(lead_id)
+        if not campaign.lead_ids:
+            for _ in range(campaign.concurrency):
+                campaign.queue.put_nowait(None)
+        campaign.task = asyncio.create_task(self._run(campaign))
+        self.campaigns[campaign.id] = campaign
+        logger.info(f"Campaign {campaign.id} started with {len(campaign.lead_ids)} leads")
+        return campaign
+
+    def get(self, campaign_id: str) -> Optional[Campaign]:
+        self._prune()
+        return self.campaigns.get(campaign_id)
+
+    def all_campaigns(self) -> List[Campaign]:
+        self._prune()
+        return list(self.campaigns.values())
+
+    def _prune(self):
+        """Forget campaigns that finished more than `retention` seconds ago"""
+        cutoff = time.time() - self.retention
+        for campaign_id in [key for key, campaign in self.campaigns.items() if (campaign.finished_at or cutoff) < cutoff]:
+            del self.campaigns[campaign_id]
+
+    def pause(self, campaign: Campaign):
+        if campaign.status == "running":
+            campaign.status = "paused"
+            campaign.resumed.clear()
+
+    def resume(self, campaign: Campaign):
+        if campaign.status == "paused":
+            campaign.status = "running"
+            campaign.resumed.set()
+
+    def cancel(self, campaign: Campaign):
+        if campaign.status in ("running", "paused"):
+            campaign.status = "cancelled"
+            campaign.finished_at = time.time()
+            for task in campaign._retry_tasks:
+                task.cancel()
+            if campaign.task:
+                campaign.task.cancel()
+
+    async def _run(self, campaign: Campaign):
+        workers = [asyncio.create_task(self._worker(campaign)) for _ in range(campaign.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+            campaign.status = "completed"
+            campaign.finished_at = time.time()
+            logger.info(f"Campaign {campaign.id} completed: {campaign.succeeded} succeeded, {campaign.failed} failed")
+        except asyncio.CancelledError:
+            for worker in workers:
+                worker.cancel()
+
+    async def _worker(self, campaign: Campaign):
+        while True:
+            lead_id = await campaign.queue.get()
+            if lead_id is None:
+                return
+            await campaign.resumed.wait()
+            # Only a campaign paced below the account-wide limit waits on its own limiter
+            if campaign.calls_per_second < self.calls_per_second:
+                await campaign.limiter.acquire()
+            await self.limiter.acquire()
+            # Pausing while waiting for a rate slot still holds the call back
+            await campaign.resumed.wait()
+            await self._attempt(campaign, lead_id)
+            if campaign.completed == len(campaign.lead_ids):
+                for _ in range(campaign.concurrency):
+                    campaign.queue.put_nowait(None)
+
+    async def _attempt(self, campaign: Campaign, lead_id: str):
+        result = campaign.results[lead_id]
+        result["attempts"] += 1
+        result["status"] = "dialing"
+        campaign.attempts += 1
+        campaign.in_flight += 1
+        try:
+            result["call_sid"] = await asyncio.to_thread(self.dial, lead_id)
+            result["status"] = "initiated"
+            result["error"] = None
+            campaign.succeeded += 1
+        except Exception as e:
+            result["error"] = str(e)
+            if result["attempts"] < campaign.max_attempts and not is_permanent(e):
+                result["status"] = "retrying"
+                campaign.retries += 1
+                self._schedule_retry(campaign, lead_id, result["attempts"])
+            else:
+                result["status"] = "failed"
+                campaign.failed += 1
+                logger.warning(f"Campaign {campaign.id}: giving up on {lead_id} after {result['attempts']} attempts: {e}")
+        finally:
+            campaign.in_flight -= 1
+
+    def _schedule_retry(self, campaign: Campaign, lead_id: str, attempts: int):
+        """Requeue a failed lead after exponential backoff with jitter"""
+        delay = campaign.retry_backoff * (2 ** (attempts - 1)) * random.uniform(0.8, 1.2)
+
+        async def requeue():
+            await asyncio.sleep(delay)
+            campaign.queue.put_nowait(lead_id)
+
+        task = asyncio.create_task(requeue())
+        campaign._retry_tasks.add(task)
+        task.add_done_callback(campaign._retry_tasks.discard)
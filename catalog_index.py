@@ -0,0 +1,102 @@
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# Okapi BM25 keyword index used to pick the products relevant to a turn
+# instead of putting the whole catalog in every prompt. Postings are kept per
+# term so documents can be added, replaced or removed one at a time; IDF is
+# computed at query time from the current document frequencies.
+
+WORD = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "can", "do", "does", "for", "from",
+    "have", "how", "i", "in", "is", "it", "its", "me", "my", "of", "on", "or", "our", "that",
+    "the", "this", "to", "we", "what", "which", "with", "you", "your",
+}
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words without stopwords, with plural "s" stripped"""
+    tokens = []
+    for word in WORD.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+class BM25Index:
+    """Incrementally updatable BM25 index over short text documents"""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._doc_terms: Dict[str, List[str]] = {}
+        self._total_length = 0
+        # Per-document length normalization, recomputed after the index changes
+        self._norms: Dict[str, float] = {}
+        self._norms_stale = True
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, doc_id: str, text: str):
+        """Index a document, replacing any previous version with the same id"""
+        terms = Counter(tokenize(text))
+        with self._lock:
+            self._remove(doc_id)
+            for term, count in terms.items():
+                self._postings.setdefault(term, {})[doc_id] = count
+            length = sum(terms.values())
+            self._lengths[doc_id] = length
+            self._doc_terms[doc_id] = list(terms)
+            self._total_length += length
+            self._norms_stale = True
+
+    def remove(self, doc_id: str):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        length = self._lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        self._norms_stale = True
+        for term in self._doc_terms.pop(doc_id):
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Top k (doc_id, score) pairs for the query, best first"""
+        terms = set(tokenize(query))
+        scores: Dict[str, float] = {}
+        with self._lock:
+            doc_count = len(self._lengths)
+            if not doc_count:
+                return []
+            if self._norms_stale:
+                average_length = self._total_length / doc_count or 1
+                self._norms = {
+                    doc_id: self.k1 * (1 - self.b + self.b * length / average_length)
+                    for doc_id, length in self._lengths.items()
+                }
+                self._norms_stale = False
+            norms = self._norms
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                weight = idf * (self.k1 + 1)
+                for doc_id, count in postings.items():
+                    scores[doc_id] = scores.get(doc_id, 0.0) + weight * count / (count + norms[doc_id])
+        return heapq.nlargest(k, scores.items(), key=lambda item: (item[1], item[0]))
@@ -0,0 +1,90 @@
+import time
+from collections import deque
+from typing import Optional
+
+# Health tracking for a remote backend: a circuit breaker that stops sending
+# requests to a backend whose recent requests mostly failed or were too slow,
+# and a window of recent latencies to pick hedging delays from.
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """Opens when too many recent requests failed or ran slower than slow_seconds
+
+    After `cooldown` seconds one trial request is let through; the circuit
+    closes again if it succeeds in time and stays open for another cooldown
+    if it does not.
+    """
+
+    def __init__(
+        self,
+        window: int = 20,
+        min_samples: Optional[int] = None,
+        failure_rate: float = 0.5,
+        slow_seconds: float = 10.0,
+        cooldown: float = 30.0,
+    ):
+        # Judge only a full window by default, so a short burst of errors
+        # does not open the circuit
+        self.min_samples = window if min_samples is None else min_samples
+        self.failure_rate = failure_rate
+        self.slow_seconds = slow_seconds
+        self.cooldown = cooldown
+        self._outcomes: deque = deque(maxlen=window)
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return CLOSED
+        if self._probing or time.monotonic() - self._opened_at < self.cooldown:
+            return OPEN
+        return HALF_OPEN
+
+    @property
+    def available(self) -> bool:
+        return self.state != OPEN
+
+    def before_request(self):
+        """Claim the single trial request once the cooldown has passed"""
+        if self.state == HALF_OPEN:
+            self._probing = True
+
+    def record(self, latency: float, ok: bool = True):
+        failed = not ok or latency >= self.slow_seconds
+        if self._opened_at is not None:
+            # Result of the trial request
+            self._probing = False
+            if failed:
+                self._opened_at = time.monotonic()
+            else:
+                self._opened_at = None
+                self._outcomes.clear()
+            return
+        self._outcomes.append(failed)
+        if len(self._outcomes) >= self.min_samples and sum(self._outcomes) / len(self._outcomes) >= self.failure_rate:
+            self._opened_at = time.monotonic()
+
+    def release(self):
+        """Give up a request without an outcome (it was cancelled)"""
+        self._probing = False
+
+class LatencyWindow:
+    """The most recent latencies of successful requests"""
+
+    def __init__(self, size: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples: deque = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Latency below which `percent` of recent requests finished, if enough were seen"""
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(int(len(ordered) * percent / 100), len(ordered) - 1)]
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+import logging
+
+from admission import BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+# Local token estimate: words count as one token per ~4 characters and every
+# punctuation mark as its own token, which tracks the GPT tokenizers closely
+# enough for budgeting without a tokenizer dependency.
+TOKEN_PIECE = re.compile(r"\w+|[^\w\s]")
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_SYSTEM_PROMPT = """You maintain a running summary of a phone call between a Formlabs sales representative and a customer.
+Keep every concrete fact the customer shared (applications, budget, timeline, quantities, objections, decisions) and what was offered or agreed.
+Write compact notes, no more than a short paragraph."""
+
+def count_tokens(text: str) -> int:
+    tokens = 0
+    for piece in TOKEN_PIECE.findall(text):
+        tokens += (len(piece) + 3) // 4 if piece[0].isalnum() or piece[0] == "_" else 1
+    return tokens
+
+def message_tokens(message: Dict[str, str]) -> int:
+    return count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+
+def pack_history(history: List[Dict[str, str]], budget: int) -> Tuple[List[Dict[str, str]], int]:
+    """Keep the newest messages that fit in `budget` tokens
+
+    Returns the packed messages and how many of the oldest ones were left out.
+    """
+    used = 0
+    start = len(history)
+    for index in range(len(history) - 1, -1, -1):
+        cost = message_tokens(history[index])
+        if used + cost > budget:
+            break
+        used += cost
+        start = index
+    return history[start:], start
+
+class ContextWindow:
+    """Builds token-bounded prompts and keeps a rolling summary of older turns
+
+    The newest turns are packed into a fixed token budget. Turns that fall out
+    of the window are folded into a per-lead summary by a background task, one
+    increment at a time, so the hot path never waits on summarization and
+    never re-summarizes the whole transcript. Store reads and writes run in
+    worker threads, since a networked session backend blocks on I/O.
+    """
+
+    def __init__(self, store, llm_client, history_budget: Optional[int] = None, summary_tokens: Optional[int] = None):
+        self.store = store
+        self.llm_client = llm_client
+        self.history_budget = history_budget or int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+        self.summary_tokens = summary_tokens or int(os.getenv("CONTEXT_SUMMARY_TOKENS", "150"))
+        self._summarizing: Set[str] = set()
+
+    async def build(self, lead_id: str, system_prompt: str, message: str) -> List[Dict[str, str]]:
+        """Messages for the next turn: system prompt, summary, packed history, new message"""
+        first_seq, history = await asyncio.to_thread(self.store.tail, lead_id)
+        budget = max(0, self.history_budget - count_tokens(message) - MESSAGE_OVERHEAD_TOKENS)
+        packed, skipped = pack_history(history, budget)
+        window_start = first_seq + skipped
+
+        summary, summary_upto = await asyncio.to_thread(self.store.summary, lead_id)
+        messages = [{"role": "system", "content": system_prompt}]
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+        messages.extend(packed)
+        messages.append({"role": "user", "content": message})
+
+        if summary_upto < window_start:
+            self._schedule_summary(lead_id, window_start)
+        return messages
+
+    def _schedule_summary(self, lead_id: str, upto_seq: int):
+        if lead_id in self._summarizing:
+            return
+        self._summarizing.add(lead_id)
+        asyncio.get_running_loop().create_task(self._summarize(lead_id, upto_seq))
+
+    async def _summarize(self, lead_id: str, upto_seq: int):
+        """Fold the turns between the last summary and upto_seq into the summary"""
+        try:
+            summary, summary_upto = await asyncio.to_thread(self.store.summary, lead_id)
+            evicted = await asyncio.to_thread(self.store.messages_between, lead_id, summary_upto, upto_seq)
+            if not evicted:
+                return
+            turns = "\n".join(
+                f"{'Customer' if msg['role'] == 'user' else 'Agent'}: {msg['content']}" for msg in evicted
+            )
+            prompt = f"Current summary:\n{summary or '(none yet)'}\n\nNew turns:\n{turns}\n\nUpdated summary:"
+            updated = await self.llm_client.complete(
+                [{"role": "system", "content": SUMMARY_SYSTEM_PROMPT}, {"role": "user", "content": prompt}],
+                max_tokens=self.summary_tokens,
+                temperature=0.2,
+                priority=BACKGROUND,
+            )
+            await asyncio.to_thread(self.store.set_summary, lead_id, updated.strip(), upto_seq)
+        except Exception as e:
+            logger.error(f"Error summarizing conversation for {lead_id}: {e}")
+        finally:
+            self._summarizing.discard(lead_id)
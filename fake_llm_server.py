@@ -0,0 +1,210 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import ClientDisconnect, Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+# Local stand-in for the OpenAI chat completions API, used by the benchmarks
+# so they can run offline and with a controlled response latency. Latency is
+# the median time to first token; a non-zero sigma draws each request's
+# latency from a lognormal distribution around it, which gives the long
+# tail real model APIs have. A non-zero failure rate answers that share of
+# requests with a 500 error instead, for exercising failover. A non-zero
+# capacity serves only that many requests at once and queues the rest, the
+# way a provider's rate limit or a saturated self-hosted model behaves.
+# Requests for a JSON answer get a post-call analysis of every "### Call <sid>"
+# section in the prompt, as call_analysis.py expects.
+
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.5"))
+FAKE_LLM_LATENCY_SIGMA = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0"))
+FAKE_LLM_TOKEN_INTERVAL = float(os.getenv("FAKE_LLM_TOKEN_INTERVAL", "0.02"))
+FAKE_LLM_FAILURE_RATE = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+FAKE_LLM_CAPACITY = int(os.getenv("FAKE_LLM_CAPACITY", "0"))
+FAKE_LLM_REPLY = "The Form 4 is a great fit for that. What build volume do you need?"
+CALL_HEADING = re.compile(r"^### Call (\S+)", re.MULTILINE)
+
+def _chunk(completion_id: str, model: str, delta: dict, finish_reason=None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+def sample_latency(state) -> float:
+    if state.latency_sigma <= 0 or state.latency <= 0:
+        return state.latency
+    return random.lognormvariate(math.log(state.latency), state.latency_sigma)
+
+def analysis_reply(messages) -> str:
+    call_sids = CALL_HEADING.findall(str(messages[-1].get("content", ""))) if messages else []
+    return json.dumps({"calls": [
+        {
+            "call_sid": call_sid,
+            "intent": "Wants a desktop resin printer for dental models",
+            "budget": "Around $6,000",
+            "recommended_product": "Form 4 Complete Package",
+            "outcome": "quote",
+            "summary": "The customer asked about printing dental models. A quote for the Form 4 will be sent.",
+        }
+        for call_sid in call_sids
+    ]})
+
+def count_prompt_tokens(messages) -> int:
+    # Rough word count, enough for the token counters to move
+    return sum(len(str(message.get("content", "")).split()) + 4 for message in messages)
+
+async def stream_completion(app_state, model: str):
+    """Emit the reply word by word as server-sent events"""
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+    yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+    words = FAKE_LLM_REPLY.split(" ")
+    for index, word in enumerate(words):
+        await asyncio.sleep(app_state.token_interval)
+        yield _chunk(completion_id, model, {"content": word if index == 0 else " " + word})
+    yield _chunk(completion_id, model, {}, finish_reason="stop")
+    yield "data: [DONE]\n\n"
+
+async def chat_completions(request: Request):
+    """Answer a chat completion request after a fixed delay"""
+    try:
+        body = await request.json()
+    except ClientDisconnect:
+        # The client gave up on the request (e.g. a hedged request lost the race)
+        return Response(status_code=499)
+    state = request.app.state
+    if random.random() < state.failure_rate:
+        return JSONResponse({"error": {"message": "Injected failure", "type": "server_error"}}, status_code=500)
+    if state.slots is None:
+        return await answer(state, body)
+    # Streams hold a slot until their first token, other requests until done
+    async with state.slots:
+        return await answer(state, body)
+
+async def answer(state, body: dict):
+    # Latency models time to first token; streamed words follow at token_interval
+    await asyncio.sleep(sample_latency(state))
+    if body.get("stream"):
+        return StreamingResponse(stream_completion(state, body.get("model", "fake-model")), media_type="text/event-stream")
+    if (body.get("response_format") or {}).get("type") == "json_object":
+        reply = analysis_reply(body.get("messages", []))
+    else:
+        reply = FAKE_LLM_REPLY
+    completion_tokens = len(reply.split(" "))
+    prompt_tokens = count_prompt_tokens(body.get("messages", []))
+    await asyncio.sleep(state.token_interval * completion_tokens)
+    return JSONResponse({
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake-model"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": reply},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    })
+
+def create_app(
+    latency: float = FAKE_LLM_LATENCY,
+    token_interval: float = FAKE_LLM_TOKEN_INTERVAL,
+    latency_sigma: float = FAKE_LLM_LATENCY_SIGMA,
+    failure_rate: float = FAKE_LLM_FAILURE_RATE,
+    capacity: int = FAKE_LLM_CAPACITY,
+) -> Starlette:
+    app = Starlette(routes=[Route("/v1/chat/completions", chat_completions, methods=["POST"])])
+    app.state.latency = latency
+    app.state.latency_sigma = latency_sigma
+    app.state.token_interval = token_interval
+    app.state.failure_rate = failure_rate
+    app.state.slots = asyncio.Semaphore(capacity) if capacity > 0 else None
+    return app
+
+def wait_until_listening(url: str, process: subprocess.Popen, timeout: float = 15.0):
+    """Block until a locally spawned server accepts HTTP requests"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server process exited early with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=0.5)
+            return
+        except httpx.TransportError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Server at {url} did not start within {timeout}s")
+
+class FakeLLMServer:
+    """Runs the stand-in LLM server in a child process"""
+
+    def __init__(
+        self,
+        port: int = 8765,
+        latency: float = FAKE_LLM_LATENCY,
+        token_interval: float = FAKE_LLM_TOKEN_INTERVAL,
+        latency_sigma: float = FAKE_LLM_LATENCY_SIGMA,
+        failure_rate: float = FAKE_LLM_FAILURE_RATE,
+        capacity: int = FAKE_LLM_CAPACITY,
+    ):
+        self.port = port
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        self.token_interval = token_interval
+        self.failure_rate = failure_rate
+        self.capacity = capacity
+        self.base_url = f"http://127.0.0.1:{port}/v1"
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            [
+                sys.executable, __file__,
+                "--port", str(self.port),
+                "--latency", str(self.latency),
+                "--token-interval", str(self.token_interval),
+                "--latency-sigma", str(self.latency_sigma),
+                "--failure-rate", str(self.failure_rate),
+                "--capacity", str(self.capacity),
+            ]
+        )
+        wait_until_listening(self.base_url, self.process)
+        return self
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stand-in OpenAI chat completions server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=FAKE_LLM_LATENCY)
+    parser.add_argument("--token-interval", type=float, default=FAKE_LLM_TOKEN_INTERVAL)
+    parser.add_argument("--latency-sigma", type=float, default=FAKE_LLM_LATENCY_SIGMA)
+    parser.add_argument("--failure-rate", type=float, default=FAKE_LLM_FAILURE_RATE)
+    parser.add_argument("--capacity", type=int, default=FAKE_LLM_CAPACITY, help="Requests served at once (0 = unlimited)")
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(args.latency, args.token_interval, args.latency_sigma, args.failure_rate, args.capacity),
+        host="127.0.0.1",
+        port=args.port,
+        log_level="warning",
+    )
@@ -0,0 +1,208 @@
+import argparse
+import asyncio
+import fnmatch
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+# Local stand-in for a Redis server, speaking enough of the protocol (RESP2)
+# for RedisBackend: strings (with SET ... EX expiry), lists, SCAN, and
+# WATCH/MULTI/EXEC transactions. Lets
+# the shared session backend and multi-worker runs be exercised offline.
+# Commands run one at a time on the event loop, so each is atomic like in
+# Redis itself.
+
+class FakeRedis:
+    """In-memory keyspace with per-key change counters for WATCH"""
+
+    def __init__(self):
+        self.data: Dict[str, object] = {}
+        self.changes: Dict[str, int] = {}
+        self.expires: Dict[str, float] = {}
+
+    def touch(self, key: str):
+        self.changes[key] = self.changes.get(key, 0) + 1
+
+    def expire_keys(self):
+        now = time.monotonic()
+        for key in [key for key, deadline in self.expires.items() if deadline <= now]:
+            self.data.pop(key, None)
+            del self.expires[key]
+            self.touch(key)
+
+    def execute(self, args: List[str]):
+        self.expire_keys()
+        name = args[0].upper()
+        handler = getattr(self, f"cmd_{name.lower()}", None)
+        if handler is None:
+            return RuntimeError(f"ERR unknown command '{name}'")
+        try:
+            return handler(*args[1:])
+        except TypeError:
+            return RuntimeError(f"ERR wrong number of arguments for '{name}' command")
+
+    def cmd_ping(self, *args):
+        return "PONG"
+
+    def cmd_select(self, db):
+        return "OK"
+
+    def cmd_get(self, key):
+        value = self.data.get(key)
+        if isinstance(value, list):
+            return RuntimeError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def cmd_set(self, key, value, *options):
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if len(options) == 2 and options[0].upper() == "EX":
+            self.expires[key] = time.monotonic() + int(options[1])
+        elif options:
+            return RuntimeError("ERR syntax error")
+        self.touch(key)
+        return "OK"
+
+    def cmd_del(self, *keys):
+        deleted = 0
+        for key in keys:
+            self.expires.pop(key, None)
+            if self.data.pop(key, None) is not None:
+                deleted += 1
+                self.touch(key)
+        return deleted
+
+    def cmd_rpush(self, key, *values):
+        items = self.data.setdefault(key, [])
+        items.extend(values)
+        self.touch(key)
+        return len(items)
+
+    def cmd_llen(self, key):
+        return len(self.data.get(key) or [])
+
+    def cmd_lrange(self, key, start, stop):
+        items = self.data.get(key) or []
+        start, stop = int(start), int(stop)
+        if start < 0:
+            start = max(len(items) + start, 0)
+        stop = len(items) + stop if stop < 0 else min(stop, len(items) - 1)
+        return items[start:stop + 1]
+
+    def cmd_scan(self, cursor, *args):
+        options = {args[index].upper(): args[index + 1] for index in range(0, len(args) - 1, 2)}
+        pattern = options.get("MATCH", "*")
+        count = int(options.get("COUNT", 10))
+        keys = sorted(self.data)
+        start = int(cursor)
+        batch = keys[start:start + count]
+        following = start + count if start + count < len(keys) else 0
+        return [str(following), [key for key in batch if fnmatch.fnmatchcase(key, pattern)]]
+
+    def cmd_flushdb(self):
+        for key in list(self.data):
+            self.touch(key)
+        self.data.clear()
+        self.expires.clear()
+        return "OK"
+
+def _encode(value) -> bytes:
+    if isinstance(value, RuntimeError):
+        return f"-{value}\r\n".encode()
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, list):
+        return b"*%d\r\n" % len(value) + b"".join(_encode(item) for item in value)
+    if value in ("OK", "PONG", "QUEUED"):
+        return f"+{value}\r\n".encode()
+    data = value.encode()
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+async def _read_command(reader: asyncio.StreamReader) -> Optional[List[str]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    count = int(line[1:-2])
+    args = []
+    for _ in range(count):
+        length = int((await reader.readline())[1:-2])
+        args.append((await reader.readexactly(length + 2))[:-2].decode())
+    return args
+
+async def handle_client(store: FakeRedis, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    watched: Dict[str, int] = {}
+    queued: Optional[List[List[str]]] = None
+    while True:
+        args = await _read_command(reader)
+        if args is None:
+            break
+        name = args[0].upper()
+        if name == "WATCH":
+            store.expire_keys()
+            for key in args[1:]:
+                watched[key] = store.changes.get(key, 0)
+            reply = "OK"
+        elif name == "UNWATCH":
+            watched.clear()
+            reply = "OK"
+        elif name == "MULTI":
+            queued = []
+            reply = "OK"
+        elif name == "DISCARD":
+            queued = None
+            watched.clear()
+            reply = "OK"
+        elif name == "EXEC":
+            dirty = any(store.changes.get(key, 0) != seen for key, seen in watched.items())
+            reply = None if dirty else [store.execute(command) for command in queued or []]
+            queued = None
+            watched.clear()
+        elif queued is not None:
+            queued.append(args)
+            reply = "QUEUED"
+        else:
+            reply = store.execute(args)
+        writer.write(_encode(reply))
+        await writer.drain()
+    writer.close()
+
+async def serve(port: int):
+    store = FakeRedis()
+    server = await asyncio.start_server(lambda r, w: handle_client(store, r, w), "127.0.0.1", port)
+    async with server:
+        await server.serve_forever()
+
+class FakeRedisServer:
+    """Runs the stand-in Redis server in a child process"""
+
+    def __init__(self, port: int = 6390):
+        self.port = port
+        self.url = f"redis://127.0.0.1:{port}/0"
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen([sys.executable, __file__, "--port", str(self.port)])
+        deadline = time.time() + 15
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server process exited early with code {self.process.returncode}")
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=0.5).close()
+                return self
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError(f"Fake Redis on port {self.port} did not start")
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stand-in Redis server")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    asyncio.run(serve(args.port))
@@ -0,0 +1,204 @@
+import argparse
+import asyncio
+import html
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from fake_llm_server import wait_until_listening
+
+# Local stand-in for the Twilio REST API's call creation endpoint. Point
+# TwilioVoiceClient at it with TWILIO_API_BASE_URL to exercise outbound
+# dialing offline. Failures can be injected at a fixed rate, and every call
+# is recorded so the observed calls-per-second can be checked.
+#
+# WebhookCallDriver plays the other direction: it calls the app's voice
+# webhooks the way Twilio would during a live call.
+
+FAKE_TWILIO_FAILURE_RATE = float(os.getenv("FAKE_TWILIO_FAILURE_RATE", "0"))
+
+async def create_call(request: Request):
+    """Accept a Calls.json POST like Twilio does, or fail at the configured rate"""
+    form = await request.form()
+    state = request.app.state
+    state.calls.append({"to": form.get("To"), "url": form.get("Url"), "at": time.time()})
+    if random.random() < state.failure_rate:
+        return JSONResponse(
+            {"code": 20500, "message": "Injected failure", "more_info": "", "status": 500},
+            status_code=500,
+        )
+    account_sid = request.path_params["account_sid"]
+    return JSONResponse({
+        "sid": f"CA{uuid.uuid4().hex}",
+        "account_sid": account_sid,
+        "to": form.get("To"),
+        "from": form.get("From"),
+        "status": "queued",
+        "direction": "outbound-api",
+        "uri": f"/2010-04-01/Accounts/{account_sid}/Calls.json",
+    }, status_code=201)
+
+async def call_log(request: Request):
+    """Every call attempt received, plus the peak calls started in any one second"""
+    calls = request.app.state.calls
+    per_second = {}
+    for call in calls:
+        second = int(call["at"])
+        per_second[second] = per_second.get(second, 0) + 1
+    return JSONResponse({"calls": calls, "total": len(calls), "peak_calls_per_second": max(per_second.values(), default=0)})
+
+def create_app(failure_rate: float = FAKE_TWILIO_FAILURE_RATE) -> Starlette:
+    app = Starlette(routes=[
+        Route("/2010-04-01/Accounts/{account_sid}/Calls.json", create_call, methods=["POST"]),
+        Route("/calls", call_log, methods=["GET"]),
+    ])
+    app.state.failure_rate = failure_rate
+    app.state.calls = []
+    return app
+
+GATHER_ACTION = re.compile(r'<Gather[^>]*\baction="([^"]*)"')
+REDIRECT = re.compile(r"<Redirect[^>]*>([^<]*)</Redirect>")
+PARTIAL_CALLBACK = re.compile(r'<Gather[^>]*\bpartialResultCallback="([^"]*)"')
+
+class WebhookCallDriver:
+    """Plays simulated calls through the voice webhooks like Twilio does
+
+    Each call posts to /voice/gather, then for every turn posts the caller's
+    speech to the Gather action and follows any <Redirect> until the app
+    gathers again. A turn's latency runs from the speech post until the
+    next <Gather>; first-response latency is until the first TwiML arrives.
+    With a status_callback path, the end of each call is reported there the
+    way Twilio's StatusCallback does.
+
+    With a speaking rate, the caller takes time to say each question and
+    the final transcript arrives `endpoint_delay` seconds after they stop,
+    as with speechTimeout="auto"; turn latency is then measured from the
+    end of speech. Meanwhile interim transcripts are posted word by word to
+    the Gather's partialResultCallback, if it has one. A `revision_rate`
+    share of final transcripts differ from the last interim one, as when
+    the recognizer revises its hypothesis at the end.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        to_number: str = "+15550000000",
+        think_time: float = 0.0,
+        status_callback: Optional[str] = None,
+        words_per_second: float = 0.0,
+        endpoint_delay: float = 0.0,
+        revision_rate: float = 0.0,
+    ):
+        self.client = client
+        self.to_number = to_number
+        self.think_time = think_time
+        self.status_callback = status_callback
+        self.words_per_second = words_per_second
+        self.endpoint_delay = endpoint_delay
+        self.revision_rate = revision_rate
+
+    async def _post(self, url: str, params: Dict[str, str]) -> str:
+        response = await self.client.post(url, data=params)
+        response.raise_for_status()
+        return response.text
+
+    async def _speak(self, question: str, partial_url: Optional[str], call_params: Dict[str, str]):
+        """Say a question word by word, posting interim transcripts as they firm up"""
+        words = question.split()
+        for count in range(1, len(words) + 1):
+            await asyncio.sleep(1 / self.words_per_second)
+            if partial_url:
+                # Interim results come without casing or punctuation
+                await self._post(partial_url, dict(
+                    call_params,
+                    StableSpeechResult=" ".join(words[:count - 1]).lower().strip(".,?!"),
+                    UnstableSpeechResult=words[count - 1].lower().strip(".,?!"),
+                    Stability="0.9",
+                    SequenceNumber=str(count),
+                ))
+
+    async def play_call(self, caller: str, questions: List[str]) -> Dict:
+        """Run one call from `caller`, asking each question in turn"""
+        call_params = {
+            "AccountSid": "ACfake",
+            "CallSid": f"CA{uuid.uuid4().hex}",
+            "From": caller,
+            "To": self.to_number,
+            "Direction": "inbound",
+            "CallStatus": "in-progress",
+        }
+        result = {"turns": [], "first_response": [], "errors": 0, "hung_up": False}
+        twiml = await self._post("/voice/gather", call_params)
+        for question in questions:
+            action = GATHER_ACTION.search(twiml)
+            if not action:
+                result["hung_up"] = True
+                break
+            if self.think_time:
+                await asyncio.sleep(self.think_time)
+            partial = PARTIAL_CALLBACK.search(twiml)
+            try:
+                if self.words_per_second:
+                    await self._speak(question, html.unescape(partial.group(1)) if partial else None, call_params)
+                started = time.perf_counter()
+                final = question
+                if random.random() < self.revision_rate:
+                    final = f"{question} Thanks."
+                if self.endpoint_delay:
+                    await asyncio.sleep(self.endpoint_delay)
+                twiml = await self._post(
+                    html.unescape(action.group(1)),
+                    dict(call_params, SpeechResult=final, Confidence="0.92"),
+                )
+                first_response = time.perf_counter() - started
+                redirect = REDIRECT.search(twiml)
+                while redirect and not GATHER_ACTION.search(twiml):
+                    twiml = await self._post(html.unescape(redirect.group(1)), call_params)
+                    redirect = REDIRECT.search(twiml)
+            except httpx.HTTPError:
+                result["errors"] += 1
+                break
+            result["turns"].append(time.perf_counter() - started)
+            result["first_response"].append(first_response)
+        if self.status_callback:
+            await self._post(self.status_callback, dict(call_params, CallStatus="completed"))
+        return result
+
+class FakeTwilioServer:
+    """Runs the stand-in Twilio REST API in a child process"""
+
+    def __init__(self, port: int = 8767, failure_rate: float = FAKE_TWILIO_FAILURE_RATE):
+        self.port = port
+        self.failure_rate = failure_rate
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            [sys.executable, __file__, "--port", str(self.port), "--failure-rate", str(self.failure_rate)]
+        )
+        wait_until_listening(f"{self.base_url}/calls", self.process)
+        return self
+
+    def __exit__(self, *exc):
+        self.process.terminate()
+        self.process.wait()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stand-in Twilio REST API")
+    parser.add_argument("--port", type=int, default=8767)
+    parser.add_argument("--failure-rate", type=float, default=FAKE_TWILIO_FAILURE_RATE)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.failure_rate), host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,60 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+class WebhookResponses:
+    """Runs each webhook once per idempotency key and replays the result to retries
+
+    A retry that arrives while the original request is still being handled
+    awaits the same result instead of starting the work again; a retry after
+    it finished gets the stored response body. Entries expire after the TTL
+    and the oldest are dropped beyond max_entries.
+    """
+
+    def __init__(self, ttl_seconds: float = 300, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, asyncio.Future]]" = OrderedDict()
+
+    async def run(self, key: str, handler: Callable[[], Awaitable[bytes]]) -> Tuple[bytes, Optional[str]]:
+        """Response body for the key, plus "coalesced" or "replayed" if this was a retry"""
+        self._prune()
+        entry = self._entries.get(key)
+        if entry is not None:
+            future = entry[1]
+            outcome = "replayed" if future.done() else "coalesced"
+            # Shield so a retry giving up does not cancel the original request
+            return await asyncio.shield(future), outcome
+
+        future = asyncio.get_running_loop().create_future()
+        self._entries[key] = (time.monotonic(), future)
+        try:
+            body = await handler()
+        except asyncio.CancelledError:
+            self._entries.pop(key, None)
+            future.cancel()
+            raise
+        except Exception as e:
+            # Let a later retry try again rather than replaying the failure
+            self._entries.pop(key, None)
+            future.set_exception(e)
+            # Mark retrieved so an exception nobody else awaited is not logged
+            future.exception()
+            raise
+        future.set_result(body)
+        return body, None
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        while self._entries:
+            key, (created_at, future) = next(iter(self._entries.items()))
+            if created_at >= cutoff and len(self._entries) < self.max_entries:
+                break
+            if not future.done() and created_at >= cutoff:
+                break
+            del self._entries[key]
@@ -0,0 +1,229 @@
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from typing import Dict, Iterable, IO, Iterator, List, Optional, Tuple
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+LEAD_FIELDS = ("id", "name", "email", "phone", "company", "inquiry")
+IMPORT_BATCH_SIZE = 1000
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """Reduce a phone number to +<digits> so formatting differences still match"""
+    if not phone:
+        return None
+    digits = re.sub(r"\D", "", phone)
+    if not digits:
+        return None
+    if len(digits) == 10:
+        # Bare US numbers, e.g. (617) 555-0123
+        digits = "1" + digits
+    return "+" + digits
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    if not email:
+        return None
+    return email.strip().lower() or None
+
+def check_lead(lead, line: int) -> Dict[str, str]:
+    """A parsed lead if it is an object whose lead fields are strings, else ValueError naming the line"""
+    if not isinstance(lead, dict):
+        raise ValueError(f"Line {line}: expected an object, got {type(lead).__name__}")
+    for field in LEAD_FIELDS:
+        value = lead.get(field)
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"Line {line}: {field} must be a string, got {type(value).__name__}")
+    return lead
+
+def iter_csv_leads(stream: IO[str]) -> Iterator[Dict[str, str]]:
+    """Yield leads from a CSV file with a header row, one row at a time"""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        if None in row:
+            raise ValueError(f"Line {reader.line_num}: more fields than the header row")
+        yield check_lead(row, reader.line_num)
+
+def iter_jsonl_leads(stream: IO[str]) -> Iterator[Dict[str, str]]:
+    """Yield leads from a JSON Lines file, one line at a time"""
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if line:
+            try:
+                lead = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"Line {number}: {e}")
+            yield check_lead(lead, number)
+
+class LeadStore:
+    """SQLite-backed lead repository with indexed lookups by id, phone and email"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("LEADS_DB_PATH", "data/leads.db")
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS leads (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL DEFAULT '',
+                email TEXT NOT NULL DEFAULT '',
+                phone TEXT NOT NULL DEFAULT '',
+                company TEXT NOT NULL DEFAULT '',
+                inquiry TEXT NOT NULL DEFAULT '',
+                phone_key TEXT,
+                email_key TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_leads_phone_key ON leads (phone_key);
+            CREATE INDEX IF NOT EXISTS idx_leads_email_key ON leads (email_key);
+        """)
+        self._conn.commit()
+
+    @staticmethod
+    def _to_row(lead: Dict[str, str]) -> Tuple:
+        values = {field: (lead.get(field) or "").strip() for field in LEAD_FIELDS}
+        if not values["id"]:
+            values["id"] = f"lead_{uuid.uuid4().hex[:12]}"
+        return (
+            values["id"],
+            values["name"],
+            values["email"],
+            values["phone"],
+            values["company"],
+            values["inquiry"],
+            normalize_phone(values["phone"]),
+            normalize_email(values["email"]),
+        )
+
+    @staticmethod
+    def _to_lead(row: Optional[sqlite3.Row]) -> Optional[Dict[str, str]]:
+        if row is None:
+            return None
+        return {field: row[field] for field in LEAD_FIELDS}
+
+    def _fetch_one(self, query: str, params: Tuple) -> Optional[Dict[str, str]]:
+        with self._lock:
+            row = self._conn.execute(query, params).fetchone()
+        return self._to_lead(row)
+
+    def get(self, lead_id: str) -> Optional[Dict[str, str]]:
+        """Look up a lead by primary key"""
+        return self._fetch_one("SELECT * FROM leads WHERE id = ?", (lead_id,))
+
+    def find_by_phone(self, phone: str) -> Optional[Dict[str, str]]:
+        """Match a caller number (e.g. Twilio's From) to a lead"""
+        phone_key = normalize_phone(phone)
+        if not phone_key:
+            return None
+        return self._fetch_one("SELECT * FROM leads WHERE phone_key = ? LIMIT 1", (phone_key,))
+
+    def find_by_email(self, email: str) -> Optional[Dict[str, str]]:
+        email_key = normalize_email(email)
+        if not email_key:
+            return None
+        return self._fetch_one("SELECT * FROM leads WHERE email_key = ? LIMIT 1", (email_key,))
+
+    def upsert(self, lead: Dict[str, str]) -> str:
+        """Insert or replace a single lead, returning its id"""
+        row = self._to_row(lead)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO leads VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+            self._conn.commit()
+        return row[0]
+
+    def upsert_many(self, leads: Iterable[Dict[str, str]], batch_size: int = IMPORT_BATCH_SIZE) -> int:
+        """Insert leads in fixed-size batches so the source is never fully materialized"""
+        count = 0
+        batch: List[Tuple] = []
+        for lead in leads:
+            batch.append(self._to_row(lead))
+            if len(batch) >= batch_size:
+                count += self._write_batch(batch)
+                batch = []
+        if batch:
+            count += self._write_batch(batch)
+        return count
+
+    def _write_batch(self, batch: List[Tuple]) -> int:
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO leads VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch)
+            self._conn.commit()
+        return len(batch)
+
+    def import_stream(self, stream: IO[str], file_format: str) -> int:
+        """Bulk import an open CSV or JSONL text stream"""
+        if file_format == "csv":
+            return self.upsert_many(iter_csv_leads(stream))
+        if file_format == "jsonl":
+            return self.upsert_many(iter_jsonl_leads(stream))
+        raise ValueError(f"Unsupported lead file format: {file_format}")
+
+    def import_file(self, path: str) -> int:
+        """Bulk import a .csv or .jsonl file from disk"""
+        file_format = "csv" if path.lower().endswith(".csv") else "jsonl"
+        with open(path, newline="", encoding="utf-8") as stream:
+            count = self.import_stream(stream, file_format)
+        logger.info(f"Imported {count} leads from {path}")
+        return count
+
+    def page(self, limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[Dict[str, str]], Optional[str]]:
+        """Return one page of leads ordered by id, plus the cursor for the next page"""
+        with self._lock:
+            if cursor:
+                rows = self._conn.execute(
+                    "SELECT * FROM leads WHERE id > ? ORDER BY id LIMIT ?", (cursor, limit + 1)
+                ).fetchall()
+            else:
+                rows = self._conn.execute("SELECT * FROM leads ORDER BY id LIMIT ?", (limit + 1,)).fetchall()
+        leads = [self._to_lead(row) for row in rows[:limit]]
+        next_cursor = leads[-1]["id"] if len(rows) > limit else None
+        return leads, next_cursor
+
+    def find_ids(self, company: Optional[str] = None, inquiry_contains: Optional[str] = None) -> List[str]:
+        """Ids of leads matching a company name and/or inquiry substring"""
+        query = "SELECT id FROM leads WHERE 1 = 1"
+        params: List[str] = []
+        if company:
+            query += " AND company = ? COLLATE NOCASE"
+            params.append(company)
+        if inquiry_contains:
+            query += " AND instr(lower(inquiry), ?) > 0"
+            params.append(inquiry_contains.lower())
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY id", params).fetchall()
+        return [row[0] for row in rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM leads").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+def open_upload(binary_stream: IO[bytes]) -> IO[str]:
+    """Wrap an uploaded binary file for line-by-line text reading"""
+    return io.TextIOWrapper(binary_stream, encoding="utf-8", newline="")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the local lead store")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    import_parser = subcommands.add_parser("import", help="Bulk import leads from a .csv or .jsonl file")
+    import_parser.add_argument("path")
+    args = parser.parse_args()
+
+    store = LeadStore()
+    if args.command == "import":
+        imported = store.import_file(args.path)
+        print(f"✅ Imported {imported} leads ({store.count()} total)")
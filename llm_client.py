@@ -0,0 +1,405 @@
+import asyncio
+import importlib
+import os
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import logging
+
+from admission import CHAT, AdmissionController
+from circuit_breaker import CircuitBreaker, LatencyWindow
+from metrics import LLM_DEADLINES, LLM_HEDGES, LLM_REQUESTS, LLM_TOKENS, record_stage, stage
+
+if TYPE_CHECKING:
+    import httpx
+    from openai import AsyncOpenAI, AsyncStream
+
+logger = logging.getLogger(__name__)
+
+class LLMUnavailable(RuntimeError):
+    """Every configured LLM backend has its circuit breaker open"""
+
+class LLMBackend:
+    """One model behind one API endpoint, with its own health tracking"""
+
+    def __init__(self, model: str, base_url: Optional[str], api_key: Optional[str], breaker: CircuitBreaker):
+        self.model = model
+        self.base_url = base_url
+        self.api_key = api_key
+        self.name = f"{model}@{urlparse(base_url).netloc}" if base_url else model
+        self.breaker = breaker
+        # Successful request latencies per call kind ("complete" or "stream")
+        self.latencies = {"complete": LatencyWindow(), "stream": LatencyWindow()}
+        self.client: Optional["AsyncOpenAI"] = None
+
+class LLMClient:
+    """Async chat-completion client with hedged requests and fallback backends
+
+    Requests go to the primary model first. If one takes longer than the
+    LLM_HEDGE_PERCENTILE latency recently seen from that backend, a second
+    identical request is raced against it and the first answer wins. Errors
+    fail over to the LLM_FALLBACKS backends in order, and a backend whose
+    recent requests mostly failed or were slow is skipped until its circuit
+    breaker lets a trial request through. Every call has a deadline, and
+    waits for admission by priority class (voice, chat or background) before
+    any request is sent.
+    """
+
+    def __init__(self):
+        self.api_key = os.getenv("OPENAI_API_KEY")
+        self.base_url = os.getenv("OPENAI_BASE_URL")
+        self.model = os.getenv("LLM_MODEL", "gpt-4o-mini")
+
+        # Connection pool and timeouts are tunable so one worker can hold
+        # many concurrent calls open without re-doing TCP/TLS handshakes
+        self.max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+        self.max_keepalive = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+        self.keepalive_expiry = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+        self.connect_timeout = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+        self.read_timeout = float(os.getenv("LLM_READ_TIMEOUT", "30"))
+        self.pool_timeout = float(os.getenv("LLM_POOL_TIMEOUT", "5"))
+
+        # Time budget for a whole call (first token for streams), hedges and
+        # failovers included, unless the caller passes its own
+        self.deadline = float(os.getenv("LLM_DEADLINE", "30"))
+        # Hedge after this percentile of recent latency (0 disables hedging),
+        # or after the initial delay until enough requests have been seen
+        self.hedge_percentile = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+        self.hedge_min_delay = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.2"))
+        self.hedge_initial_delay = float(os.getenv("LLM_HEDGE_INITIAL_DELAY", "2"))
+
+        self.backends = [LLMBackend(self.model, self.base_url, self.api_key, self._breaker())]
+        fallback_api_key = os.getenv("LLM_FALLBACK_API_KEY", self.api_key)
+        for entry in os.getenv("LLM_FALLBACKS", "").split(","):
+            if not entry.strip():
+                continue
+            # "model" reuses the primary endpoint, "model@url" names another provider
+            model, _, base_url = entry.strip().partition("@")
+            if base_url:
+                self.backends.append(LLMBackend(model, base_url, fallback_api_key, self._breaker()))
+            else:
+                self.backends.append(LLMBackend(model, self.base_url, self.api_key, self._breaker()))
+
+        # Caps concurrent LLM calls per priority class
+        self.admission = AdmissionController()
+
+        self._http_client: Optional["httpx.AsyncClient"] = None
+        self._warmed_at = float("-inf")
+
+    @staticmethod
+    def _breaker() -> CircuitBreaker:
+        return CircuitBreaker(
+            window=int(os.getenv("LLM_BREAKER_WINDOW", "20")),
+            failure_rate=float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5")),
+            slow_seconds=float(os.getenv("LLM_BREAKER_SLOW_SECONDS", "10")),
+            cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", "30")),
+        )
+
+    @property
+    def client(self) -> "AsyncOpenAI":
+        """OpenAI client for the primary backend"""
+        return self._client_for(self.backends[0])
+
+    def _client_for(self, backend: LLMBackend) -> "AsyncOpenAI":
+        """Create a backend's OpenAI client on first use, sharing one connection pool"""
+        if backend.client is None:
+            # openai and httpx are imported here rather than at module load
+            # to keep cold starts fast
+            started = time.perf_counter()
+            import httpx
+            from openai import AsyncOpenAI
+
+            if self._http_client is None:
+                self._http_client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_keepalive,
+                        keepalive_expiry=self.keepalive_expiry,
+                    ),
+                    timeout=httpx.Timeout(
+                        self.read_timeout,
+                        connect=self.connect_timeout,
+                        pool=self.pool_timeout,
+                    ),
+                )
+            backend.client = AsyncOpenAI(
+                api_key=backend.api_key,
+                base_url=backend.base_url,
+                http_client=self._http_client,
+                max_retries=0,
+            )
+            record_stage("llm_client_init", time.perf_counter() - started)
+            logger.info(f"LLM client for {backend.name} initialized (pool size {self.max_connections})")
+        return backend.client
+
+    async def warm(self):
+        """Open a pooled connection before the first completion needs it (best effort)
+
+        Skipped if the pool was warmed recently enough that its connection
+        is still kept alive.
+        """
+        now = time.monotonic()
+        if now - self._warmed_at < self.keepalive_expiry / 2:
+            return
+        self._warmed_at = now
+        try:
+            # Importing openai takes a while, so do that off the event loop; the
+            # client itself is built on the loop, like every other caller does,
+            # so two threads never both create one
+            await asyncio.to_thread(importlib.import_module, "openai")
+            client = self.client
+            import httpx
+
+            with stage("llm_warm"):
+                await client.get("/models", cast_to=httpx.Response)
+        except Exception as e:
+            # Any response, even an error, leaves a connection in the pool
+            logger.debug(f"LLM warm-up request failed: {e}")
+
+    async def complete(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 200,
+        temperature: float = 0.7,
+        deadline: Optional[float] = None,
+        priority: str = CHAT,
+        response_format: Optional[Dict[str, str]] = None,
+    ) -> str:
+        """Generate a chat completion without blocking the event loop
+
+        Raises TimeoutError if no backend answers within `deadline` seconds
+        (LLM_DEADLINE by default), queueing included, and Overloaded if the
+        request was shed while waiting for admission. Pass
+        response_format={"type": "json_object"} to get a JSON answer.
+        """
+        from openai.types.chat import ChatCompletion
+
+        body = {"messages": messages, "max_tokens": max_tokens, "temperature": temperature}
+        if response_format:
+            body["response_format"] = response_format
+
+        async def attempt(backend: LLMBackend) -> ChatCompletion:
+            # Post the plain JSON body directly: the SDK's typed parameter transform
+            # re-resolves type hints for every message and costs more CPU per turn
+            # than the rest of the webhook, which serializes concurrent calls
+            return await self._client_for(backend).post(
+                "/chat/completions",
+                body={"model": backend.model, **body},
+                cast_to=ChatCompletion,
+            )
+
+        with stage("llm"):
+            response = await self._call("complete", attempt, deadline, priority)
+        if response.usage:
+            LLM_TOKENS.inc("prompt", amount=response.usage.prompt_tokens)
+            LLM_TOKENS.inc("completion", amount=response.usage.completion_tokens)
+        return response.choices[0].message.content
+
+    async def stream(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 200,
+        temperature: float = 0.7,
+        deadline: Optional[float] = None,
+        priority: str = CHAT,
+    ) -> AsyncIterator[str]:
+        """Yield completion text deltas as the model generates them
+
+        Hedging, failover and the deadline apply to the first token; once a
+        backend has started answering the rest of its stream is used. The
+        admission slot is held until the stream ends.
+        """
+        body = {"messages": messages, "max_tokens": max_tokens, "temperature": temperature, "stream": True}
+        started = time.perf_counter()
+        first, response = await self._call(
+            "stream",
+            lambda backend: self._open_stream(backend, body),
+            deadline,
+            priority,
+            discard=lambda result: result[1].response.aclose(),
+            keep_slot=True,
+        )
+        record_stage("llm_first_token", time.perf_counter() - started)
+        chunks = 0
+        try:
+            if first:
+                chunks += 1
+                yield first
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    chunks += 1
+                    yield chunk.choices[0].delta.content
+        finally:
+            self.admission.release(priority)
+            await response.response.aclose()
+            # Streamed responses carry no usage block; each chunk is ~one token
+            record_stage("llm", time.perf_counter() - started)
+            LLM_TOKENS.inc("completion", amount=chunks)
+
+    async def _open_stream(self, backend: LLMBackend, body: Dict[str, Any]) -> Tuple[str, "AsyncStream"]:
+        """Start a streamed completion and wait for its first text delta"""
+        from openai import AsyncStream
+        from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+        response = await self._client_for(backend).post(
+            "/chat/completions",
+            body={"model": backend.model, **body},
+            cast_to=ChatCompletion,
+            stream=True,
+            stream_cls=AsyncStream[ChatCompletionChunk],
+        )
+        try:
+            while True:
+                chunk = await response.__anext__()
+                if chunk.choices and chunk.choices[0].delta.content:
+                    return chunk.choices[0].delta.content, response
+        except StopAsyncIteration:
+            return "", response
+        except BaseException:
+            await response.response.aclose()
+            raise
+
+    async def _call(
+        self,
+        kind: str,
+        attempt: Callable[[LLMBackend], Awaitable[Any]],
+        deadline: Optional[float],
+        priority: str,
+        discard: Optional[Callable[[Any], Awaitable[None]]] = None,
+        keep_slot: bool = False,
+    ) -> Any:
+        """Run `attempt` against the backends once admitted, within the deadline
+
+        With keep_slot the admission slot stays taken after a successful
+        call and the caller must release it.
+        """
+        budget = self.deadline if deadline is None else deadline
+        timeout = asyncio.timeout(budget)
+        admitted = succeeded = False
+        try:
+            async with timeout:
+                await self.admission.acquire(priority)
+                admitted = True
+                result = await self._race(kind, attempt, discard)
+                succeeded = True
+                return result
+        except TimeoutError:
+            if not timeout.expired():
+                raise
+            LLM_DEADLINES.inc()
+            raise TimeoutError(f"No LLM response within the {budget:.1f}s deadline") from None
+        finally:
+            if admitted and not (succeeded and keep_slot):
+                self.admission.release(priority)
+
+    async def _race(
+        self,
+        kind: str,
+        attempt: Callable[[LLMBackend], Awaitable[Any]],
+        discard: Optional[Callable[[Any], Awaitable[None]]],
+    ) -> Any:
+        """First successful result, hedging slow requests and failing over on errors"""
+        candidates = []
+        for backend in self.backends:
+            if backend.breaker.available:
+                candidates.append(backend)
+            else:
+                LLM_REQUESTS.inc(backend.name, "skipped")
+        if not candidates:
+            raise LLMUnavailable("All LLM backends are failing; waiting for their circuit breakers to close")
+
+        loop = asyncio.get_running_loop()
+        pending: Dict[asyncio.Task, LLMBackend] = {}
+        hedges = set()
+
+        def launch(backend: LLMBackend, hedge: bool = False):
+            backend.breaker.before_request()
+            task = asyncio.create_task(self._attempt(kind, backend, attempt))
+            pending[task] = backend
+            if hedge:
+                hedges.add(task)
+
+        current = candidates.pop(0)
+        launch(current)
+        hedge_delay = self._hedge_delay(kind, current)
+        hedge_at = None if hedge_delay is None else loop.time() + hedge_delay
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                wait = None if hedge_at is None else max(0.0, hedge_at - loop.time())
+                done, _ = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # Slower than usual for this backend: race a second request against it
+                    hedge_at = None
+                    if current.breaker.available:
+                        LLM_HEDGES.inc("launched")
+                        launch(current, hedge=True)
+                    continue
+                winner = None
+                for task in done:
+                    del pending[task]
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif winner is None:
+                        winner = task
+                    elif discard is not None:
+                        await discard(task.result())
+                if winner is not None:
+                    if winner in hedges:
+                        LLM_HEDGES.inc("won")
+                    return winner.result()
+                if candidates:
+                    # Fail over to the next backend straight away
+                    current = candidates.pop(0)
+                    logger.warning(f"LLM request failed ({error}); falling back to {current.name}")
+                    launch(current)
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _attempt(self, kind: str, backend: LLMBackend, attempt: Callable[[LLMBackend], Awaitable[Any]]) -> Any:
+        """One request to one backend, feeding its latency and outcome to its breaker"""
+        started = time.perf_counter()
+        try:
+            result = await attempt(backend)
+        except asyncio.CancelledError:
+            elapsed = time.perf_counter() - started
+            # A request cancelled after the slow threshold was slow regardless
+            if elapsed >= backend.breaker.slow_seconds:
+                backend.breaker.record(elapsed)
+            else:
+                backend.breaker.release()
+            LLM_REQUESTS.inc(backend.name, "cancelled")
+            raise
+        except Exception:
+            backend.breaker.record(time.perf_counter() - started, ok=False)
+            LLM_REQUESTS.inc(backend.name, "error")
+            raise
+        elapsed = time.perf_counter() - started
+        backend.breaker.record(elapsed)
+        backend.latencies[kind].add(elapsed)
+        LLM_REQUESTS.inc(backend.name, "ok")
+        return result
+
+    def _hedge_delay(self, kind: str, backend: LLMBackend) -> Optional[float]:
+        """Seconds to wait on a request to this backend before hedging, or None"""
+        if self.hedge_percentile <= 0:
+            return None
+        observed = backend.latencies[kind].percentile(self.hedge_percentile)
+        if observed is None:
+            return self.hedge_initial_delay if self.hedge_initial_delay > 0 else None
+        return max(observed, self.hedge_min_delay)
+
+    def health(self) -> Dict[str, str]:
+        """Circuit breaker state per backend"""
+        return {backend.name: backend.breaker.state for backend in self.backends}
+
+    async def aclose(self):
+        """Close the shared connection pool"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+            for backend in self.backends:
+                backend.client = None
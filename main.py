@@ -1,21 +1,57 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
 import os
+import random
+import time
+from startup import StartupTimer
+
+# Started before the heavy imports so the startup report covers them
+startup_timer = StartupTimer()
+
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Request, Form
-from fastapi.responses import Response
-from pydantic import BaseModel
-from typing import List, Dict, Optional
-import openai
+from fastapi import Depends, FastAPI, HTTPException, Header, Query, Request, Form, UploadFile, File
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import AsyncIterator, List, Dict, Optional
+from lead_store import LeadStore, open_upload
+from admission import BACKGROUND, CHAT, VOICE, Overloaded
+from batch_chat import run_batch
+from call_analysis import CallAnalyzer
+from campaigns import CampaignDialer
+from context_window import ContextWindow
+from idempotency import WebhookResponses
+from llm_client import LLMClient
+from metrics import (
+    ERRORS, FALLBACKS, HANDOFFS, TURNS, WEBHOOK_RETRIES, CallbackMetric, MetricsMiddleware, render_metrics, stage,
+)
+from phrase_audio import PhraseAudioCache, byte_range
+from profiler import ProfilingMiddleware, SamplingProfiler
+from prompts import ProductCatalog, PromptCache
+from response_cache import ResponseCache, is_personalized, lead_context
+from session_store import ConversationStore
+from speculation import SpeculativeReplies, StreamedDraft
 from twilio_client import TwilioVoiceClient
+from twiml import GOODBYE
+from voice_turns import VoiceTurnRegistry, iter_sentences
+
+startup_timer.mark("imports")
 
 # Load environment variables
 load_dotenv()
 
 # Initialize FastAPI app
 app = FastAPI(title="AI Sales Agent", description="AI-powered inbound sales representative")
+# Opt-in sampling profiler: PROFILE_SAMPLE_RATE of requests, or those of
+# PROFILE_LEAD_ID / PROFILE_CALL_SID, with flame graph stacks at /admin/profile
+request_profiler = SamplingProfiler()
+app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+app.add_middleware(MetricsMiddleware)
 
 # Configure OpenAI
-openai.api_key = os.getenv("OPENAI_API_KEY")
-if not openai.api_key:
+if not os.getenv("OPENAI_API_KEY"):
     print("Warning: OPENAI_API_KEY not found in environment variables!")
     print("Please create a .env file with your OpenAI API key.")
     print("You can copy env.example to .env and add your key.")
@@ -31,6 +67,25 @@ class Lead(BaseModel):
 class ConversationMessage(BaseModel):
     message: str
     lead_id: str
+    bypass_cache: bool = False
+
+class ChatBatchRequest(BaseModel):
+    messages: List[ConversationMessage] = Field(..., min_length=1)
+    concurrency: Optional[int] = Field(None, gt=0, le=256)
+
+class ProfileSettings(BaseModel):
+    sample_rate: Optional[float] = Field(None, ge=0, le=1)
+    lead_id: Optional[str] = None
+    call_sid: Optional[str] = None
+    interval: Optional[float] = Field(None, gt=0, le=1)
+
+class CampaignRequest(BaseModel):
+    lead_ids: Optional[List[str]] = None
+    company: Optional[str] = None
+    inquiry_contains: Optional[str] = None
+    concurrency: Optional[int] = Field(None, gt=0)
+    calls_per_second: Optional[float] = Field(None, gt=0)
+    max_attempts: Optional[int] = Field(None, gt=0)
 
 
 
@@ -47,11 +102,122 @@ mock_leads = [
     }
 ]
 
-# Conversation history storage
-conversation_history = {}
+# Persistent lead repository (seeded with the mock lead)
+lead_store = LeadStore()
+for mock_lead in mock_leads:
+    lead_store.upsert(mock_lead)
+startup_timer.mark("lead_store")
+
+# Conversation history storage (bounded in memory, full transcripts on disk)
+conversation_store = ConversationStore()
+startup_timer.mark("session_store")
+CallbackMetric(
+    "sales_agent_session_memory_bytes",
+    "Approximate memory held by hot conversation sessions",
+    lambda: {(): conversation_store.stats()["hot_bytes"]},
+)
+
+# Speculative voice replies: Twilio posts interim transcripts while the caller
+# speaks and a reply is drafted from them, ready by the time the final
+# transcript arrives. Interim text Twilio is less sure of than
+# SPECULATION_MIN_STABILITY is left out of drafts.
+VOICE_SPECULATION = os.getenv("VOICE_SPECULATION", "false").lower() == "true"
+SPECULATION_MIN_STABILITY = float(os.getenv("SPECULATION_MIN_STABILITY", "0.8"))
+speculative_replies = SpeculativeReplies()
+
+# Pre-synthesized phrase audio: greetings, goodbyes and other fixed phrases
+# are rendered once by the PHRASE_TTS_BACKEND voice and played with <Play>
+# from /voice/audio instead of being synthesized by <Say> on every call
+VOICE_PHRASE_AUDIO = os.getenv("VOICE_PHRASE_AUDIO", "false").lower() == "true"
+phrase_audio = PhraseAudioCache() if VOICE_PHRASE_AUDIO else None
 
 # Initialize Twilio client
-twilio_client = TwilioVoiceClient()
+twilio_client = TwilioVoiceClient(partial_results=VOICE_SPECULATION, phrase_audio=phrase_audio)
+
+# Bulk outbound dialing
+campaign_dialer = CampaignDialer(lambda lead_id: dial_lead(lead_id))
+
+# Shared async LLM client (one pooled connection for chat and voice)
+llm_client = LLMClient()
+CallbackMetric(
+    "sales_agent_llm_backend_open",
+    "1 while an LLM backend's circuit breaker is skipping it",
+    lambda: {(name,): int(state == "open") for name, state in llm_client.health().items()},
+    labelnames=("backend",),
+)
+CallbackMetric(
+    "sales_agent_llm_queue_depth",
+    "LLM requests waiting for admission by priority class",
+    lambda: {(priority,): stats["queued"] for priority, stats in llm_client.admission.stats().items()},
+    labelnames=("priority",),
+)
+CallbackMetric(
+    "sales_agent_llm_in_flight",
+    "LLM requests running by priority class",
+    lambda: {(priority,): stats["in_flight"] for priority, stats in llm_client.admission.stats().items()},
+    labelnames=("priority",),
+)
+
+# Token-budgeted prompt history with background summarization of older turns
+context_window = ContextWindow(conversation_store, llm_client)
+
+# Post-call analysis (intent, budget, product, outcome) of finished calls,
+# batched into background LLM requests by a small worker pool
+call_analyzer = CallAnalyzer(conversation_store, llm_client)
+CallbackMetric(
+    "sales_agent_call_analysis_queue_depth",
+    "Finished calls waiting for post-call analysis",
+    lambda: {(): call_analyzer.queue.qsize()},
+)
+
+# Streaming voice mode: speak the first sentence while the rest is generated
+VOICE_STREAMING = os.getenv("VOICE_STREAMING", "false").lower() == "true"
+# Finished replies are published to the call's shared state, so a
+# /voice/continue that lands on another worker can still speak them
+voice_turns = VoiceTurnRegistry(on_done=lambda turn: publish_voice_turn(turn))
+
+# Slow replies: if nothing is ready after VOICE_HOLD_AFTER seconds the caller
+# hears a short filler and Twilio polls /voice/continue for the answer, waiting
+# up to VOICE_HOLD_POLL seconds per poll and VOICE_MAX_WAIT seconds in total
+VOICE_HOLD_AFTER = float(os.getenv("VOICE_HOLD_AFTER", "2.5"))
+VOICE_HOLD_POLL = float(os.getenv("VOICE_HOLD_POLL", "5"))
+VOICE_MAX_WAIT = float(os.getenv("VOICE_MAX_WAIT", "30"))
+HOLD_PHRASES = [
+    "One moment while I check that for you.",
+    "Let me look that up.",
+    "Good question, give me just a second.",
+]
+
+# Fixed voice phrases, rendered to audio at startup when VOICE_PHRASE_AUDIO is on
+TECHNICAL_DIFFICULTIES = "I apologize for the technical difficulties. Please call us back later. Thank you!"
+NOT_HEARD = "I didn't catch that. Could you please repeat your question?"
+SAY_AGAIN = "Sorry, could you say that again?"
+FIXED_PHRASES = [GOODBYE, TECHNICAL_DIFFICULTIES, NOT_HEARD, SAY_AGAIN, *HOLD_PHRASES]
+
+# Twilio retries slow webhooks; each CallSid and turn is answered only once
+webhook_responses = WebhookResponses()
+WEBHOOK_RESPONSES_KEPT = 8
+
+@app.on_event("startup")
+async def report_startup():
+    startup_timer.mark("routes_and_server")
+    print(f"🚀 Started in {startup_timer.total * 1000:.0f} ms\n{startup_timer.report()}")
+
+@app.on_event("startup")
+async def start_call_analysis():
+    call_analyzer.start()
+
+@app.on_event("startup")
+async def prewarm_phrase_audio():
+    if phrase_audio:
+        phrase_audio.prewarm(FIXED_PHRASES)
+
+@app.on_event("shutdown")
+async def close_clients():
+    await call_analyzer.stop()
+    await llm_client.aclose()
+    if phrase_audio:
+        phrase_audio.close()
 
 # Simple product knowledge base
 product_knowledge = {
@@ -72,117 +238,513 @@ product_knowledge = {
     }
 }
 
+# Catalog text and per-lead system prompts are rendered once and cached
+product_catalog = ProductCatalog(product_knowledge)
+prompt_cache = PromptCache(product_catalog)
+
+# Replies to repeated questions, dropped whenever the catalog changes
+response_cache = ResponseCache()
+product_catalog.on_change(lambda _: response_cache.clear())
+CallbackMetric(
+    "sales_agent_response_cache_lookups_total",
+    "Response cache lookups by result",
+    lambda: {("hit",): response_cache.hits, ("miss",): response_cache.misses},
+    labelnames=("result",),
+    metric_type="counter",
+)
+
+CallbackMetric(
+    "sales_agent_startup_seconds",
+    "Time spent in each startup phase",
+    lambda: {(phase,): seconds for phase, seconds in startup_timer.phases},
+    labelnames=("phase",),
+)
+startup_timer.mark("prompts_and_caches")
+
 @app.get("/")
 def read_root():
     return {"message": "AI Sales Agent is running!"}
 
+@app.get("/metrics")
+def get_metrics():
+    """Latency histograms and counters in Prometheus text format"""
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4")
+
+def require_admin(authorization: Optional[str] = Header(None)):
+    """Admin endpoints need "Authorization: Bearer <ADMIN_TOKEN>"; without ADMIN_TOKEN they are off"""
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them")
+    scheme, _, supplied = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(supplied.encode(), token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
+@app.get("/admin/profile", dependencies=[Depends(require_admin)])
+def get_profile_stats():
+    """Profiler settings and profiled requests and stack samples per endpoint"""
+    return request_profiler.stats()
+
+@app.put("/admin/profile", dependencies=[Depends(require_admin)])
+def configure_profile(settings: ProfileSettings):
+    """Change the profiled share of requests or the lead/CallSid targets (empty string clears one)"""
+    try:
+        request_profiler.configure(**settings.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return request_profiler.stats()
+
+@app.get("/admin/profile/stacks", dependencies=[Depends(require_admin)])
+def get_profile_stacks(endpoint: Optional[str] = None):
+    """Collapsed stacks for flamegraph.pl or speedscope, for one endpoint ("POST /voice/gather") or all"""
+    if endpoint is not None and endpoint not in request_profiler.stats()["endpoints"]:
+        raise HTTPException(status_code=404, detail="No samples for endpoint")
+    name = "all" if endpoint is None else endpoint.replace(" ", "").replace("/", "_").strip("_")
+    return Response(
+        content=request_profiler.collapsed(endpoint),
+        media_type="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="profile-{name}.folded"'},
+    )
+
+@app.delete("/admin/profile/stacks", dependencies=[Depends(require_admin)])
+def clear_profile_stacks():
+    """Drop all collected stack samples"""
+    request_profiler.reset()
+    return {"message": "Profile samples cleared"}
+
 @app.get("/leads")
-def get_leads():
-    """Get all available leads"""
-    return {"leads": mock_leads}
+def get_leads(limit: int = 100, cursor: Optional[str] = None):
+    """Get one page of leads; pass next_cursor back as cursor for the next page"""
+    limit = max(1, min(limit, 1000))
+    leads, next_cursor = lead_store.page(limit=limit, cursor=cursor)
+    return {"leads": leads, "next_cursor": next_cursor}
+
+@app.post("/leads/import")
+def import_leads(file: UploadFile = File(...)):
+    """Bulk import leads from an uploaded .csv or .jsonl file"""
+    file_format = "csv" if (file.filename or "").lower().endswith(".csv") else "jsonl"
+    try:
+        imported = lead_store.import_stream(open_upload(file.file), file_format)
+    except (ValueError, KeyError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Error importing leads: {str(e)}")
+    return {"imported": imported, "total_leads": lead_store.count()}
 
 @app.get("/leads/{lead_id}")
 def get_lead(lead_id: str):
     """Get a specific lead by ID"""
-    for lead in mock_leads:
-        if lead["id"] == lead_id:
-            return lead
-    raise HTTPException(status_code=404, detail="Lead not found")
+    return find_lead(lead_id)
 
-@app.post("/conversation/chat")
-def chat_with_lead(conversation: ConversationMessage):
-    """Generate AI response for customer conversation"""
-    try:
-        # Find the lead
-        lead = None
-        for l in mock_leads:
-            if l["id"] == conversation.lead_id:
-                lead = l
-                break
-        
-        if not lead:
-            raise HTTPException(status_code=404, detail="Lead not found")
-        
-        # Initialize conversation history for this lead if it doesn't exist
-        if conversation.lead_id not in conversation_history:
-            conversation_history[conversation.lead_id] = []
-        
-        # Create system prompt
-        system_prompt = f"""You are an expert inbound sales representative for Formlabs, a leading 3D printer manufacturer.
-
-Customer Information:
-- Name: {lead['name']}
-- Company: {lead['company']}
-- Inquiry: {lead['inquiry']}
-
-Available Products:
-{product_knowledge}
-
-Your role is to:
-1. Understand customer needs through discovery questions
-2. Provide relevant product recommendations based on customer painpoints and needs
-3. Handle objections professionally
-4. Be conversational and helpful
-5. Remember previous parts of the conversation
-
-Respond naturally as if you're having a real phone conversation. 
-So your answers don't need to be too long and keep it conversational.
-Try to guide the conversation to the next step in the sales process which is either:
-1. Sending a quote based on the conversation
-2. Scheduling a follow up call with the customer at a later date
-"""
-
-        # Build messages array with conversation history
-        messages = [{"role": "system", "content": system_prompt}]
-        
-        # Add conversation history (last 10 messages to keep context manageable)
-        for msg in conversation_history[conversation.lead_id][-10:]:
-            messages.append(msg)
+def find_lead(lead_id: str):
+    """Look up a lead by ID, raising 404 if it does not exist"""
+    lead = lead_store.get(lead_id)
+    if not lead:
+        raise HTTPException(status_code=404, detail="Lead not found")
+    return lead
+
+async def caller_lead_id(request: Request):
+    """Match the customer on a Twilio call to a lead by phone number"""
+    form = await request.form()
+    # On outbound calls the customer is the callee, on inbound calls the caller
+    if (form.get("Direction") or "").startswith("outbound"):
+        phone = form.get("To")
+    else:
+        phone = form.get("From")
+    lead = lead_store.find_by_phone(phone) if phone else None
+    return lead["id"] if lead else None
+
+async def call_lead_id(request: Request):
+    """Lead already bound to this Twilio call, by whichever worker answered it"""
+    form = await request.form()
+    call_sid = form.get("CallSid")
+    state = await asyncio.to_thread(conversation_store.call, call_sid) if call_sid else None
+    return state.get("lead_id") if state else None
+
+async def bind_call(request: Request, lead_id: str):
+    """Remember which lead a Twilio call belongs to, for every worker
+
+    Also notes how long the lead's conversation was when the call started,
+    so the post-call analysis only reads this call's turns.
+    """
+    form = await request.form()
+    call_sid = form.get("CallSid")
+    if call_sid:
+        start_seq = await asyncio.to_thread(conversation_store.length, lead_id)
+        await asyncio.to_thread(
+            conversation_store.update_call, call_sid, lambda state: {"start_seq": start_seq, **(state or {}), "lead_id": lead_id}
+        )
+
+async def idempotent_twiml(request: Request, turn_key: str, handler):
+    """Answer a Twilio webhook once per CallSid and turn, replaying the TwiML to retries
+    
+    A retry while the original is still running awaits the same response;
+    a retry afterwards gets the stored TwiML, also from another worker via
+    the call's shared session state.
+    """
+    form = await request.form()
+    call_sid = form.get("CallSid")
+    if not call_sid:
+        return await handler()
+    
+    stored = ((await asyncio.to_thread(conversation_store.call, call_sid) or {}).get("responses") or {}).get(turn_key)
+    if stored is not None:
+        WEBHOOK_RETRIES.inc("replayed")
+        return Response(content=stored, media_type="application/xml")
+    
+    async def respond():
+        body = (await handler()).body
         
-        # Add current message
-        messages.append({"role": "user", "content": conversation.message})
+        def remember(state):
+            state = dict(state or {})
+            responses = dict(state.get("responses") or {})
+            responses[turn_key] = body.decode()
+            state["responses"] = dict(list(responses.items())[-WEBHOOK_RESPONSES_KEPT:])
+            return state
         
-        # Generate response using OpenAI
-        response = openai.ChatCompletion.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            max_tokens=200,
-            temperature=0.7
+        await asyncio.to_thread(conversation_store.update_call, call_sid, remember)
+        return body
+    
+    body, outcome = await webhook_responses.run(f"{call_sid}:{turn_key}", respond)
+    if outcome:
+        print(f"🔁 Retried webhook for {call_sid} {turn_key} {outcome}")
+        WEBHOOK_RETRIES.inc(outcome)
+    return Response(content=body, media_type="application/xml")
+
+async def next_gather_action(request: Request) -> str:
+    """Gather action for the caller's next answer, numbered so retries can be recognized
+
+    Numbers come from a per-call counter in the shared call state that only
+    goes up, so every <Gather> of a call (greetings and "say that again"
+    included) posts to a turn number no earlier answer has used.
+    """
+    try:
+        turn = int(request.query_params.get("turn", 0))
+    except ValueError:
+        turn = 0
+    form = await request.form()
+    call_sid = form.get("CallSid")
+    if call_sid:
+        state = await asyncio.to_thread(
+            conversation_store.update_call, call_sid, lambda state: {**(state or {}), "turn": max((state or {}).get("turn", 0), turn) + 1}
         )
-        ai_response = response.choices[0].message.content
-        
-        # Store the conversation in history
-        conversation_history[conversation.lead_id].append({"role": "user", "content": conversation.message})
-        conversation_history[conversation.lead_id].append({"role": "assistant", "content": ai_response})
+        turn = state["turn"] - 1
+    return f"/voice/process-speech?turn={turn + 1}"
+
+async def build_messages(lead: dict, message: str):
+    """Build the OpenAI messages array for the next turn with this lead"""
+    # System prompt is rendered once per lead and catalog version
+    system_prompt = prompt_cache.system_prompt(lead)
+    
+    # Newest turns within the token budget, older ones via the rolling summary
+    messages = await context_window.build(lead["id"], system_prompt, message)
+    
+    # Large catalogs: only the products relevant to this lead and turn
+    products = product_catalog.relevant_products(f"{lead['inquiry']} {message}")
+    if products:
+        messages.insert(-1, {"role": "system", "content": products})
+    return messages
+
+async def record_turn(lead_id: str, message: str, ai_response: str):
+    """Store a completed customer/AI exchange in the conversation history"""
+    await asyncio.to_thread(conversation_store.extend, lead_id, [("user", message), ("assistant", ai_response)])
+
+async def lookup_cached_reply(conversation: ConversationMessage, lead: dict):
+    """Return the response cache key for this turn and any cached reply"""
+    if conversation.bypass_cache:
+        return None, None
+    previous = await asyncio.to_thread(conversation_store.recent, conversation.lead_id, 1)
+    previous_reply = previous[0]["content"] if previous and previous[0]["role"] == "assistant" else ""
+    # Only leads with the same company and inquiry (and prompt version) share replies
+    cache_key = ResponseCache.key(conversation.message, previous_reply, lead_context(lead, product_catalog.version))
+    return cache_key, response_cache.get(cache_key)
+
+def store_cached_reply(cache_key, lead: dict, ai_response: str):
+    # Replies that address the customer by name are specific to this lead
+    if cache_key and ai_response and not is_personalized(ai_response, lead["name"]):
+        response_cache.put(cache_key, ai_response)
+
+async def replay(text: str):
+    yield text
+
+async def compose_reply(conversation: ConversationMessage, lead: dict, deadline: Optional[float], priority: str) -> str:
+    """The AI reply to one customer message, without recording it"""
+    # Answer repeated questions from the response cache
+    with stage("cache_lookup"):
+        cache_key, ai_response = await lookup_cached_reply(conversation, lead)
+    if ai_response is None:
+        with stage("prompt"):
+            messages = await build_messages(lead, conversation.message)
         
-        return {
-            "lead_id": conversation.lead_id,
-            "customer_message": conversation.message,
-            "ai_response": ai_response,
-            "conversation_length": len(conversation_history[conversation.lead_id])
-        }
+        # Generate response using OpenAI
+        ai_response = await llm_client.complete(messages, max_tokens=200, temperature=0.7, deadline=deadline, priority=priority)
+        store_cached_reply(cache_key, lead, ai_response)
+    return ai_response
+
+async def draft_sentences(conversation: ConversationMessage, lead: dict) -> AsyncIterator[str]:
+    """A speculative reply to an interim transcript, streamed sentence by sentence
+    
+    Drafts run at chat priority: they may never be used, so they must not
+    take LLM slots from the live voice turns they are racing ahead of.
+    """
+    cache_key, cached_reply = await lookup_cached_reply(conversation, lead)
+    if cached_reply is not None:
+        yield cached_reply
+        return
+    messages = await build_messages(lead, conversation.message)
+    deltas = llm_client.stream(messages, max_tokens=200, temperature=0.7, deadline=VOICE_MAX_WAIT, priority=CHAT)
+    sentences = []
+    async for sentence in iter_sentences(deltas):
+        sentences.append(sentence)
+        yield sentence
+    store_cached_reply(cache_key, lead, " ".join(sentences))
+
+async def drafted_reply(draft: Optional[StreamedDraft]) -> Optional[str]:
+    """The reply speculatively drafted for this turn, or None to generate it afresh"""
+    if draft is None:
+        return None
+    try:
+        with stage("speculation_wait"):
+            return await draft.text()
+    except Exception as e:
+        print(f"⚠️ Speculative reply failed, generating again: {str(e)}")
+        return None
+
+async def generate_reply(
+    conversation: ConversationMessage,
+    deadline: Optional[float] = None,
+    priority: str = CHAT,
+    draft: Optional[StreamedDraft] = None,
+):
+    """Answer one customer message and record the exchange
+    
+    `deadline` bounds the LLM call in seconds (LLM_DEADLINE by default) and
+    `priority` is its admission class (voice, chat or background). A
+    `draft` already generating the reply (see speculation.py) is used
+    instead of a new LLM call.
+    """
+    # Find the lead
+    with stage("lead_lookup"):
+        lead = find_lead(conversation.lead_id)
+    
+    ai_response = await drafted_reply(draft)
+    if ai_response is None:
+        ai_response = await compose_reply(conversation, lead, deadline, priority)
+    
+    # Store the conversation in history
+    with stage("history_write"):
+        await record_turn(conversation.lead_id, conversation.message, ai_response)
+    
+    return {
+        "lead_id": conversation.lead_id,
+        "customer_message": conversation.message,
+        "ai_response": ai_response,
+        "conversation_length": await asyncio.to_thread(conversation_store.length, conversation.lead_id)
+    }
+
+@app.post("/conversation/chat")
+async def chat_with_lead(conversation: ConversationMessage):
+    """Generate AI response for customer conversation"""
+    try:
+        result = await generate_reply(conversation)
+        TURNS.inc("chat")
+        return result
         
+    except Overloaded as e:
+        # Back-pressure: the LLM is busy with live calls, the client should retry later
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         print(f"OpenAI API Error: {str(e)}")
+        ERRORS.inc("chat")
         raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
 
+# Offline batches: leads worked on at once by default, and the largest batch accepted
+CHAT_BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "8"))
+CHAT_BATCH_MAX_ITEMS = int(os.getenv("CHAT_BATCH_MAX_ITEMS", "10000"))
+CHAT_BATCH_ATTEMPTS = 3
+
+async def batch_turn(conversation: ConversationMessage):
+    """One batch item, waiting out LLM back-pressure instead of failing on it
+    
+    Batches are offline work, so they run at background priority and never
+    take LLM slots from interactive chat or calls.
+    """
+    for attempt in range(1, CHAT_BATCH_ATTEMPTS + 1):
+        try:
+            return await generate_reply(conversation, priority=BACKGROUND)
+        except Overloaded as e:
+            if attempt == CHAT_BATCH_ATTEMPTS:
+                raise
+            await asyncio.sleep(e.retry_after)
+
+async def chat_batch(messages: List[ConversationMessage], concurrency: Optional[int] = None) -> AsyncIterator[Dict]:
+    """Answer many messages concurrently, yielding each result as it completes
+    
+    Each lead's messages are answered in the order given; up to
+    `concurrency` leads (CHAT_BATCH_CONCURRENCY by default) at a time.
+    Results carry the item's index; failed items carry an error and status
+    code instead of a reply.
+    """
+    results = run_batch(messages, batch_turn, key=lambda item: item.lead_id, concurrency=concurrency or CHAT_BATCH_CONCURRENCY)
+    async for index, result, error in results:
+        if error is None:
+            TURNS.inc("batch")
+            yield {"index": index, **result}
+            continue
+        ERRORS.inc("chat_batch")
+        if isinstance(error, HTTPException):
+            status_code, detail = error.status_code, error.detail
+        else:
+            status_code, detail = (429 if isinstance(error, Overloaded) else 500), str(error)
+        yield {"index": index, "lead_id": messages[index].lead_id, "error": detail, "status_code": status_code}
+
+@app.post("/conversation/chat/batch")
+async def chat_with_leads_batch(batch: ChatBatchRequest):
+    """Answer many customer messages, streaming one NDJSON result line per message as it completes"""
+    if len(batch.messages) > CHAT_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batches are limited to {CHAT_BATCH_MAX_ITEMS} messages")
+    
+    async def lines():
+        async for result in chat_batch(batch.messages, batch.concurrency):
+            yield json.dumps(result) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+async def stream_chat_with_lead(conversation: ConversationMessage, draft: Optional[StreamedDraft] = None):
+    """Stream the AI response sentence by sentence, recording it once complete
+    
+    A claimed `draft` is spoken as it is generated; if it fails before its
+    first sentence the reply is generated afresh.
+    """
+    with stage("lead_lookup"):
+        lead = find_lead(conversation.lead_id)
+    
+    sentences = []
+    if draft is not None:
+        try:
+            async for sentence in draft.replay():
+                sentences.append(sentence)
+                yield sentence
+        except Exception as e:
+            if sentences:
+                raise
+            print(f"⚠️ Speculative reply failed, generating again: {str(e)}")
+    
+    if not sentences:
+        with stage("cache_lookup"):
+            cache_key, cached_reply = await lookup_cached_reply(conversation, lead)
+        if cached_reply is not None:
+            deltas = replay(cached_reply)
+        else:
+            with stage("prompt"):
+                messages = await build_messages(lead, conversation.message)
+            # The caller gives up on a turn after VOICE_MAX_WAIT, so the model must too
+            deltas = llm_client.stream(messages, max_tokens=200, temperature=0.7, deadline=VOICE_MAX_WAIT, priority=VOICE)
+        
+        async for sentence in iter_sentences(deltas):
+            sentences.append(sentence)
+            yield sentence
+        if cached_reply is None:
+            store_cached_reply(cache_key, lead, " ".join(sentences))
+    
+    ai_response = " ".join(sentences)
+    with stage("history_write"):
+        await record_turn(conversation.lead_id, conversation.message, ai_response)
+
+@app.get("/llm/status")
+def get_llm_status():
+    """LLM admission queues per priority class and backend circuit breaker states"""
+    return {"admission": llm_client.admission.stats(), "backends": llm_client.health()}
+
+@app.get("/conversation/cache")
+def get_response_cache_stats():
+    """Response cache size and hit/miss counters"""
+    return response_cache.stats()
+
+@app.delete("/conversation/cache")
+def clear_response_cache():
+    """Drop all cached responses"""
+    response_cache.clear()
+    return {"message": "Response cache cleared"}
+
+HISTORY_PAGE_MAX = 1000
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+def encode_cursor(seq: int) -> str:
+    return base64.urlsafe_b64encode(f"seq:{seq}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        text = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        if not text.startswith("seq:"):
+            raise ValueError(text)
+        return int(text[4:])
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match", "")
+    # Weak comparison, as If-None-Match uses: W/ prefixes are ignored
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
+
 @app.get("/conversation/history/{lead_id}")
-def get_conversation_history(lead_id: str):
-    """Get conversation history for a specific lead"""
-    if lead_id not in conversation_history:
+def get_conversation_history(
+    lead_id: str,
+    request: Request,
+    response: Response,
+    since: Optional[int] = Query(None, ge=0),
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, gt=0, le=HISTORY_PAGE_MAX),
+):
+    """Get conversation history for a specific lead
+    
+    `since` returns only messages from that sequence number on, e.g. the
+    total_messages seen at the last sync. With `limit` the messages come in
+    pages; pass next_cursor back as `cursor` for the next one. Responses
+    carry a weak ETag naming the transcript version, whatever the paging,
+    so a poller that sends it back as If-None-Match gets 304 Not Modified
+    without the transcript being read while nothing has changed.
+    """
+    total, version = conversation_store.version(lead_id)
+    if not total:
         return {"conversation_history": [], "message": "No conversation history found for this lead"}
     
+    etag = f'W/"{version}"'
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    start = decode_cursor(cursor) if cursor else (since or 0)
+    end = min(start + limit, total) if limit else total
+    history = conversation_store.messages_between(lead_id, start, end) if start < end else []
+    response.headers["ETag"] = etag
     return {
         "lead_id": lead_id,
-        "conversation_history": conversation_history[lead_id],
-        "total_messages": len(conversation_history[lead_id])
+        "conversation_history": history,
+        "total_messages": total,
+        "start": start,
+        "next_cursor": encode_cursor(end) if end < total else None,
     }
 
+@app.get("/conversation/export")
+def export_conversations():
+    """Every stored message as newline-delimited JSON, streamed from storage"""
+    def chunks():
+        # Lines are sent in ~64 KiB chunks rather than one write per message
+        lines, size = [], 0
+        for lead_id, seq, message in conversation_store.export():
+            line = json.dumps({"lead_id": lead_id, "seq": seq, **message}) + "\n"
+            lines.append(line)
+            size += len(line)
+            if size >= EXPORT_CHUNK_BYTES:
+                yield "".join(lines)
+                lines, size = [], 0
+        if lines:
+            yield "".join(lines)
+    
+    return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
 @app.delete("/conversation/history/{lead_id}")
 def clear_conversation_history(lead_id: str):
     """Clear conversation history for a specific lead"""
-    if lead_id in conversation_history:
-        del conversation_history[lead_id]
+    if conversation_store.clear(lead_id):
         return {"message": f"Conversation history cleared for lead {lead_id}"}
     else:
         raise HTTPException(status_code=404, detail="No conversation history found for this lead")
@@ -190,35 +752,60 @@ def clear_conversation_history(lead_id: str):
 @app.get("/customer/phone/{lead_id}")
 def get_customer_phone(lead_id: str):
     """Get customer phone number for call initiation"""
-    for lead in mock_leads:
-        if lead["id"] == lead_id:
-            return {
-                "lead_id": lead_id,
-                "customer_name": lead["name"],
-                "phone_number": lead["phone"],
-                "company": lead["company"]
-            }
-    raise HTTPException(status_code=404, detail="Lead not found")
+    lead = find_lead(lead_id)
+    return {
+        "lead_id": lead_id,
+        "customer_name": lead["name"],
+        "phone_number": lead["phone"],
+        "company": lead["company"]
+    }
+
+def dial_lead(lead_id: str):
+    """Place an outbound call to a lead, returning the Twilio call SID"""
+    # Get customer info
+    customer_info = get_customer_phone(lead_id)
+    
+    # Create webhook URL for this call
+    webhook_base_url = os.getenv("WEBHOOK_BASE_URL")
+    if not webhook_base_url:
+        raise HTTPException(status_code=500, detail="WEBHOOK_BASE_URL not configured. Please set it in your .env file.")
+    
+    webhook_url = f"{webhook_base_url}/voice/gather?lead_id={lead_id}"
+    
+    if phrase_audio:
+        # Queues the greeting's audio, usually ready by the time the call is answered
+        greeting_twiml(lead_id)
+    
+    # Make the call
+    return twilio_client.make_call(
+        to_number=customer_info["phone_number"],
+        webhook_url=webhook_url,
+        status_callback=f"{webhook_base_url}/voice/status"
+    )
+
+async def prewarm_call(lead_id: str):
+    """Get the first webhooks of a call ready while the phone is ringing
+    
+    Renders the greeting TwiML, compiles the lead's system prompt, loads
+    the conversation into memory and opens an LLM connection, so the first
+    /voice/gather and /voice/process-speech skip those setup costs.
+    """
+    try:
+        with stage("prewarm"):
+            greeting_twiml(lead_id)
+            prompt_cache.system_prompt(find_lead(lead_id))
+            await asyncio.to_thread(conversation_store.tail, lead_id)
+        await llm_client.warm()
+    except Exception as e:
+        print(f"⚠️ Pre-warm for {lead_id} failed: {str(e)}")
 
 @app.post("/voice/initiate-call/{lead_id}")
-def initiate_call(lead_id: str):
+async def initiate_call(lead_id: str):
     """Initiate a voice call to the customer"""
     try:
-        # Get customer info
         customer_info = get_customer_phone(lead_id)
-        
-        # Create webhook URL for this call
-        webhook_base_url = os.getenv("WEBHOOK_BASE_URL")
-        if not webhook_base_url:
-            raise HTTPException(status_code=500, detail="WEBHOOK_BASE_URL not configured. Please set it in your .env file.")
-        
-        webhook_url = f"{webhook_base_url}/voice/gather?lead_id={lead_id}"
-        
-        # Make the call
-        call_sid = twilio_client.make_call(
-            to_number=customer_info["phone_number"],
-            webhook_url=webhook_url
-        )
+        # Dial (a blocking Twilio request, paced with campaign calls) while warming up for the call
+        call_sid, _ = await asyncio.gather(campaign_dialer.place_call(lead_id), prewarm_call(lead_id))
         
         return {
             "message": "Call initiated successfully",
@@ -230,6 +817,83 @@ def initiate_call(lead_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error initiating call: {str(e)}")
 
+@app.post("/campaigns")
+async def create_campaign(request: CampaignRequest):
+    """Start dialing a list of leads, or every lead matching a filter"""
+    if request.lead_ids is not None:
+        lead_ids = request.lead_ids
+    elif request.company or request.inquiry_contains:
+        lead_ids = lead_store.find_ids(company=request.company, inquiry_contains=request.inquiry_contains)
+    else:
+        raise HTTPException(status_code=400, detail="Provide lead_ids or a company/inquiry_contains filter")
+    
+    campaign = campaign_dialer.start(
+        lead_ids,
+        concurrency=request.concurrency,
+        calls_per_second=request.calls_per_second,
+        max_attempts=request.max_attempts,
+    )
+    return campaign.progress()
+
+def find_campaign(campaign_id: str):
+    campaign = campaign_dialer.get(campaign_id)
+    if not campaign:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return campaign
+
+@app.get("/campaigns")
+def list_campaigns():
+    """Progress of every campaign"""
+    return {"campaigns": [campaign.progress() for campaign in campaign_dialer.all_campaigns()]}
+
+@app.get("/campaigns/{campaign_id}")
+def get_campaign(campaign_id: str, include_results: bool = False):
+    """Campaign progress, optionally with per-lead call results"""
+    campaign = find_campaign(campaign_id)
+    progress = campaign.progress()
+    if include_results:
+        progress["results"] = campaign.results
+    return progress
+
+@app.post("/campaigns/{campaign_id}/pause")
+def pause_campaign(campaign_id: str):
+    campaign = find_campaign(campaign_id)
+    campaign_dialer.pause(campaign)
+    return campaign.progress()
+
+@app.post("/campaigns/{campaign_id}/resume")
+def resume_campaign(campaign_id: str):
+    campaign = find_campaign(campaign_id)
+    campaign_dialer.resume(campaign)
+    return campaign.progress()
+
+@app.post("/campaigns/{campaign_id}/cancel")
+def cancel_campaign(campaign_id: str):
+    campaign = find_campaign(campaign_id)
+    campaign_dialer.cancel(campaign)
+    return campaign.progress()
+
+def greeting_twiml(lead_id: str, action: str = "/voice/process-speech?turn=1") -> str:
+    """Opening TwiML for a call with this lead"""
+    # Get customer info
+    with stage("lead_lookup"):
+        customer_info = get_customer_phone(lead_id)
+    print(f"🔍 Customer info: {customer_info}")
+    
+    # Create greeting message with SSML for natural speech
+    greeting = f"""<speak>
+            Hello {customer_info['customer_name']}, this is Sarah from Formlabs. 
+            <break time="0.5s"/>
+            I noticed you showed interest in our 3D printers. 
+            <break time="0.3s"/>
+            I'd love to learn more about your needs and see how we can help you achieve your goals. 
+            <break time="0.5s"/>
+            What specific applications are you looking to use 3D printing for?
+        </speak>"""
+    
+    # Greetings only depend on the lead, so render once
+    return twilio_client.cached_gather_response(greeting, action=action)
+
 @app.post("/voice/gather")
 async def gather_speech(request: Request, lead_id: str = Form(None)):
     """Initial greeting and speech gathering"""
@@ -242,38 +906,110 @@ async def gather_speech(request: Request, lead_id: str = Form(None)):
             lead_id = request.query_params.get("lead_id")
             print(f"🔍 Got lead_id from query params: {lead_id}")
         
+        if not lead_id:
+            # A redirected call may already be bound to a lead
+            lead_id = await call_lead_id(request)
+        
+        if not lead_id:
+            # Match the caller's phone number against known leads
+            lead_id = await caller_lead_id(request)
+            print(f"🔍 Matched lead_id from caller number: {lead_id}")
+        
         if not lead_id:
             # Default to lead_001 if no lead_id provided
             lead_id = "lead_001"
             print(f"🔍 Using default lead_id: {lead_id}")
         
-        # Get customer info
-        customer_info = get_customer_phone(lead_id)
-        print(f"🔍 Customer info: {customer_info}")
-        
-        # Create greeting message with SSML for natural speech
-        greeting = f"""<speak>
-            Hello {customer_info['customer_name']}, this is Sarah from Formlabs. 
-            <break time="0.5s"/>
-            I noticed you showed interest in our 3D printers. 
-            <break time="0.3s"/>
-            I'd love to learn more about your needs and see how we can help you achieve your goals. 
-            <break time="0.5s"/>
-            What specific applications are you looking to use 3D printing for?
-        </speak>"""
+        await bind_call(request, lead_id)
         
-        # Create TwiML response
-        twiml_response = twilio_client.create_gather_response(greeting)
+        # Greeting TwiML (usually already rendered by the pre-warm in initiate_call,
+        # which assumes it is the call's first gather: turn 1)
+        twiml_response = greeting_twiml(lead_id, action=await next_gather_action(request))
         print(f"🔍 TwiML response created successfully")
         
         return Response(content=twiml_response, media_type="application/xml")
         
     except Exception as e:
         print(f"❌ Error in gather endpoint: {str(e)}")
+        ERRORS.inc("gather")
+        FALLBACKS.inc("technical_difficulties")
         # Return a simple error response instead of raising HTTPException
-        error_response = twilio_client.create_final_response("I apologize for the technical difficulties. Please call us back later. Thank you!")
+        error_response = twilio_client.cached_final_response(TECHNICAL_DIFFICULTIES)
         return Response(content=error_response, media_type="application/xml")
 
+async def speech_turn_key(request: Request) -> str:
+    """Identifies one caller answer: the CallSid and the Gather's turn number"""
+    form = await request.form()
+    return f"{form.get('CallSid')}:{request.query_params.get('turn')}"
+
+@app.post("/voice/partial-speech")
+async def partial_speech(request: Request):
+    """Twilio partialResultCallback: draft a reply while the caller is still speaking"""
+    form = await request.form()
+    if not form.get("CallSid"):
+        return Response(status_code=204)
+    text = form.get("StableSpeechResult") or ""
+    try:
+        stability = float(form.get("Stability") or 0)
+    except ValueError:
+        stability = 0.0
+    if stability >= SPECULATION_MIN_STABILITY:
+        text = f"{text} {form.get('UnstableSpeechResult') or ''}".strip()
+    
+    lead_id = await call_lead_id(request)
+    if lead_id and text:
+        lead = lead_store.get(lead_id)
+        if lead:
+            speculative_replies.offer(
+                await speech_turn_key(request),
+                text,
+                lambda partial: draft_sentences(ConversationMessage(message=partial, lead_id=lead_id), lead),
+            )
+    return Response(status_code=204)
+
+@app.get("/voice/speculation")
+def get_speculation_stats():
+    """Speculative reply outcomes and hit rate"""
+    return speculative_replies.stats()
+
+@app.get("/voice/audio")
+def get_phrase_audio_stats():
+    """Pre-synthesized phrase audio: TTS backend, phrases rendered and queued"""
+    if not phrase_audio:
+        return {"enabled": False}
+    return {"enabled": True, **phrase_audio.stats()}
+
+@app.get("/voice/audio/{filename}")
+def get_phrase_audio(filename: str, request: Request):
+    """Pre-synthesized phrase audio for <Play>, with ETag revalidation and byte ranges"""
+    found = phrase_audio.open(filename) if phrase_audio else None
+    if not found:
+        raise HTTPException(status_code=404, detail="Audio not found")
+    path, media_type = found
+    # File names are hashes of the audio, so they never change: a strong ETag
+    etag = f'"{filename.partition(".")[0]}"'
+    headers = {"ETag": etag, "Accept-Ranges": "bytes", "Cache-Control": "public, max-age=31536000, immutable"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    with open(path, "rb") as audio_file:
+        audio = audio_file.read()
+    range_header = request.headers.get("range")
+    # If-Range: a client holding other bytes than these gets the whole file
+    if range_header and request.headers.get("if-range", etag) == etag:
+        try:
+            span = byte_range(range_header, len(audio))
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{len(audio)}"})
+        if span:
+            start, end = span
+            return Response(
+                content=audio[start:end + 1],
+                status_code=206,
+                media_type=media_type,
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{len(audio)}"},
+            )
+    return Response(content=audio, media_type=media_type, headers=headers)
+
 @app.post("/voice/process-speech")
 async def process_speech(
     request: Request,
@@ -281,10 +1017,27 @@ async def process_speech(
     SpeechResult: str = Form(None)
 ):
     """Process speech input and generate AI response"""
+    # Gather actions carry a turn number; without one, a retry repeats the same speech
+    turn = request.query_params.get("turn")
+    if turn:
+        turn_key = f"speech:{turn}"
+    else:
+        turn_key = "speech:" + hashlib.sha1((SpeechResult or "").encode()).hexdigest()[:12]
+    return await idempotent_twiml(request, turn_key, lambda: answer_speech(request, lead_id, SpeechResult))
+
+async def answer_speech(request: Request, lead_id: Optional[str], SpeechResult: Optional[str]):
     # If lead_id is not in form data, try to get it from query parameters
     if not lead_id:
         lead_id = request.query_params.get("lead_id")
     
+    if not lead_id:
+        # Use the lead bound to this call when /voice/gather answered it
+        lead_id = await call_lead_id(request)
+    
+    if not lead_id:
+        # Match the caller's phone number against known leads
+        lead_id = await caller_lead_id(request)
+    
     if not lead_id:
         # Default to lead_001 if no lead_id provided
         lead_id = "lead_001"
@@ -295,26 +1048,220 @@ async def process_speech(
         if not SpeechResult:
             # No speech detected, ask to repeat
             print("🔍 No speech detected, asking to repeat")
-            twiml_response = twilio_client.create_gather_response("I didn't catch that. Could you please repeat your question?")
+            FALLBACKS.inc("no_speech")
+            twiml_response = twilio_client.cached_gather_response(
+                NOT_HEARD,
+                action=await next_gather_action(request),
+            )
             return Response(content=twiml_response, media_type="application/xml")
         
         # Generate AI response
         print(f"🔍 Generating AI response for: {SpeechResult}")
         conversation = ConversationMessage(message=SpeechResult, lead_id=lead_id)
-        chat_result = chat_with_lead(conversation)
         
-        # Create voice response
-        print(f"🔍 AI response: {chat_result['ai_response']}")
-        twiml_response = twilio_client.create_gather_response(chat_result["ai_response"])
-        
-        return Response(content=twiml_response, media_type="application/xml")
+        TURNS.inc("voice")
+        # A reply drafted from the caller's interim transcript, if it still matches
+        draft = speculative_replies.claim(await speech_turn_key(request), SpeechResult)
+        form = await request.form()
+        start_seq, gather_action = await asyncio.gather(
+            asyncio.to_thread(conversation_store.length, lead_id), next_gather_action(request)
+        )
+        # Generate in the background so a slow reply becomes a brief hold
+        # instead of a webhook timeout
+        reply = stream_chat_with_lead(conversation, draft) if VOICE_STREAMING else whole_reply(conversation, draft)
+        turn = voice_turns.start(
+            lead_id, reply, call_sid=form.get("CallSid"), start_seq=start_seq, gather_action=gather_action
+        )
+        return await voice_turn_response(turn, wait=VOICE_HOLD_AFTER)
         
     except Exception as e:
         print(f"❌ Error in process_speech endpoint: {str(e)}")
+        ERRORS.inc("process_speech")
+        FALLBACKS.inc("technical_difficulties")
         # Error handling - end call gracefully
-        twiml_response = twilio_client.create_final_response("I apologize for the technical difficulties. Please call us back later. Thank you!")
+        twiml_response = twilio_client.cached_final_response(TECHNICAL_DIFFICULTIES)
         return Response(content=twiml_response, media_type="application/xml")
 
+async def whole_reply(conversation: ConversationMessage, draft: Optional[StreamedDraft] = None):
+    """The complete AI reply as a single chunk, for voice turns without streaming"""
+    chat_result = await generate_reply(conversation, deadline=VOICE_MAX_WAIT, priority=VOICE, draft=draft)
+    print(f"🔍 AI response: {chat_result['ai_response']}")
+    yield chat_result["ai_response"]
+
+async def voice_turn_response(turn, wait: float):
+    """Speak whatever sentences are ready, redirecting back for the rest
+    
+    If nothing is ready within `wait` seconds the caller is put on hold (a
+    filler phrase the first time, just a pause after that) and Twilio is
+    redirected back to /voice/continue to pick up the reply.
+    """
+    sentences = await turn.next_sentences(timeout=wait)
+    if turn.error and not sentences:
+        voice_turns.finish(turn.turn_id)
+        raise turn.error
+    
+    message = " ".join(sentences)
+    turn.parts += 1
+    continue_url = continue_turn_url(turn.lead_id, turn.turn_id, turn.start_seq, turn.parts)
+    if turn.finished:
+        # Last part of the reply: listen for the customer's answer
+        voice_turns.finish(turn.turn_id)
+        twiml_response = twilio_client.create_gather_response(message, action=turn.gather_action)
+    elif sentences:
+        twiml_response = twilio_client.create_say_redirect_response(message, continue_url)
+    elif time.monotonic() - turn.created_at > VOICE_MAX_WAIT:
+        print(f"❌ Voice turn {turn.turn_id} still not ready after {VOICE_MAX_WAIT:.0f}s")
+        voice_turns.abandon(turn.turn_id)
+        FALLBACKS.inc("llm_timeout")
+        twiml_response = twilio_client.cached_final_response(TECHNICAL_DIFFICULTIES)
+    else:
+        HANDOFFS.inc("pause" if turn.handed_off else "filler")
+        filler = "" if turn.handed_off else random.choice(HOLD_PHRASES)
+        turn.handed_off = True
+        twiml_response = twilio_client.create_hold_response(continue_url, filler)
+    
+    return Response(content=twiml_response, media_type="application/xml")
+
+@app.post("/voice/continue")
+async def continue_speech(request: Request):
+    """Speak the next sentences of a streaming AI response"""
+    turn_id = request.query_params.get("turn")
+    part = request.query_params.get("part")
+    if not part:
+        return await continue_turn(request, turn_id)
+    return await idempotent_twiml(request, f"continue:{turn_id}:{part}", lambda: continue_turn(request, turn_id))
+
+def continue_turn_url(lead_id: str, turn_id: str, start_seq: int, part: int) -> str:
+    return f"/voice/continue?lead_id={lead_id}&turn={turn_id}&seq={start_seq}&part={part}"
+
+async def publish_voice_turn(turn):
+    """Keep a generated reply in the call's shared state for the other workers"""
+    if not turn.call_sid:
+        return
+    published = {"sentences": turn.generated, "spoken": turn.spoken, "gather_action": turn.gather_action}
+    
+    def remember(state):
+        state = dict(state or {})
+        turns = dict(state.get("voice_turns") or {})
+        turns[turn.turn_id] = published
+        state["voice_turns"] = dict(list(turns.items())[-WEBHOOK_RESPONSES_KEPT:])
+        return state
+    
+    await asyncio.to_thread(conversation_store.update_call, turn.call_sid, remember)
+
+async def reply_from_elsewhere(request: Request, turn_id: str, seen_recorded: bool):
+    """(text, gather action) of a turn generated by another worker, or None if not ready
+    
+    Prefers the unspoken rest of the reply that worker published; falls back
+    to the reply recorded in the conversation history at the turn's seq,
+    once it has been seen twice, so a publish just behind it wins.
+    Returns "recorded" when only the history has it so far.
+    """
+    form = await request.form()
+    call_sid = form.get("CallSid")
+    if call_sid:
+        state = await asyncio.to_thread(conversation_store.call, call_sid) or {}
+        published = (state.get("voice_turns") or {}).get(turn_id)
+        if published and published["sentences"][published["spoken"]:]:
+            return " ".join(published["sentences"][published["spoken"]:]), published["gather_action"]
+    lead_id = request.query_params.get("lead_id")
+    seq = request.query_params.get("seq") or ""
+    if lead_id and seq.isdigit():
+        recorded = await asyncio.to_thread(conversation_store.messages_between, lead_id, int(seq), int(seq) + 2)
+        if len(recorded) == 2 and recorded[1]["role"] == "assistant":
+            if seen_recorded or not call_sid:
+                return recorded[1]["content"], None
+            return "recorded"
+    return None
+
+async def continue_elsewhere(request: Request, turn_id: Optional[str]):
+    """/voice/continue for a turn this worker does not have
+    
+    With several workers the redirect can land on one that never saw the
+    turn. It speaks the reply once the worker generating it has finished
+    (see reply_from_elsewhere), holding the caller meanwhile for up to
+    VOICE_MAX_WAIT. Turns with no trace anywhere get "say that again".
+    """
+    seq = request.query_params.get("seq") or ""
+    try:
+        part = int(request.query_params.get("part") or 0)
+    except ValueError:
+        part = 0
+    deadline = time.monotonic() + VOICE_HOLD_POLL
+    seen_recorded = False
+    while turn_id and seq.isdigit():
+        found = await reply_from_elsewhere(request, turn_id, seen_recorded)
+        if isinstance(found, tuple):
+            message, action = found
+            print(f"🔍 Voice turn {turn_id} finished on another worker, speaking it here")
+            twiml_response = twilio_client.create_gather_response(message, action=action or await next_gather_action(request))
+            return Response(content=twiml_response, media_type="application/xml")
+        seen_recorded = found == "recorded"
+        if time.monotonic() >= deadline:
+            if part * (VOICE_HOLD_POLL + 1) < VOICE_MAX_WAIT:
+                HANDOFFS.inc("pause")
+                continue_url = continue_turn_url(request.query_params.get("lead_id"), turn_id, int(seq), part + 1)
+                return Response(content=twilio_client.create_hold_response(continue_url), media_type="application/xml")
+            break
+        await asyncio.sleep(0.25)
+    
+    # Turn expired or unknown: go back to listening
+    print(f"🔍 Unknown voice turn {turn_id}, asking to repeat")
+    FALLBACKS.inc("unknown_turn")
+    twiml_response = twilio_client.cached_gather_response(SAY_AGAIN, action=await next_gather_action(request))
+    return Response(content=twiml_response, media_type="application/xml")
+
+async def continue_turn(request: Request, turn_id: Optional[str]):
+    try:
+        turn = voice_turns.get(turn_id)
+        if not turn:
+            return await continue_elsewhere(request, turn_id)
+        
+        return await voice_turn_response(turn, wait=VOICE_HOLD_POLL)
+        
+    except Exception as e:
+        print(f"❌ Error in continue endpoint: {str(e)}")
+        ERRORS.inc("continue")
+        FALLBACKS.inc("technical_difficulties")
+        twiml_response = twilio_client.cached_final_response(TECHNICAL_DIFFICULTIES)
+        return Response(content=twiml_response, media_type="application/xml")
+
+@app.post("/voice/status")
+async def call_status(request: Request):
+    """Twilio call status callback: queue finished calls for post-call analysis"""
+    form = await request.form()
+    call_sid = form.get("CallSid")
+    if not call_sid or form.get("CallStatus") != "completed":
+        return {"status": "ignored"}
+    
+    state = await asyncio.to_thread(conversation_store.call, call_sid) or {}
+    lead_id = state.get("lead_id")
+    if not lead_id:
+        # The call ended before reaching the greeting
+        return {"status": "ignored"}
+    
+    end_seq = await asyncio.to_thread(conversation_store.length, lead_id)
+    queued = await call_analyzer.submit(call_sid, lead_id, state.get("start_seq", 0), end_seq)
+    return {"status": "queued" if queued else "duplicate"}
+
+@app.get("/calls/{call_sid}/analysis")
+def get_call_analysis(call_sid: str):
+    """Post-call analysis of a finished call (status "pending" until analyzed)"""
+    analysis = call_analyzer.store.get(call_sid)
+    if not analysis:
+        raise HTTPException(status_code=404, detail="Call not found")
+    return analysis
+
+@app.get("/leads/{lead_id}/analyses")
+def get_lead_analyses(lead_id: str):
+    """Post-call analyses of every finished call with a lead, oldest first"""
+    return {"lead_id": lead_id, "calls": call_analyzer.store.for_lead(lead_id)}
+
+@app.get("/analysis/stats")
+async def get_analysis_stats():
+    """Post-call analysis queue and worker status"""
+    return await call_analyzer.stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
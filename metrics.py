@@ -0,0 +1,223 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Minimal Prometheus-format metrics with per-stage latency timing. Metrics are
+# plain in-process counters and fixed-bucket histograms, so recording a value
+# is a dict lookup plus a bisect; rendering happens only when /metrics is
+# scraped.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Stage timings recorded while handling the current request, for Server-Timing
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+_registry: List["Metric"] = []
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"] + self.samples()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in values]
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series_items = [(labels, list(series)) for labels, series in self._series.items()]
+        lines = []
+        for labels, series in series_items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                le_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+class CallbackMetric(Metric):
+    """Gauge or counter whose values are read from a function at scrape time"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        collect: Callable[[], Dict[Tuple[str, ...], float]],
+        labelnames: Tuple[str, ...] = (),
+        metric_type: str = "gauge",
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.type = metric_type
+        self.collect = collect
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in self.collect().items()]
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+STAGE_SECONDS = Histogram("sales_agent_stage_seconds", "Time spent in each stage of handling a turn", ("stage",))
+REQUEST_SECONDS = Histogram("sales_agent_request_seconds", "End-to-end request latency by route", ("route",))
+TURNS = Counter("sales_agent_turns_total", "Conversation turns answered", ("channel",))
+ERRORS = Counter("sales_agent_errors_total", "Errors raised while handling requests", ("endpoint",))
+FALLBACKS = Counter("sales_agent_fallbacks_total", "Canned voice responses sent instead of an AI reply", ("reason",))
+HANDOFFS = Counter("sales_agent_voice_handoffs_total", "Slow voice turns where the caller was asked to hold", ("stage",))
+WEBHOOK_RETRIES = Counter("sales_agent_webhook_retries_total", "Retried webhooks answered without redoing the work", ("outcome",))
+LLM_TOKENS = Counter("sales_agent_llm_tokens_total", "LLM tokens used", ("kind",))
+LLM_REQUESTS = Counter("sales_agent_llm_requests_total", "LLM requests by backend and outcome", ("backend", "outcome"))
+LLM_HEDGES = Counter("sales_agent_llm_hedges_total", "Second requests raced against a slow LLM request", ("outcome",))
+LLM_DEADLINES = Counter("sales_agent_llm_deadline_exceeded_total", "LLM calls that ran out of time before any backend answered")
+LLM_QUEUE_SECONDS = Histogram("sales_agent_llm_queue_seconds", "Time LLM requests waited for admission", ("priority",))
+LLM_SHED = Counter("sales_agent_llm_shed_total", "LLM requests rejected for lack of capacity", ("priority", "reason"))
+SPECULATIONS = Counter("sales_agent_voice_speculations_total", "Replies drafted from partial speech results, by outcome", ("outcome",))
+ANALYSIS_CALLS = Counter("sales_agent_call_analyses_total", "Finished calls analyzed, by outcome", ("status",))
+ANALYSIS_LAG_SECONDS = Histogram(
+    "sales_agent_call_analysis_lag_seconds",
+    "Time from a call ending to its analysis being stored",
+    buckets=(1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0),
+)
+ANALYSIS_BATCH_SIZE = Histogram(
+    "sales_agent_call_analysis_batch_size",
+    "Calls analyzed per LLM request",
+    buckets=(1, 2, 4, 8, 16, 32),
+)
+PHRASE_AUDIO = Counter(
+    "sales_agent_phrase_audio_total",
+    "Fixed voice phrase lookups and renders of their pre-synthesized audio, by outcome",
+    ("outcome",),
+)
+PHRASE_TTS_SECONDS = Histogram("sales_agent_phrase_tts_seconds", "Time to synthesize one fixed voice phrase")
+
+def record_stage(stage_name: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage_name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage_name, seconds))
+
+@contextmanager
+def stage(stage_name: str):
+    """Time a block as one stage of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage_name, time.perf_counter() - started)
+
+def timed(stage_name: str):
+    """Decorator form of stage() for synchronous functions"""
+    def decorator(function):
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record_stage(stage_name, time.perf_counter() - started)
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+        return wrapper
+    return decorator
+
+def server_timing_header(timings: List[Tuple[str, float]], total: float) -> str:
+    durations: Dict[str, float] = {}
+    for stage_name, seconds in timings:
+        durations[stage_name] = durations.get(stage_name, 0) + seconds
+    parts = [f"{stage_name};dur={seconds * 1000:.1f}" for stage_name, seconds in durations.items()]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency and adding Server-Timing headers
+
+    Server-Timing is only added to responses whose path starts with one of
+    `server_timing_prefixes` (the Twilio webhooks).
+    """
+
+    def __init__(self, app, server_timing_prefixes: Tuple[str, ...] = ("/voice/",)):
+        self.app = app
+        self.server_timing_prefixes = server_timing_prefixes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings: List[Tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        add_header = scope["path"].startswith(self.server_timing_prefixes)
+
+        async def send_with_timing(message):
+            if add_header and message["type"] == "http.response.start":
+                header = server_timing_header(timings, time.perf_counter() - started)
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(time.perf_counter() - started, route.path if route else "unmatched")
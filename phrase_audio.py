@@ -0,0 +1,318 @@
+import array
+import base64
+import hashlib
+import io
+import math
+import os
+import re
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+import logging
+
+from metrics import PHRASE_AUDIO, PHRASE_TTS_SECONDS
+from twiml import VOICE
+
+logger = logging.getLogger(__name__)
+
+# Pre-synthesized audio for the phrases every call repeats (greetings,
+# goodbyes, "I didn't catch that", apologies, hold fillers). Each phrase is
+# rendered once through a TTS backend, stored under the hash of its audio and
+# played with <Play> instead of being synthesized again by <Say> on every
+# call. Files never change once written, so they are served with strong
+# ETags and long-lived cache headers. The default backend renders with the
+# same Google voice <Say> uses for generated replies, so a call never
+# switches voices between fixed phrases and replies. Phrases written in SSML
+# (the greeting's pauses) go to backends that support it as SSML; the
+# others get the plain text.
+
+# <Say> voice "Google.en-US-Neural2-F" is Cloud Text-to-Speech voice "en-US-Neural2-F"
+SAY_VOICE = VOICE.split(".", 1)[-1]
+SSML_TAG = re.compile(r"<[^>]+>")
+AUDIO_FILE = re.compile(r"^[0-9a-f]{32}\.(wav|mp3)$")
+CONTENT_TYPES = {"wav": "audio/wav", "mp3": "audio/mpeg"}
+
+def spoken_text(text: str) -> str:
+    """Phrase text without SSML markup or layout whitespace, for backends without SSML"""
+    return " ".join(SSML_TAG.sub(" ", text).split())
+
+def ssml_document(text: str) -> str:
+    """SSML phrase without layout whitespace, inside a <speak> root"""
+    text = " ".join(text.split())
+    return text if text.startswith("<speak") else f"<speak>{text}</speak>"
+
+class LocalTTS:
+    """Offline stand-in TTS for tests and benchmarks
+
+    Renders one short tone per word (8 kHz 16-bit mono WAV), the same audio
+    for the same text, after waiting `latency` seconds like a real service.
+    """
+
+    name = "local"
+    extension = "wav"
+    ssml = False
+    sample_rate = 8000
+
+    def __init__(self, voice: str = "tone", latency: float = 0.0):
+        self.voice = voice
+        self.latency = latency
+
+    def synthesize(self, text: str) -> bytes:
+        if self.latency:
+            time.sleep(self.latency)
+        samples = array.array("h")
+        word_samples = int(self.sample_rate * 0.25)
+        gap = [0] * int(self.sample_rate * 0.1)
+        for word in text.split():
+            frequency = 300 + int(hashlib.md5(word.encode()).hexdigest()[:4], 16) % 500
+            step = 2 * math.pi * frequency / self.sample_rate
+            samples.extend(int(8000 * math.sin(step * n)) for n in range(word_samples))
+            samples.extend(gap)
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as output:
+            output.setnchannels(1)
+            output.setsampwidth(2)
+            output.setframerate(self.sample_rate)
+            output.writeframes(samples.tobytes())
+        return buffer.getvalue()
+
+class GoogleTTS:
+    """Google Cloud Text-to-Speech (key GOOGLE_TTS_API_KEY), as MP3
+
+    Defaults to the voice <Say> uses, so fixed phrases sound like replies.
+    """
+
+    name = "google"
+    extension = "mp3"
+    ssml = True
+    endpoint = "https://texttospeech.googleapis.com/v1/text:synthesize"
+
+    def __init__(self, voice: Optional[str] = None, api_key: Optional[str] = None):
+        self.voice = voice or os.getenv("PHRASE_TTS_VOICE", SAY_VOICE)
+        self.api_key = api_key or os.getenv("GOOGLE_TTS_API_KEY")
+        self._client = None
+
+    def synthesize(self, text: str) -> bytes:
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.Client(timeout=30)
+        response = self._client.post(
+            self.endpoint,
+            params={"key": self.api_key},
+            json={
+                "input": {"ssml": text} if text.startswith("<speak") else {"text": text},
+                "voice": {"languageCode": "-".join(self.voice.split("-")[:2]), "name": self.voice},
+                "audioConfig": {"audioEncoding": "MP3"},
+            },
+        )
+        response.raise_for_status()
+        return base64.b64decode(response.json()["audioContent"])
+
+class OpenAITTS:
+    """OpenAI speech endpoint (PHRASE_TTS_MODEL, PHRASE_TTS_VOICE), as MP3
+
+    None of its voices is the <Say> voice, so using it needs
+    PHRASE_TTS_ALLOW_OTHER_VOICE=true.
+    """
+
+    name = "openai"
+    extension = "mp3"
+    ssml = False
+
+    def __init__(self, voice: Optional[str] = None, model: Optional[str] = None):
+        self.voice = voice or os.getenv("PHRASE_TTS_VOICE", "nova")
+        self.model = model or os.getenv("PHRASE_TTS_MODEL", "tts-1")
+        self._client = None
+
+    def synthesize(self, text: str) -> bytes:
+        if self._client is None:
+            # Imported on first use, like the LLM client, to keep cold starts fast
+            from openai import OpenAI
+
+            self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL"))
+        response = self._client.audio.speech.create(model=self.model, voice=self.voice, input=text, response_format="mp3")
+        return response.content
+
+TTS_BACKENDS = {"google": GoogleTTS, "local": LocalTTS, "openai": OpenAITTS}
+
+def byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """(first, last) byte of a single-range Range header, None to send the whole file
+
+    Malformed and multi-range headers are ignored; raises ValueError if the
+    range starts past the end of the file (416).
+    """
+    unit, _, spec = header.partition("=")
+    first, _, last = spec.strip().partition("-")
+    if unit.strip().lower() != "bytes" or not (first or last) or not (first + last).isdigit():
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        if int(last) == 0:
+            raise ValueError(header)
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError(header)
+    return start, min(int(last), size - 1) if last else size - 1
+
+class PhraseAudioCache:
+    """Phrase text -> URL of its pre-synthesized audio, rendering misses in the background
+
+    url() never waits for synthesis: a phrase without audio yet returns
+    None (the caller falls back to <Say>) and is queued for rendering, so
+    the next call plays it. prewarm() queues phrases known in advance.
+    Audio files are named by the hash of their content; index.tsv maps
+    each phrase (with backend and voice) to its file and is only appended to.
+    A backend voice other than the <Say> voice raises ValueError unless
+    allow_other_voice (PHRASE_TTS_ALLOW_OTHER_VOICE) is set.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        backend=None,
+        base_url: Optional[str] = None,
+        workers: Optional[int] = None,
+        allow_other_voice: Optional[bool] = None,
+    ):
+        self.directory = directory or os.getenv("PHRASE_AUDIO_DIR", "data/phrase_audio")
+        self.backend = backend or TTS_BACKENDS[os.getenv("PHRASE_TTS_BACKEND", "google")]()
+        if allow_other_voice is None:
+            allow_other_voice = os.getenv("PHRASE_TTS_ALLOW_OTHER_VOICE", "false").lower() == "true"
+        if (self.backend.name, self.backend.voice) != ("google", SAY_VOICE) and not allow_other_voice:
+            raise ValueError(
+                f"Phrase audio voice {self.backend.name}:{self.backend.voice} differs from the <Say> voice {VOICE}; "
+                "set PHRASE_TTS_ALLOW_OTHER_VOICE=true to use it anyway"
+            )
+        if base_url is None:
+            base_url = os.getenv("PHRASE_AUDIO_BASE_URL") or os.getenv("WEBHOOK_BASE_URL", "")
+        self.url_prefix = base_url.rstrip("/") + "/voice/audio/"
+        self.workers = workers or int(os.getenv("PHRASE_AUDIO_WORKERS", "2"))
+        # Seconds before a phrase that failed to render is tried again
+        self.retry_after = float(os.getenv("PHRASE_AUDIO_RETRY_AFTER", "60"))
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.index_path = os.path.join(self.directory, "index.tsv")
+        self._files: Dict[str, str] = {}
+        self._pending: Set[str] = set()
+        self._failed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, encoding="utf-8") as index:
+            for line in index:
+                key, _, filename = line.rstrip("\n").partition("\t")
+                if filename and os.path.exists(os.path.join(self.directory, filename)):
+                    self._files[key] = filename
+        logger.info(f"Loaded {len(self._files)} pre-synthesized phrases from {self.directory}")
+
+    def _prepare(self, text: str) -> str:
+        """What the backend is given for a phrase: SSML if it reads SSML, else plain text"""
+        if getattr(self.backend, "ssml", False) and SSML_TAG.search(text):
+            return ssml_document(text)
+        return spoken_text(text)
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.backend.name}\0{self.backend.voice}\0{text}".encode()).hexdigest()
+
+    def url(self, text: str) -> Optional[str]:
+        """URL to <Play> for a phrase, or None (and queue it) if not rendered yet"""
+        spoken = self._prepare(text)
+        filename = self._files.get(self._key(spoken))
+        if filename is not None:
+            PHRASE_AUDIO.inc("hit")
+            return self.url_prefix + filename
+        PHRASE_AUDIO.inc("miss")
+        self._queue(spoken)
+        return None
+
+    def prewarm(self, texts: Iterable[str]):
+        """Queue phrases for rendering ahead of the calls that use them"""
+        for text in texts:
+            spoken = self._prepare(text)
+            if self._key(spoken) not in self._files:
+                self._queue(spoken)
+
+    def _queue(self, spoken: str):
+        key = self._key(spoken)
+        with self._lock:
+            if key in self._pending or time.monotonic() < self._failed.get(key, 0):
+                return
+            self._pending.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="phrase-tts")
+        self._executor.submit(self._render, key, spoken)
+
+    def render(self, text: str) -> str:
+        """Synthesize and store a phrase now; returns its file name"""
+        spoken = self._prepare(text)
+        key = self._key(spoken)
+        filename = self._files.get(key)
+        if filename is None:
+            filename = self._store(key, spoken)
+        return filename
+
+    def _render(self, key: str, spoken: str):
+        try:
+            self._store(key, spoken)
+        except Exception as e:
+            logger.error(f"Synthesizing phrase {spoken[:40]!r} failed: {e}")
+            PHRASE_AUDIO.inc("failed")
+            with self._lock:
+                self._failed[key] = time.monotonic() + self.retry_after
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def _store(self, key: str, spoken: str) -> str:
+        started = time.perf_counter()
+        audio = self.backend.synthesize(spoken)
+        PHRASE_TTS_SECONDS.observe(time.perf_counter() - started)
+        filename = f"{hashlib.sha256(audio).hexdigest()[:32]}.{self.backend.extension}"
+        path = os.path.join(self.directory, filename)
+        if not os.path.exists(path):
+            temporary = f"{path}.{threading.get_ident()}.tmp"
+            with open(temporary, "wb") as output:
+                output.write(audio)
+            os.replace(temporary, path)
+        with self._lock:
+            with open(self.index_path, "a", encoding="utf-8") as index:
+                index.write(f"{key}\t{filename}\n")
+            self._files[key] = filename
+            self._failed.pop(key, None)
+        PHRASE_AUDIO.inc("rendered")
+        return filename
+
+    def open(self, filename: str) -> Optional[Tuple[str, str]]:
+        """(path, content type) of a stored audio file, None for unknown names"""
+        match = AUDIO_FILE.match(filename)
+        if not match:
+            return None
+        path = os.path.join(self.directory, filename)
+        if not os.path.exists(path):
+            return None
+        return path, CONTENT_TYPES[match.group(1)]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "backend": self.backend.name,
+                "voice": self.backend.voice,
+                "phrases": len(self._files),
+                "pending": len(self._pending),
+                "failed": len(self._failed),
+            }
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,299 @@
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Opt-in sampling profiler for live requests. A chosen share of requests (or
+# every request for one lead or CallSid) is profiled: while any is running, a
+# background thread snapshots the interpreter's stacks every `interval`
+# seconds and counts the ones belonging to a profiled request under that
+# request's route. Nothing is traced or hooked in between, so the cost is one
+# stack walk per interval while profiled requests are in flight and nothing
+# otherwise. Stacks are exported in the collapsed format that flamegraph.pl,
+# speedscope and inferno read.
+#
+# Async handlers are matched by the request's own middleware frame, which is
+# on the event loop thread's stack only while that request is running; sync
+# handlers run in a worker thread and are matched by their endpoint function.
+# Work a request hands to a separate task (e.g. a streaming voice turn) is
+# not included.
+
+OTHER_STACKS = "[other stacks]"
+
+class _Profiled:
+    __slots__ = ("scope", "frame", "loop_thread")
+
+    def __init__(self, scope: dict, frame, loop_thread: int):
+        self.scope = scope
+        self.frame = frame
+        self.loop_thread = loop_thread
+
+    @property
+    def endpoint(self) -> str:
+        route = self.scope.get("route")
+        return f"{self.scope.get('method', 'GET')} {route.path if route else 'unmatched'}"
+
+    @property
+    def endpoint_code(self):
+        endpoint = self.scope.get("endpoint")
+        return getattr(endpoint, "__code__", None)
+
+def _label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+# Sampling more often than this costs more than it shows
+MIN_INTERVAL = 0.001
+
+class SamplingProfiler:
+    """Samples the stacks of selected requests and aggregates them per route
+
+    The share of requests sampled is capped at `max_sample_rate`
+    (PROFILE_MAX_SAMPLE_RATE) and the interval kept at MIN_INTERVAL or more,
+    whatever the environment or configure() ask for.
+    """
+
+    def __init__(
+        self,
+        sample_rate: Optional[float] = None,
+        interval: Optional[float] = None,
+        max_stacks: Optional[int] = None,
+        max_sample_rate: Optional[float] = None,
+    ):
+        self.max_sample_rate = float(os.getenv("PROFILE_MAX_SAMPLE_RATE", "0.1")) if max_sample_rate is None else max_sample_rate
+        self.sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0")) if sample_rate is None else sample_rate
+        self.sample_rate = min(self.sample_rate, self.max_sample_rate)
+        self.interval = max(interval or float(os.getenv("PROFILE_INTERVAL", "0.005")), MIN_INTERVAL)
+        # Distinct stacks kept per route; rarer ones beyond this are lumped together
+        self.max_stacks = max_stacks or int(os.getenv("PROFILE_MAX_STACKS", "2000"))
+        self.lead_id: Optional[str] = os.getenv("PROFILE_LEAD_ID") or None
+        self.call_sid: Optional[str] = os.getenv("PROFILE_CALL_SID") or None
+
+        self._active: Dict[int, _Profiled] = {}
+        self._stacks: Dict[str, Counter] = {}
+        self._requests: Counter = Counter()
+        self._labels: Dict[object, str] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.samples = 0
+        self.sampling_seconds = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or bool(self.lead_id or self.call_sid)
+
+    def configure(
+        self,
+        sample_rate: Optional[float] = None,
+        lead_id: Optional[str] = None,
+        call_sid: Optional[str] = None,
+        interval: Optional[float] = None,
+    ):
+        """Change what is profiled; an empty lead_id or call_sid clears that target
+
+        Raises ValueError for a sample rate above max_sample_rate or an
+        interval below MIN_INTERVAL.
+        """
+        if sample_rate is not None and sample_rate > self.max_sample_rate:
+            raise ValueError(f"sample_rate is limited to {self.max_sample_rate}")
+        if interval is not None and interval < MIN_INTERVAL:
+            raise ValueError(f"interval must be at least {MIN_INTERVAL} seconds")
+        if sample_rate is not None:
+            self.sample_rate = sample_rate
+        if lead_id is not None:
+            self.lead_id = lead_id or None
+        if call_sid is not None:
+            self.call_sid = call_sid or None
+        if interval is not None:
+            self.interval = interval
+
+    def is_target(self, params: Dict[str, str], path: str) -> bool:
+        """True if a request's parameters name the targeted lead or call"""
+        if self.lead_id and (params.get("lead_id") == self.lead_id or self.lead_id in path.split("/")):
+            return True
+        return bool(self.call_sid and params.get("CallSid") == self.call_sid)
+
+    def begin(self, scope: dict, frame) -> _Profiled:
+        """Start sampling a request whose handler runs under `frame`"""
+        profiled = _Profiled(scope, frame, threading.get_ident())
+        with self._lock:
+            self._active[id(frame)] = profiled
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return profiled
+
+    def end(self, profiled: _Profiled):
+        with self._lock:
+            self._active.pop(id(profiled.frame), None)
+            self._requests[profiled.endpoint] += 1
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active.values())
+                if not active:
+                    self._wake.clear()
+                    continue
+            started = time.perf_counter()
+            try:
+                self._sample(active)
+            except Exception as e:
+                logger.error(f"Profiler sample failed: {e}")
+            self.sampling_seconds += time.perf_counter() - started
+
+    def _sample(self, active: List[_Profiled]):
+        by_frame = {id(profiled.frame): profiled for profiled in active}
+        loop_threads = {profiled.loop_thread for profiled in active}
+        # Sync handlers run in worker threads, where only their function identifies them
+        by_code = {}
+        for profiled in active:
+            code = profiled.endpoint_code
+            if code is not None:
+                by_code.setdefault(code, profiled)
+
+        recorded = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == threading.get_ident():
+                continue
+            in_loop = thread_id in loop_threads
+            # Walk outwards from the running function until a profiled
+            # request's frame turns up; the stack is kept from there inwards
+            codes = []
+            while frame is not None:
+                codes.append(frame.f_code)
+                profiled = by_frame.get(id(frame)) if in_loop else by_code.get(frame.f_code)
+                if profiled is not None:
+                    recorded.append((profiled.endpoint, codes))
+                    break
+                frame = frame.f_back
+
+        with self._lock:
+            self.samples += 1
+            for endpoint, codes in recorded:
+                labels = []
+                for code in reversed(codes):
+                    label = self._labels.get(code)
+                    if label is None:
+                        label = self._labels[code] = _label(code)
+                    labels.append(label)
+                stack = ";".join(labels)
+                stacks = self._stacks.setdefault(endpoint, Counter())
+                if stack not in stacks and len(stacks) >= self.max_stacks:
+                    stack = OTHER_STACKS
+                stacks[stack] += 1
+
+    def collapsed(self, endpoint: Optional[str] = None) -> str:
+        """Stacks as "frame;frame;frame count" lines, one route or all (rooted at the route)"""
+        with self._lock:
+            if endpoint is not None:
+                stacks = self._stacks.get(endpoint, Counter())
+                lines = [f"{stack} {count}" for stack, count in stacks.most_common()]
+            else:
+                lines = [
+                    f"{name};{stack} {count}"
+                    for name, stacks in self._stacks.items()
+                    for stack, count in stacks.most_common()
+                ]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self._requests.clear()
+            self.samples = 0
+            self.sampling_seconds = 0.0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            endpoints = {
+                endpoint: {"requests": self._requests.get(endpoint, 0), "samples": sum(self._stacks.get(endpoint, {}).values())}
+                for endpoint in set(self._requests) | set(self._stacks)
+            }
+            return {
+                "enabled": self.enabled,
+                "sample_rate": self.sample_rate,
+                "max_sample_rate": self.max_sample_rate,
+                "lead_id": self.lead_id,
+                "call_sid": self.call_sid,
+                "interval": self.interval,
+                "in_flight": len(self._active),
+                "samples": self.samples,
+                "sampling_seconds": round(self.sampling_seconds, 3),
+                "endpoints": endpoints,
+            }
+
+class ProfilingMiddleware:
+    """ASGI middleware choosing which requests the SamplingProfiler follows
+
+    Requests are picked at random at the profiler's sample rate, or because
+    their query string, path or form body names the targeted lead or
+    CallSid. Paths starting with one of `skip_prefixes` are never profiled.
+    """
+
+    def __init__(self, app, profiler: SamplingProfiler, skip_prefixes=("/admin/", "/metrics")):
+        self.app = app
+        self.profiler = profiler
+        self.skip_prefixes = skip_prefixes
+
+    async def __call__(self, scope, receive, send):
+        profiler = self.profiler
+        if scope["type"] != "http" or not profiler.enabled or scope["path"].startswith(self.skip_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        selected = profiler.sample_rate > 0 and random.random() < profiler.sample_rate
+        if not selected:
+            selected, receive = await self._is_target(scope, receive)
+        if not selected:
+            await self.app(scope, receive, send)
+            return
+
+        profiled = profiler.begin(scope, sys._getframe())
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.end(profiled)
+
+    async def _is_target(self, scope, receive):
+        profiler = self.profiler
+        if not (profiler.lead_id or profiler.call_sid):
+            return False, receive
+        params = {key: values[0] for key, values in parse_qs(scope.get("query_string", b"").decode()).items()}
+        if profiler.is_target(params, scope["path"]):
+            return True, receive
+        content_type = dict(scope.get("headers", [])).get(b"content-type", b"")
+        if not content_type.startswith(b"application/x-www-form-urlencoded"):
+            return False, receive
+
+        # Twilio webhooks carry CallSid and lead_id in a small form body: read
+        # it here and hand the same messages on to the app
+        messages = []
+        body = b""
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        form = {key: values[0] for key, values in parse_qs(body.decode(errors="replace")).items()}
+
+        async def replay():
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        return profiler.is_target({**params, **form}, scope["path"]), replay
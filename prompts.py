@@ -0,0 +1,170 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from catalog_index import BM25Index
+
+# The system prompt is split so everything shared by all leads comes first:
+# the instructions and product catalog form a byte-stable prefix (which lets
+# provider-side prompt prefix caching hit), and only the short customer
+# section at the end differs per lead.
+#
+# Catalogs larger than CATALOG_INLINE_MAX products are not inlined. The prefix
+# then holds only the instructions, and the top CATALOG_TOP_K products for the
+# lead's inquiry and the current turn go in a system message placed just
+# before the customer's message, after the (stable) history.
+SYSTEM_PROMPT_INSTRUCTIONS = """You are an expert inbound sales representative for Formlabs, a leading 3D printer manufacturer.
+
+Your role is to:
+1. Understand customer needs through discovery questions
+2. Provide relevant product recommendations based on customer painpoints and needs
+3. Handle objections professionally
+4. Be conversational and helpful
+5. Remember previous parts of the conversation
+
+Respond naturally as if you're having a real phone conversation.
+So your answers don't need to be too long and keep it conversational.
+Try to guide the conversation to the next step in the sales process which is either:
+1. Sending a quote based on the conversation
+2. Scheduling a follow up call with the customer at a later date
+"""
+
+CATALOG_SECTION = """
+Available Products:
+{catalog}
+"""
+
+RETRIEVAL_SECTION = """
+Products relevant to the conversation are listed in a system message before each customer message.
+"""
+
+RELEVANT_PRODUCTS = "Relevant Products:\n{catalog}"
+
+CUSTOMER_SECTION = """
+Customer Information:
+- Name: {name}
+- Company: {company}
+- Inquiry: {inquiry}
+"""
+
+def render_product(category: str, product: Dict) -> str:
+    """One compact catalog line: name, category, price and description"""
+    return f"- {product['name']} ({category}, ${product['price']:,}): {product['description']}"
+
+def render_catalog(products: Dict[str, Dict]) -> str:
+    """Render products as stable text, ordered by key so output never reshuffles"""
+    return "\n".join(render_product(key, products[key]) for key in sorted(products))
+
+def product_document(category: str, product: Dict) -> str:
+    """Searchable text for one product; the name counts twice"""
+    keywords = " ".join(product.get("keywords", ()))
+    return f"{product['name']} {product['name']} {category} {product['description']} {keywords}"
+
+class ProductCatalog:
+    """Product knowledge plus its rendered prompt text, versioned for cache invalidation"""
+
+    def __init__(self, products: Dict[str, Dict], inline_max: Optional[int] = None, top_k: Optional[int] = None):
+        self.inline_max = inline_max if inline_max is not None else int(os.getenv("CATALOG_INLINE_MAX", "20"))
+        self.top_k = top_k or int(os.getenv("CATALOG_TOP_K", "5"))
+        self._listeners: List[Callable[["ProductCatalog"], None]] = []
+        self._lock = threading.Lock()
+        self.version = 0
+        self.update(products)
+
+    def update(self, products: Dict[str, Dict]):
+        """Replace the catalog and notify everything caching derived text"""
+        index = BM25Index()
+        for key, product in products.items():
+            index.add(key, product_document(key, product))
+        with self._lock:
+            self.products = dict(products)
+            self.index = index
+        self._changed()
+
+    def upsert_product(self, key: str, product: Dict):
+        """Add or replace one product without rebuilding the index"""
+        with self._lock:
+            self.products[key] = product
+            self.index.add(key, product_document(key, product))
+        self._changed()
+
+    def remove_product(self, key: str):
+        with self._lock:
+            self.products.pop(key, None)
+            self.index.remove(key)
+        self._changed()
+
+    @property
+    def inline(self) -> bool:
+        """Whether the whole catalog fits in the shared prompt prefix"""
+        return len(self.products) <= self.inline_max
+
+    def _changed(self):
+        if self.inline:
+            self.rendered = render_catalog(self.products)
+            self.prompt_prefix = SYSTEM_PROMPT_INSTRUCTIONS + CATALOG_SECTION.format(catalog=self.rendered)
+        else:
+            self.rendered = ""
+            self.prompt_prefix = SYSTEM_PROMPT_INSTRUCTIONS + RETRIEVAL_SECTION
+        self.version += 1
+        for listener in self._listeners:
+            listener(self)
+
+    def relevant_products(self, query: str, k: Optional[int] = None) -> str:
+        """Prompt text for the top-k products matching the query, or "" when the catalog is inlined"""
+        if self.inline:
+            return ""
+        k = k or self.top_k
+        keys = [key for key, _ in self.index.search(query, k)]
+        if len(keys) < k:
+            # Pad weak matches with the first products so the model always has some options
+            keys += [key for key in sorted(self.products) if key not in keys][:k - len(keys)]
+        return RELEVANT_PRODUCTS.format(catalog="\n".join(render_product(key, self.products[key]) for key in keys))
+
+    def on_change(self, listener: Callable[["ProductCatalog"], None]):
+        self._listeners.append(listener)
+
+class PromptCache:
+    """Memoizes the rendered system prompt per lead
+
+    Entries are keyed by lead id and remember the catalog version and lead
+    fields they were rendered from, so a changed lead or catalog is simply a
+    cache miss.
+    """
+
+    def __init__(self, catalog: ProductCatalog, max_entries: int = 10000):
+        self.catalog = catalog
+        self.max_entries = max_entries
+        self._prompts: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        catalog.on_change(lambda _: self.clear())
+
+    def system_prompt(self, lead: Dict[str, str]) -> str:
+        fingerprint = (self.catalog.version, lead["name"], lead["company"], lead["inquiry"])
+        with self._lock:
+            cached = self._prompts.get(lead["id"])
+            if cached is not None and cached[0] == fingerprint:
+                self._prompts.move_to_end(lead["id"])
+                return cached[1]
+
+        prompt = self.catalog.prompt_prefix + CUSTOMER_SECTION.format(
+            name=lead["name"],
+            company=lead["company"],
+            inquiry=lead["inquiry"],
+        )
+        with self._lock:
+            self._prompts[lead["id"]] = (fingerprint, prompt)
+            self._prompts.move_to_end(lead["id"])
+            while len(self._prompts) > self.max_entries:
+                self._prompts.popitem(last=False)
+        return prompt
+
+    def invalidate(self, lead_id: str):
+        """Forget one lead's prompt"""
+        with self._lock:
+            self._prompts.pop(lead_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._prompts.clear()
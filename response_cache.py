@@ -0,0 +1,83 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+FILLER_WORDS = {"um", "uh", "erm", "hmm", "so", "hey", "hi", "hello", "please", "okay", "ok", "well"}
+NON_WORD = re.compile(r"[^\w\s]")
+
+def normalize_question(text: str) -> str:
+    """Lower-case, drop punctuation and filler words, collapse whitespace"""
+    words = NON_WORD.sub(" ", text.lower()).split()
+    return " ".join(word for word in words if word not in FILLER_WORDS)
+
+def is_personalized(response: str, customer_name: str) -> bool:
+    """True if a reply addresses the customer by name, so it must not be shared"""
+    first_name = customer_name.split()[0] if customer_name.strip() else ""
+    return bool(first_name) and re.search(rf"\b{re.escape(first_name)}\b", response, re.IGNORECASE) is not None
+
+def lead_context(lead: Dict[str, str], prompt_version: int) -> str:
+    """Fingerprint of what a lead's system prompt says about them, besides their name
+
+    Replies are written for a lead's company and inquiry under one version
+    of the prompt, so they are only shared between leads with the same ones.
+    """
+    text = f"{prompt_version}\0{normalize_question(lead['company'])}\0{normalize_question(lead['inquiry'])}"
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+class ResponseCache:
+    """TTL + LRU cache of AI replies to repeated caller questions
+
+    Keys combine the normalized question with the agent's previous reply and
+    the lead's context (lead_context), so the same question only hits when
+    it is asked at the same point in the conversation (e.g. as an opener,
+    or after the same pitch) by a lead with the same company and inquiry.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries or int(os.getenv("RESPONSE_CACHE_SIZE", "5000"))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str, str], Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(question: str, previous_reply: str = "", context: str = "") -> Tuple[str, str, str]:
+        return normalize_question(question), normalize_question(previous_reply), context
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Tuple[str, str, str], response: str):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
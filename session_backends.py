@@ -0,0 +1,609 @@
+import json
+import os
+import random
+import socket
+from collections import OrderedDict
+from contextlib import contextmanager
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import logging
+
+from transcript import Transcript
+
+logger = logging.getLogger(__name__)
+
+# Shared session state for ConversationStore. Conversations are append-only
+# message logs keyed by lead id; call state is a small versioned record keyed
+# by CallSid. Writes use optimistic concurrency: an append names the log
+# length it expects and a record update names the version it read, and the
+# backend rejects the write with VersionConflict if another worker got there
+# first. Callers reload and retry, so concurrent turns are never lost.
+# Records expire SESSION_RECORD_TTL seconds after their last write, so state
+# for finished calls does not pile up.
+
+class VersionConflict(Exception):
+    """Another writer changed the session since it was read"""
+
+class SessionBackend:
+    """Interface implemented by the memory, SQLite and Redis backends"""
+
+    # False when only this process can see the data, so cached state never goes stale
+    shared = True
+
+    def append(self, lead_id: str, expected_length: int, messages: List[Tuple[str, str]]):
+        """Append (role, content) messages if the log still has expected_length entries"""
+        raise NotImplementedError
+
+    def length(self, lead_id: str) -> int:
+        raise NotImplementedError
+
+    def messages(self, lead_id: str, start: int = 0, end: Optional[int] = None) -> List[Dict[str, str]]:
+        """Messages with start <= seq < end"""
+        raise NotImplementedError
+
+    def tail(self, lead_id: str, count: int) -> Tuple[int, List[Dict[str, str]]]:
+        """Last `count` messages, with the sequence number of the first one"""
+        raise NotImplementedError
+
+    def summary(self, lead_id: str) -> Tuple[str, int]:
+        raise NotImplementedError
+
+    def set_summary(self, lead_id: str, summary: str, upto_seq: int):
+        """Store a summary unless one covering more of the conversation already exists"""
+        raise NotImplementedError
+
+    def delete(self, lead_id: str) -> bool:
+        """Delete a lead's messages and summary"""
+        raise NotImplementedError
+
+    def lead_ids(self, batch_size: int = 500) -> Iterator[str]:
+        """Every lead with stored messages, fetched batch_size at a time"""
+        raise NotImplementedError
+
+    def get_record(self, key: str) -> Tuple[Optional[Dict], int]:
+        """A versioned record and its version (0 if it does not exist)"""
+        raise NotImplementedError
+
+    def put_record(self, key: str, value: Dict, expected_version: int) -> int:
+        """Write a record if its version is still expected_version; returns the new version"""
+        raise NotImplementedError
+
+    def update_record(self, key: str, update: Callable[[Optional[Dict]], Dict], attempts: int = 10) -> Dict:
+        """Read-modify-write a record, retrying on conflicting writes
+
+        Retries back off for a few random milliseconds so writers racing for
+        the same record stop colliding; call it from a worker thread.
+        """
+        for attempt in range(attempts):
+            value, version = self.get_record(key)
+            updated = update(value)
+            try:
+                self.put_record(key, updated, version)
+                return updated
+            except VersionConflict:
+                time.sleep(random.uniform(0, 0.002 * (attempt + 1)))
+        raise VersionConflict(f"Gave up updating {key} after {attempts} conflicting writes")
+
+    def close(self):
+        pass
+
+class MemoryBackend(SessionBackend):
+    """Process-local backend for a single worker and for tests
+
+    Nothing here outlives the process, so memory is bounded like the hot
+    sessions in ConversationStore: each log keeps its last `max_messages`
+    messages (sequence numbers carry on past the dropped ones) and the
+    least recently written conversations are dropped whole once the logs
+    exceed `max_bytes` (SESSION_MAX_BYTES).
+    """
+
+    shared = False
+
+    def __init__(
+        self,
+        record_ttl: Optional[float] = None,
+        max_messages: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ):
+        self.record_ttl = record_ttl or float(os.getenv("SESSION_RECORD_TTL", "86400"))
+        self.max_messages = max_messages or int(os.getenv("SESSION_MEMORY_MAX_MESSAGES", "1000"))
+        self.max_bytes = max_bytes or int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+        # Compact logs, least recently written first: a dict per message would
+        # cost more than most contents
+        self._logs: "OrderedDict[str, Transcript]" = OrderedDict()
+        # Sequence number of each log's first kept message
+        self._first: Dict[str, int] = {}
+        self._bytes = 0
+        self._summaries: Dict[str, Tuple[str, int]] = {}
+        self._records: Dict[str, Tuple[Dict, int, float]] = {}
+        self._pruned_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _length(self, lead_id: str) -> int:
+        return self._first.get(lead_id, 0) + len(self._logs.get(lead_id, ()))
+
+    def _forget(self, lead_id: str) -> bool:
+        log = self._logs.pop(lead_id, None)
+        self._first.pop(lead_id, None)
+        self._summaries.pop(lead_id, None)
+        if log is not None:
+            self._bytes -= log.nbytes
+        return bool(log)
+
+    def append(self, lead_id, expected_length, messages):
+        with self._lock:
+            length = self._length(lead_id)
+            if length != expected_length:
+                raise VersionConflict(f"{lead_id} has {length} messages, expected {expected_length}")
+            log = self._logs.get(lead_id)
+            if log is None:
+                log = self._logs[lead_id] = Transcript()
+            self._logs.move_to_end(lead_id)
+            before = log.nbytes
+            log.extend(messages)
+            if len(log) > self.max_messages:
+                dropped = len(log) - self.max_messages
+                log.drop_first(dropped)
+                self._first[lead_id] = self._first.get(lead_id, 0) + dropped
+            self._bytes += log.nbytes - before
+            while self._bytes > self.max_bytes and len(self._logs) > 1:
+                self._forget(next(iter(self._logs)))
+
+    def length(self, lead_id):
+        with self._lock:
+            return self._length(lead_id)
+
+    def messages(self, lead_id, start=0, end=None):
+        with self._lock:
+            log = self._logs.get(lead_id)
+            if log is None:
+                return []
+            first = self._first.get(lead_id, 0)
+            return log.messages(max(start - first, 0), None if end is None else max(end - first, 0))
+
+    def tail(self, lead_id, count):
+        with self._lock:
+            log = self._logs.get(lead_id)
+            messages = log.messages(-count) if log is not None and count else []
+            return self._length(lead_id) - len(messages), messages
+
+    def summary(self, lead_id):
+        with self._lock:
+            return self._summaries.get(lead_id, ("", 0))
+
+    def set_summary(self, lead_id, summary, upto_seq):
+        with self._lock:
+            if upto_seq > self._summaries.get(lead_id, ("", 0))[1]:
+                self._summaries[lead_id] = (summary, upto_seq)
+
+    def delete(self, lead_id):
+        with self._lock:
+            return self._forget(lead_id)
+
+    def lead_ids(self, batch_size=500):
+        with self._lock:
+            lead_ids = [lead_id for lead_id, log in self._logs.items() if log]
+        yield from sorted(lead_ids)
+
+    def _record(self, key: str, now: float) -> Tuple[Optional[Dict], int]:
+        value, version, expires = self._records.get(key, (None, 0, 0.0))
+        return (value, version) if expires > now else (None, 0)
+
+    def get_record(self, key):
+        with self._lock:
+            value, version = self._record(key, time.monotonic())
+            return (dict(value) if value is not None else None), version
+
+    def put_record(self, key, value, expected_version):
+        now = time.monotonic()
+        with self._lock:
+            version = self._record(key, now)[1]
+            if version != expected_version:
+                raise VersionConflict(f"{key} is at version {version}, expected {expected_version}")
+            self._records[key] = (dict(value), version + 1, now + self.record_ttl)
+            if now - self._pruned_at > 60:
+                self._pruned_at = now
+                for stale in [key for key, (_, _, expires) in self._records.items() if expires <= now]:
+                    del self._records[stale]
+            return version + 1
+
+class SQLiteBackend(SessionBackend):
+    """SQLite in WAL mode, shared by every worker process on one host"""
+
+    def __init__(self, path: Optional[str] = None, record_ttl: Optional[float] = None):
+        self.path = path or os.getenv("SESSION_DB_PATH", "data/sessions.db")
+        self.record_ttl = record_ttl or float(os.getenv("SESSION_RECORD_TTL", "86400"))
+        self._pruned_at = time.monotonic()
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                lead_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (lead_id, seq)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS summaries (
+                lead_id TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                upto_seq INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS records (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS records_updated_at ON records (updated_at)")
+        self._conn.commit()
+
+    def append(self, lead_id, expected_length, messages):
+        now = time.time()
+        rows = [(lead_id, expected_length + offset, role, content, now) for offset, (role, content) in enumerate(messages)]
+        with self._lock:
+            # The (lead_id, seq) primary key is the version check: if another
+            # worker already wrote seq expected_length, the insert fails
+            try:
+                self._conn.executemany("INSERT INTO messages VALUES (?, ?, ?, ?, ?)", rows)
+                if expected_length and not self._conn.execute(
+                    "SELECT 1 FROM messages WHERE lead_id = ? AND seq = ?", (lead_id, expected_length - 1)
+                ).fetchone():
+                    raise VersionConflict(f"{lead_id} has fewer than {expected_length} messages")
+                self._conn.commit()
+            except sqlite3.IntegrityError:
+                self._conn.rollback()
+                raise VersionConflict(f"{lead_id} already has a message at seq {expected_length}")
+            except VersionConflict:
+                self._conn.rollback()
+                raise
+
+    def length(self, lead_id):
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(seq) FROM messages WHERE lead_id = ?", (lead_id,)).fetchone()
+        return row[0] + 1 if row[0] is not None else 0
+
+    def messages(self, lead_id, start=0, end=None):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content FROM messages WHERE lead_id = ? AND seq >= ? AND seq < ? ORDER BY seq",
+                (lead_id, start, end if end is not None else 2**62),
+            ).fetchall()
+        return [{"role": role, "content": content} for role, content in rows]
+
+    def tail(self, lead_id, count):
+        if not count:
+            return self.length(lead_id), []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq, role, content FROM messages WHERE lead_id = ? ORDER BY seq DESC LIMIT ?",
+                (lead_id, count),
+            ).fetchall()
+        if not rows:
+            return 0, []
+        return rows[-1][0], [{"role": role, "content": content} for _, role, content in reversed(rows)]
+
+    def summary(self, lead_id):
+        with self._lock:
+            row = self._conn.execute("SELECT summary, upto_seq FROM summaries WHERE lead_id = ?", (lead_id,)).fetchone()
+        return (row[0], row[1]) if row else ("", 0)
+
+    def set_summary(self, lead_id, summary, upto_seq):
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO summaries VALUES (?, ?, ?)
+                ON CONFLICT (lead_id) DO UPDATE SET summary = excluded.summary, upto_seq = excluded.upto_seq
+                WHERE excluded.upto_seq > summaries.upto_seq
+                """,
+                (lead_id, summary, upto_seq),
+            )
+            self._conn.commit()
+
+    def delete(self, lead_id):
+        with self._lock:
+            deleted = self._conn.execute("DELETE FROM messages WHERE lead_id = ?", (lead_id,)).rowcount
+            self._conn.execute("DELETE FROM summaries WHERE lead_id = ?", (lead_id,))
+            self._conn.commit()
+        return deleted > 0
+
+    def lead_ids(self, batch_size=500):
+        # Keyset pagination over the primary key, so the lock is only held per batch
+        after = ""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT DISTINCT lead_id FROM messages WHERE lead_id > ? ORDER BY lead_id LIMIT ?",
+                    (after, batch_size),
+                ).fetchall()
+            for (lead_id,) in rows:
+                yield lead_id
+            if len(rows) < batch_size:
+                return
+            after = rows[-1][0]
+
+    def get_record(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, version FROM records WHERE key = ? AND updated_at > ?", (key, time.time() - self.record_ttl)
+            ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else (None, 0)
+
+    def put_record(self, key, value, expected_version):
+        now = time.time()
+        with self._lock:
+            if expected_version == 0:
+                # An expired row reads as missing, so it is replaced as if it were
+                updated = self._conn.execute(
+                    """
+                    INSERT INTO records VALUES (?, ?, 1, ?)
+                    ON CONFLICT (key) DO UPDATE SET value = excluded.value, version = 1, updated_at = excluded.updated_at
+                    WHERE records.updated_at <= ?
+                    """,
+                    (key, json.dumps(value), now, now - self.record_ttl),
+                ).rowcount
+            else:
+                updated = self._conn.execute(
+                    "UPDATE records SET value = ?, version = version + 1, updated_at = ? WHERE key = ? AND version = ?",
+                    (json.dumps(value), now, key, expected_version),
+                ).rowcount
+            if time.monotonic() - self._pruned_at > 60:
+                self._pruned_at = time.monotonic()
+                self._conn.execute("DELETE FROM records WHERE updated_at <= ?", (now - self.record_ttl,))
+            self._conn.commit()
+        if not updated:
+            raise VersionConflict(f"{key} changed since version {expected_version}")
+        return expected_version + 1
+
+    def close(self):
+        self._conn.close()
+
+class _RespConnection:
+    """Minimal Redis protocol (RESP2) client over one socket"""
+
+    def __init__(self, host: str, port: int, db: int = 0, password: Optional[str] = None, timeout: float = 5.0):
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self._sock.makefile("rb")
+        if password:
+            self.command("AUTH", password)
+        if db:
+            self.command("SELECT", db)
+
+    def command(self, *args):
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._sock.sendall(b"".join(parts))
+        return self._read()
+
+    def _read(self):
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RuntimeError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._reader.read(length + 2)[:-2]
+            return data.decode()
+        if kind == b"*":
+            length = int(payload)
+            return None if length < 0 else [self._read() for _ in range(length)]
+        raise RuntimeError(f"Unexpected Redis reply: {line!r}")
+
+    def close(self):
+        try:
+            self._reader.close()
+            self._sock.close()
+        except OSError:
+            pass
+
+class RedisBackend(SessionBackend):
+    """Redis (or any server speaking its protocol), shared across hosts
+
+    Message logs are Redis lists, summaries and call records JSON strings.
+    Compare-and-set uses WATCH/MULTI/EXEC, so EXEC returning nil means
+    another worker wrote first. Each call borrows a connection from a small
+    pool (SESSION_REDIS_POOL_SIZE); one that fails mid-command is closed
+    rather than returned, since it may still hold an unread reply or an open
+    MULTI, and a fresh one is opened on demand.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        prefix: Optional[str] = None,
+        pool_size: Optional[int] = None,
+        record_ttl: Optional[float] = None,
+    ):
+        self.url = url or os.getenv("SESSION_REDIS_URL", "redis://127.0.0.1:6379/0")
+        self.prefix = prefix if prefix is not None else os.getenv("SESSION_REDIS_PREFIX", "sales_agent:")
+        self.pool_size = pool_size or int(os.getenv("SESSION_REDIS_POOL_SIZE", "8"))
+        self.record_ttl = record_ttl or float(os.getenv("SESSION_RECORD_TTL", "86400"))
+        parsed = urlparse(self.url)
+        self._address = (parsed.hostname or "127.0.0.1", parsed.port or 6379)
+        self._db = int(parsed.path.lstrip("/") or 0)
+        self._password = parsed.password
+        self._idle: List[_RespConnection] = []
+        self._idle_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        # Connect now so a wrong URL fails at startup, not on the first call
+        with self._connection() as conn:
+            conn.command("PING")
+
+    @contextmanager
+    def _connection(self) -> Iterator[_RespConnection]:
+        self._slots.acquire()
+        conn = None
+        try:
+            with self._idle_lock:
+                if self._idle:
+                    conn = self._idle.pop()
+            if conn is None:
+                conn = _RespConnection(*self._address, db=self._db, password=self._password)
+            yield conn
+        except VersionConflict:
+            # Raised after UNWATCH or a nil EXEC: the connection is clean
+            raise
+        except BaseException:
+            if conn is not None:
+                conn.close()
+                conn = None
+            raise
+        finally:
+            if conn is not None:
+                with self._idle_lock:
+                    self._idle.append(conn)
+            self._slots.release()
+
+    def _log_key(self, lead_id: str) -> str:
+        return f"{self.prefix}messages:{lead_id}"
+
+    def _summary_key(self, lead_id: str) -> str:
+        return f"{self.prefix}summary:{lead_id}"
+
+    def _record_key(self, key: str) -> str:
+        return f"{self.prefix}record:{key}"
+
+    def append(self, lead_id, expected_length, messages):
+        key = self._log_key(lead_id)
+        encoded = [json.dumps({"role": role, "content": content}) for role, content in messages]
+        with self._connection() as conn:
+            conn.command("WATCH", key)
+            length = conn.command("LLEN", key)
+            if length != expected_length:
+                conn.command("UNWATCH")
+                raise VersionConflict(f"{lead_id} has {length} messages, expected {expected_length}")
+            conn.command("MULTI")
+            conn.command("RPUSH", key, *encoded)
+            if conn.command("EXEC") is None:
+                raise VersionConflict(f"{lead_id} changed while appending")
+
+    def length(self, lead_id):
+        with self._connection() as conn:
+            return conn.command("LLEN", self._log_key(lead_id))
+
+    def messages(self, lead_id, start=0, end=None):
+        with self._connection() as conn:
+            rows = conn.command("LRANGE", self._log_key(lead_id), start, -1 if end is None else end - 1)
+        return [json.loads(row) for row in rows]
+
+    def tail(self, lead_id, count):
+        if not count:
+            return self.length(lead_id), []
+        key = self._log_key(lead_id)
+        with self._connection() as conn:
+            conn.command("MULTI")
+            conn.command("LLEN", key)
+            conn.command("LRANGE", key, -count, -1)
+            length, rows = conn.command("EXEC")
+        return length - len(rows), [json.loads(row) for row in rows]
+
+    def summary(self, lead_id):
+        with self._connection() as conn:
+            raw = conn.command("GET", self._summary_key(lead_id))
+        if raw is None:
+            return "", 0
+        stored = json.loads(raw)
+        return stored["summary"], stored["upto_seq"]
+
+    def set_summary(self, lead_id, summary, upto_seq):
+        key = self._summary_key(lead_id)
+        with self._connection() as conn:
+            # A concurrent writer can only have stored a summary covering at
+            # least as much, so a conflicting write is dropped, not retried
+            conn.command("WATCH", key)
+            raw = conn.command("GET", key)
+            if raw is not None and json.loads(raw)["upto_seq"] >= upto_seq:
+                conn.command("UNWATCH")
+                return
+            conn.command("MULTI")
+            conn.command("SET", key, json.dumps({"summary": summary, "upto_seq": upto_seq}))
+            conn.command("EXEC")
+
+    def delete(self, lead_id):
+        with self._connection() as conn:
+            deleted = conn.command("DEL", self._log_key(lead_id))
+            conn.command("DEL", self._summary_key(lead_id))
+        return deleted > 0
+
+    def lead_ids(self, batch_size=500):
+        # SCAN walks the keyspace incrementally; it may repeat a key, so dedupe
+        pattern = self._log_key("*")
+        skip = len(self._log_key(""))
+        seen = set()
+        cursor = "0"
+        while True:
+            with self._connection() as conn:
+                cursor, keys = conn.command("SCAN", cursor, "MATCH", pattern, "COUNT", batch_size)
+            for key in keys:
+                if key not in seen:
+                    seen.add(key)
+                    yield key[skip:]
+            if cursor == "0":
+                return
+
+    def get_record(self, key):
+        with self._connection() as conn:
+            raw = conn.command("GET", self._record_key(key))
+        if raw is None:
+            return None, 0
+        stored = json.loads(raw)
+        return stored["value"], stored["version"]
+
+    def put_record(self, key, value, expected_version):
+        record_key = self._record_key(key)
+        with self._connection() as conn:
+            conn.command("WATCH", record_key)
+            raw = conn.command("GET", record_key)
+            version = json.loads(raw)["version"] if raw is not None else 0
+            if version != expected_version:
+                conn.command("UNWATCH")
+                raise VersionConflict(f"{key} is at version {version}, expected {expected_version}")
+            conn.command("MULTI")
+            conn.command(
+                "SET", record_key, json.dumps({"value": value, "version": version + 1}),
+                "EX", max(int(self.record_ttl), 1),
+            )
+            if conn.command("EXEC") is None:
+                raise VersionConflict(f"{key} changed while writing")
+        return version + 1
+
+    def close(self):
+        with self._idle_lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+BACKENDS = {"memory": MemoryBackend, "sqlite": SQLiteBackend, "redis": RedisBackend}
+
+def create_backend(name: Optional[str] = None) -> SessionBackend:
+    """Backend named by SESSION_BACKEND (memory, sqlite or redis); defaults to sqlite"""
+    name = (name or os.getenv("SESSION_BACKEND", "sqlite")).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown session backend {name!r}; expected one of {', '.join(BACKENDS)}")
+    logger.info(f"Using {name} session backend")
+    return BACKENDS[name]()
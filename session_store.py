@@ -0,0 +1,295 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import logging
+
+from session_backends import SessionBackend, VersionConflict, create_backend
+from transcript import Transcript
+
+logger = logging.getLogger(__name__)
+
+class _Session:
+    """Hot, in-memory tail of one lead's conversation"""
+
+    __slots__ = ("recent", "total", "last_access", "summary", "summary_upto")
+
+    def __init__(self):
+        self.recent = Transcript()
+        self.total = 0
+        self.last_access = time.monotonic()
+        # Rolling summary of messages with seq < summary_upto
+        self.summary = ""
+        self.summary_upto = 0
+
+    @property
+    def size(self) -> int:
+        return self.recent.nbytes
+
+    def push(self, role: str, content: str, ring_size: int):
+        self.recent.append(role, content)
+        if len(self.recent) > ring_size:
+            self.recent.drop_first()
+        self.total += 1
+
+class ConversationStore:
+    """Bounded conversation memory over a pluggable session backend
+
+    Each lead keeps only its most recent messages in a ring buffer, stored
+    compactly (see transcript.Transcript) and zlib-compressed once idle for
+    compress_after seconds. Leads are evicted least-recently-used first once
+    idle past the TTL or when the memory budget is exceeded. Every message is also appended to the backend
+    (SQLite by default, see session_backends), so evicted (cold) conversations
+    reload their tail on the next turn and the full transcript stays
+    available.
+
+    With a backend shared between workers, a hot session is checked against
+    the backend's log length before use and reloaded if another worker has
+    appended to it. Appends are optimistic: if another worker (or thread)
+    wrote first, the session is reloaded and the append retried after its
+    messages. The lock only guards the in-memory sessions; backend calls
+    are made without it, so one slow round trip does not stall other leads.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[SessionBackend] = None,
+        ring_size: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+        compress_after: Optional[float] = None,
+    ):
+        self.backend = backend or create_backend()
+        self.ring_size = ring_size or int(os.getenv("SESSION_RING_SIZE", "20"))
+        self.max_bytes = max_bytes or int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+        self.ttl_seconds = ttl_seconds or float(os.getenv("SESSION_TTL_SECONDS", "1800"))
+        # 0 keeps idle sessions uncompressed
+        self.compress_after = (
+            float(os.getenv("SESSION_COMPRESS_AFTER", "300")) if compress_after is None else compress_after
+        )
+        self.append_attempts = 10
+        self.conflicts = 0
+
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        # Uncompressed sessions, least recently used first
+        self._warm: "OrderedDict[str, None]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _load(self, lead_id: str) -> _Session:
+        session = _Session()
+        first_seq, messages = self.backend.tail(lead_id, self.ring_size)
+        session.recent.extend((message["role"], message["content"]) for message in messages)
+        session.total = first_seq + len(messages)
+        session.summary, session.summary_upto = self.backend.summary(lead_id)
+        return session
+
+    def _drop(self, lead_id: str):
+        session = self._sessions.pop(lead_id, None)
+        self._warm.pop(lead_id, None)
+        if session is not None:
+            self._size -= session.size
+
+    def _touch(self, lead_id: str, session: _Session):
+        """Mark a hot session as just used, decompressing it; call with the lock held"""
+        self._sessions.move_to_end(lead_id)
+        if session.recent.compressed:
+            before = session.size
+            session.recent.decompress()
+            self._size += session.size - before
+        self._warm[lead_id] = None
+        self._warm.move_to_end(lead_id)
+        session.last_access = time.monotonic()
+
+    def _session(self, lead_id: str) -> _Session:
+        """Return the hot session for a lead, reloading it if evicted or stale
+
+        Call without the lock held: it is taken only around the in-memory
+        state, not the backend reads.
+        """
+        backend_length = self.backend.length(lead_id) if self.backend.shared else None
+        with self._lock:
+            session = self._sessions.get(lead_id)
+            if session is not None and backend_length is not None and backend_length != session.total:
+                # Another worker has added to this conversation
+                self._drop(lead_id)
+                session = None
+            if session is not None:
+                self._touch(lead_id, session)
+                return session
+        loaded = self._load(lead_id)
+        with self._lock:
+            session = self._sessions.get(lead_id)
+            if session is None or session.total < loaded.total:
+                # Keep whichever of this load and a concurrent one saw more messages
+                self._drop(lead_id)
+                session = self._sessions[lead_id] = loaded
+                self._size += session.size
+            self._touch(lead_id, session)
+            return session
+
+    def _evict(self):
+        """Compress idle sessions, drop expired ones, then the least recently used while over budget"""
+        now = time.monotonic()
+        expired_before = now - self.ttl_seconds
+        if self.compress_after:
+            idle_before = now - self.compress_after
+            while self._warm:
+                lead_id = next(iter(self._warm))
+                session = self._sessions[lead_id]
+                if session.last_access >= idle_before:
+                    break
+                del self._warm[lead_id]
+                if session.last_access >= expired_before:
+                    before = session.size
+                    session.recent.compress()
+                    self._size += session.size - before
+        while self._sessions:
+            lead_id, session = next(iter(self._sessions.items()))
+            if session.last_access >= expired_before and self._size <= self.max_bytes:
+                break
+            del self._sessions[lead_id]
+            self._warm.pop(lead_id, None)
+            self._size -= session.size
+
+    def append(self, lead_id: str, role: str, content: str):
+        """Add one message to a lead's conversation"""
+        self.extend(lead_id, [(role, content)])
+
+    def extend(self, lead_id: str, messages: List[tuple]):
+        """Add several (role, content) messages in one backend write"""
+        for _ in range(self.append_attempts):
+            session = self._session(lead_id)
+            with self._lock:
+                expected = session.total
+            try:
+                self.backend.append(lead_id, expected, messages)
+            except VersionConflict:
+                with self._lock:
+                    self.conflicts += 1
+                    if self._sessions.get(lead_id) is session:
+                        self._drop(lead_id)
+                continue
+            with self._lock:
+                if self._sessions.get(lead_id) is session and session.total == expected:
+                    before = session.size
+                    for role, content in messages:
+                        session.push(role, content, self.ring_size)
+                    self._size += session.size - before
+                else:
+                    # Replaced or changed meanwhile: reload on next use
+                    self._drop(lead_id)
+                self._evict()
+            return
+        raise VersionConflict(f"Could not append to {lead_id} after {self.append_attempts} attempts")
+
+    def recent(self, lead_id: str, count: int) -> List[Dict[str, str]]:
+        """Last `count` messages (at most the ring size) for building prompts"""
+        session = self._session(lead_id)
+        with self._lock:
+            messages = session.recent.messages(-count) if count else []
+            self._evict()
+        return messages
+
+    def tail(self, lead_id: str) -> Tuple[int, List[Dict[str, str]]]:
+        """In-memory messages for a lead, with the sequence number of the first one"""
+        session = self._session(lead_id)
+        with self._lock:
+            messages = session.recent.messages()
+            first_seq = session.total - len(messages)
+            self._evict()
+        return first_seq, messages
+
+    def summary(self, lead_id: str) -> Tuple[str, int]:
+        """Rolling summary text and the sequence number it covers up to"""
+        if self.backend.shared:
+            # Another worker may have summarized since this session was loaded
+            return self.backend.summary(lead_id)
+        session = self._session(lead_id)
+        with self._lock:
+            return session.summary, session.summary_upto
+
+    def set_summary(self, lead_id: str, summary: str, upto_seq: int):
+        self.backend.set_summary(lead_id, summary, upto_seq)
+        with self._lock:
+            session = self._sessions.get(lead_id)
+            if session is not None and upto_seq > session.summary_upto:
+                session.summary, session.summary_upto = summary, upto_seq
+
+    def messages_between(self, lead_id: str, start_seq: int, end_seq: int) -> List[Dict[str, str]]:
+        """Messages with start_seq <= seq < end_seq, read from the backend"""
+        return self.backend.messages(lead_id, start_seq, end_seq)
+
+    def length(self, lead_id: str) -> int:
+        """Total number of messages ever stored for a lead"""
+        with self._lock:
+            session = self._sessions.get(lead_id)
+            if session is not None and not self.backend.shared:
+                return session.total
+        return self.backend.length(lead_id)
+
+    def exists(self, lead_id: str) -> bool:
+        return self.length(lead_id) > 0
+
+    def transcript(self, lead_id: str) -> List[Dict[str, str]]:
+        """Full conversation, read from the backend"""
+        return self.backend.messages(lead_id)
+
+    def version(self, lead_id: str) -> Tuple[int, str]:
+        """Message count and a fingerprint that changes whenever the conversation does
+
+        Costs one read of the last message, so pollers can be told nothing
+        changed without loading the transcript. The fingerprint covers the
+        last message too, so a conversation cleared and rebuilt to the same
+        length does not look unchanged.
+        """
+        first_seq, messages = self.backend.tail(lead_id, 1)
+        if not messages:
+            return 0, "0"
+        length = first_seq + 1
+        last = messages[0]
+        digest = hashlib.sha1(f"{last['role']}:{last['content']}".encode()).hexdigest()[:12]
+        return length, f"{length}-{digest}"
+
+    def export(self, batch_size: int = 500) -> Iterator[Tuple[str, int, Dict[str, str]]]:
+        """(lead_id, seq, message) for every stored message, read batch_size at a time"""
+        for lead_id in self.backend.lead_ids(batch_size):
+            start = 0
+            while True:
+                messages = self.backend.messages(lead_id, start, start + batch_size)
+                for offset, message in enumerate(messages):
+                    yield lead_id, start + offset, message
+                if len(messages) < batch_size:
+                    break
+                start += batch_size
+
+    def clear(self, lead_id: str) -> bool:
+        """Delete a lead's conversation from memory and the backend"""
+        deleted = self.backend.delete(lead_id)
+        with self._lock:
+            self._drop(lead_id)
+        return deleted
+
+    def call(self, call_sid: str) -> Optional[Dict]:
+        """State stored for a Twilio call, shared by every worker"""
+        return self.backend.get_record(f"call:{call_sid}")[0]
+
+    def update_call(self, call_sid: str, update: Callable[[Optional[Dict]], Dict]) -> Dict:
+        """Read-modify-write a call's state, retrying if another worker wrote first"""
+        return self.backend.update_record(f"call:{call_sid}", update)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hot_sessions": len(self._sessions),
+                "compressed_sessions": len(self._sessions) - len(self._warm),
+                "hot_bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "append_conflicts": self.conflicts,
+            }
+
+    def close(self):
+        self.backend.close()
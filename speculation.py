@@ -0,0 +1,178 @@
+import asyncio
+import os
+import re
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from metrics import SPECULATIONS
+
+# Transcripts compare equal if they only differ in case, punctuation or spacing
+# ("what printers do you have" vs the final "What printers do you have?")
+NON_WORD = re.compile(r"[^\w']+")
+
+def normalize_transcript(text: str) -> str:
+    return " ".join(NON_WORD.sub(" ", text.lower()).split())
+
+def _forget_result(task: asyncio.Task):
+    # Abandoned drafts are never awaited; read their outcome so asyncio does not warn
+    if not task.cancelled():
+        task.exception()
+
+class StreamedDraft:
+    """A drafted reply's sentences, readable while the draft is still generating"""
+
+    def __init__(self, sentences: AsyncIterator[str]):
+        self.sentences: List[str] = []
+        self._changed = asyncio.Event()
+        self.task = asyncio.create_task(self._fill(sentences))
+        self.task.add_done_callback(_forget_result)
+
+    async def _fill(self, sentences: AsyncIterator[str]):
+        try:
+            async for sentence in sentences:
+                self.sentences.append(sentence)
+                self._changed.set()
+        finally:
+            self._changed.set()
+
+    async def replay(self) -> AsyncIterator[str]:
+        """Every sentence, from the first, as soon as it is generated; raises if the draft failed"""
+        index = 0
+        while True:
+            if index < len(self.sentences):
+                yield self.sentences[index]
+                index += 1
+            elif self.task.done():
+                self.task.result()
+                return
+            else:
+                self._changed.clear()
+                await self._changed.wait()
+
+    async def text(self) -> str:
+        """The whole reply, once generated"""
+        await self.task
+        return " ".join(self.sentences)
+
+class _Draft:
+    __slots__ = ("text", "stream", "timer", "drafts", "started_at")
+
+    def __init__(self, text: str, drafts: int):
+        self.text = text
+        self.stream: Optional[StreamedDraft] = None
+        self.timer: Optional[asyncio.TimerHandle] = None
+        # Drafts generated so far for this turn, this one included once started
+        self.drafts = drafts
+        self.started_at = time.monotonic()
+
+    def cancel(self):
+        if self.timer is not None:
+            self.timer.cancel()
+        if self.stream is not None:
+            self.stream.task.cancel()
+
+class SpeculativeReplies:
+    """Replies drafted from Twilio partial speech results while the caller is still talking
+
+    offer() is called with every interim transcript. Once the transcript has
+    at least `min_words` words and has not changed for `debounce` seconds
+    (the caller paused, most likely at the end of their question) a reply
+    is generated from it, streamed sentence by sentence into a StreamedDraft.
+    A transcript that changes again cancels the draft, and at most
+    `max_drafts` are generated per turn. When the final SpeechResult
+    arrives, claim() hands over the draft if it was made from the same
+    words, so the turn only waits for what is left of that generation (and
+    a streaming turn can speak the sentences already drafted); otherwise
+    the draft is cancelled. Drafts live in the worker
+    that received the partial results, so with several workers a final
+    result landing elsewhere simply generates as usual.
+    """
+
+    def __init__(
+        self,
+        min_words: Optional[int] = None,
+        debounce: Optional[float] = None,
+        max_drafts: Optional[int] = None,
+        ttl_seconds: float = 60,
+    ):
+        self.min_words = min_words or int(os.getenv("SPECULATION_MIN_WORDS", "3"))
+        self.debounce = float(os.getenv("SPECULATION_DEBOUNCE", "0.4")) if debounce is None else debounce
+        self.max_drafts = max_drafts or int(os.getenv("SPECULATION_MAX_DRAFTS", "3"))
+        self.ttl_seconds = ttl_seconds
+        self.counts = {outcome: 0 for outcome in ("started", "superseded", "hit", "miss", "failed", "expired")}
+        self._drafts: Dict[str, _Draft] = {}
+
+    def _count(self, outcome: str):
+        self.counts[outcome] += 1
+        SPECULATIONS.inc(outcome)
+
+    def offer(self, turn_key: str, text: str, draft: Callable[[str], AsyncIterator[str]]) -> bool:
+        """Schedule a draft reply (a stream of sentences) to an interim transcript; False if not worth one"""
+        self._prune()
+        normalized = normalize_transcript(text)
+        current = self._drafts.get(turn_key)
+        if current is not None and current.text == normalized:
+            return False
+        if len(normalized.split()) < self.min_words:
+            return False
+        drafts = 0
+        if current is not None:
+            if current.drafts >= self.max_drafts:
+                return False
+            current.cancel()
+            if current.stream is not None:
+                self._count("superseded")
+            drafts = current.drafts
+        entry = self._drafts[turn_key] = _Draft(normalized, drafts)
+        entry.timer = asyncio.get_running_loop().call_later(self.debounce, self._start, turn_key, entry, text, draft)
+        return True
+
+    def _start(self, turn_key: str, entry: _Draft, text: str, draft: Callable[[str], AsyncIterator[str]]):
+        if self._drafts.get(turn_key) is not entry:
+            return
+        entry.timer = None
+        entry.stream = StreamedDraft(draft(text))
+        entry.drafts += 1
+        entry.started_at = time.monotonic()
+        self._count("started")
+
+    def claim(self, turn_key: str, final_text: str) -> Optional[StreamedDraft]:
+        """The draft for a turn if it answers the final transcript, else None"""
+        current = self._drafts.pop(turn_key, None)
+        if current is None:
+            return None
+        if current.stream is None:
+            # The final transcript beat the debounce: nothing was generated yet
+            current.cancel()
+            return None
+        if current.text != normalize_transcript(final_text):
+            current.cancel()
+            self._count("miss")
+            return None
+        task = current.stream.task
+        if task.done() and (task.cancelled() or task.exception()):
+            self._count("failed")
+            return None
+        self._count("hit")
+        return current.stream
+
+    def discard(self, turn_key: str):
+        current = self._drafts.pop(turn_key, None)
+        if current is not None:
+            current.cancel()
+            if current.stream is not None:
+                self._count("expired")
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        for turn_key, current in list(self._drafts.items()):
+            if current.started_at < cutoff:
+                self.discard(turn_key)
+
+    def stats(self) -> Dict:
+        decided = self.counts["hit"] + self.counts["miss"] + self.counts["failed"]
+        return {
+            **self.counts,
+            "pending": len(self._drafts),
+            "hit_rate": round(self.counts["hit"] / decided, 3) if decided else None,
+        }
@@ -0,0 +1,29 @@
+import time
+from typing import List, Tuple
+
+# Cold start accounting: main.py marks the end of each phase of bringing the
+# app up (imports, opening stores, building caches), and the report is
+# printed on startup and exported on /metrics.
+
+class StartupTimer:
+    """Wall time spent in each startup phase, in the order they ran"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases: List[Tuple[str, float]] = []
+
+    def mark(self, phase: str):
+        """End the current phase, naming it"""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    @property
+    def total(self) -> float:
+        return self._last - self.started
+
+    def report(self) -> str:
+        lines = [f"   {phase:<18} {seconds * 1000:>8.1f} ms" for phase, seconds in self.phases]
+        lines.append(f"   {'total':<18} {self.total * 1000:>8.1f} ms")
+        return "\n".join(lines)
@@ -0,0 +1,103 @@
+import asyncio
+import html
+import os
+import re
+import sys
+
+import pytest
+
+from fake_llm_server import FakeLLMServer
+
+# Regression check for Gather turn numbering, run in-process against the
+# stand-in LLM: after a /voice/continue for an unknown turn asks the caller
+# to say that again, their next answer must get a turn number of its own
+# instead of replaying the stored response to an earlier one. Also checks a
+# /voice/continue that reaches a worker which never saw the turn.
+
+LLM_PORT = 8782
+GATHER_ACTION = re.compile(r'<Gather action="([^"]+)"')
+
+def gather_action(twiml: str) -> str:
+    match = GATHER_ACTION.search(twiml)
+    assert match, f"No <Gather> in {twiml}"
+    return html.unescape(match.group(1))
+
+async def say_again_sequence():
+    import httpx
+    import main as app_module
+
+    call = {"CallSid": "CAturns0001", "From": "+15550000001", "Direction": "inbound"}
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+        greeting = await client.post("/voice/gather", data={**call, "lead_id": "lead_001"})
+        first = gather_action(greeting.text)
+        assert first.endswith("turn=1")
+
+        answer = await client.post(first, data={**call, "SpeechResult": "What printers do you sell?"})
+        second = gather_action(answer.text)
+        assert second.endswith("turn=2")
+
+        # The caller is sent back to listening without answering turn 2
+        say_again = await client.post("/voice/continue?turn=expired&part=1", data=call)
+        third = gather_action(say_again.text)
+        assert "turn=" in third and third not in (first, second), f"Say-again gather posts to {third}"
+
+        actions = [first, second, third]
+        for question in ("How much does the Form 4 cost?", "Can you send me a quote?"):
+            answer = await client.post(actions[-1], data={**call, "SpeechResult": question})
+            history = app_module.conversation_store.recent("lead_001", 20)
+            assert any(message["content"] == question for message in history), f"{question!r} never reached the history"
+            action = gather_action(answer.text)
+            assert action not in actions, f"Gather reuses {action}"
+            actions.append(action)
+    await app_module.llm_client.aclose()
+
+async def continue_on_other_worker(call_sid):
+    import httpx
+    import main as app_module
+
+    call = {"CallSid": call_sid, "From": "+15550000002", "Direction": "inbound"} if call_sid else {}
+    transport = httpx.ASGITransport(app=app_module.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+        hold = await client.post(
+            "/voice/process-speech",
+            data={**call, "lead_id": "lead_001", "SpeechResult": f"Do you ship to Canada? ({call_sid})"},
+        )
+        continue_url = html.unescape(re.search(r"<Redirect[^>]*>([^<]+)</Redirect>", hold.text).group(1))
+        # The redirect reaches a worker that has no record of the turn
+        app_module.voice_turns.turns.clear()
+        answer = await client.post(continue_url, data=call)
+        assert "<Gather" in answer.text and "again" not in answer.text, f"Continue elsewhere gave {answer.text}"
+    await app_module.llm_client.aclose()
+
+@pytest.fixture
+def app_env(monkeypatch, tmp_path):
+    """Stand-in LLM and scratch databases, with the environment restored afterwards"""
+    with FakeLLMServer(port=LLM_PORT, latency=0.01, token_interval=0.0) as llm:
+        monkeypatch.setenv("OPENAI_API_KEY", "test")
+        monkeypatch.setenv("OPENAI_BASE_URL", llm.base_url)
+        monkeypatch.setenv("LEADS_DB_PATH", str(tmp_path / "leads.db"))
+        monkeypatch.setenv("SESSION_DB_PATH", str(tmp_path / "sessions.db"))
+        monkeypatch.setenv("ANALYSIS_DB_PATH", str(tmp_path / "analysis.db"))
+        monkeypatch.setenv("LLM_HEDGE_PERCENTILE", "0")
+        monkeypatch.syspath_prepend(os.path.dirname(os.path.abspath(__file__)))
+        yield monkeypatch
+
+def test_say_again_gets_a_new_turn_number(app_env):
+    """A say-again gather after an unknown turn must not replay an earlier turn's answer"""
+    asyncio.run(say_again_sequence())
+
+def test_continue_on_another_worker_speaks_the_published_reply(app_env):
+    """A continue for a turn generated elsewhere speaks the reply published in the call state"""
+    import main as app_module
+    app_env.setattr(app_module, "VOICE_HOLD_AFTER", 0)
+    asyncio.run(continue_on_other_worker("CAturns0002"))
+
+def test_continue_without_call_state_speaks_the_recorded_reply(app_env):
+    """Without a CallSid the continue falls back to the reply recorded in the history"""
+    import main as app_module
+    app_env.setattr(app_module, "VOICE_HOLD_AFTER", 0)
+    asyncio.run(continue_on_other_worker(None))
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
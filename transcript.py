@@ -0,0 +1,96 @@
+import json
+import sys
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Compact storage for chat messages. A {"role": ..., "content": ...} dict per
+# message costs about 200 bytes before the content itself; here a transcript
+# is one list of content strings plus one byte per message for the role, and
+# role names are shared strings rebuilt into message dicts only when a
+# prompt or API response needs them.
+
+ROLES: List[str] = ["system", "user", "assistant"]
+_ROLE_CODES: Dict[str, int] = {role: code for code, role in enumerate(ROLES)}
+
+# Memory estimate per stored message on top of its text: the str header
+# (49 bytes for ASCII), the list slot and the role byte
+MESSAGE_OVERHEAD_BYTES = 64
+# Transcript object, its list and bytearray
+TRANSCRIPT_OVERHEAD_BYTES = 200
+
+def role_code(role: str) -> int:
+    """One-byte code for a role name, registering (and interning) new roles"""
+    code = _ROLE_CODES.get(role)
+    if code is None:
+        if len(ROLES) >= 256:
+            raise ValueError(f"Too many distinct message roles to add {role!r}")
+        code = _ROLE_CODES[role] = len(ROLES)
+        ROLES.append(sys.intern(role))
+    return code
+
+class Transcript:
+    """Array-backed list of chat messages, optionally zlib-compressed while idle
+
+    Behaves like a list of (role, content) messages: append/extend at the
+    end, drop from the start, and messages() to get OpenAI-style dicts.
+    compress() packs the contents into one zlib blob; any later access
+    unpacks it again transparently, or decompress() does so up front.
+    """
+
+    __slots__ = ("_roles", "_contents", "_packed", "_chars")
+
+    def __init__(self, messages: Iterable[Tuple[str, str]] = ()):
+        self._roles = bytearray()
+        self._contents: List[str] = []
+        self._packed: Optional[bytes] = None
+        self._chars = 0
+        self.extend(messages)
+
+    def __len__(self) -> int:
+        return len(self._roles)
+
+    @property
+    def compressed(self) -> bool:
+        return self._packed is not None
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held, content included"""
+        if self._packed is not None:
+            return TRANSCRIPT_OVERHEAD_BYTES + len(self._packed) + len(self._roles)
+        return TRANSCRIPT_OVERHEAD_BYTES + self._chars + MESSAGE_OVERHEAD_BYTES * len(self._roles)
+
+    def append(self, role: str, content: str):
+        self.decompress()
+        self._roles.append(role_code(role))
+        self._contents.append(content)
+        self._chars += len(content)
+
+    def extend(self, messages: Iterable[Tuple[str, str]]):
+        for role, content in messages:
+            self.append(role, content)
+
+    def drop_first(self, count: int = 1):
+        """Forget the oldest `count` messages"""
+        self.decompress()
+        self._chars -= sum(len(content) for content in self._contents[:count])
+        del self._roles[:count]
+        del self._contents[:count]
+
+    def messages(self, start: int = 0, end: Optional[int] = None) -> List[Dict[str, str]]:
+        """Messages start..end as new {"role", "content"} dicts"""
+        self.decompress()
+        return [
+            {"role": ROLES[code], "content": content}
+            for code, content in zip(self._roles[start:end], self._contents[start:end])
+        ]
+
+    def compress(self):
+        if self._packed is None and self._contents:
+            self._packed = zlib.compress(json.dumps(self._contents, ensure_ascii=False).encode())
+            self._contents = []
+
+    def decompress(self):
+        if self._packed is not None:
+            self._contents = json.loads(zlib.decompress(self._packed))
+            self._packed = None
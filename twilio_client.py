@@ -1,34 +1,75 @@
 import os
-from twilio.rest import Client
-from twilio.twiml.voice_response import VoiceResponse
+import threading
+import time
+from typing import Optional
+
+import twiml
+from metrics import record_stage, timed
 
 import logging
 
 logger = logging.getLogger(__name__)
 
 class TwilioVoiceClient:
-    def __init__(self):
+    def __init__(self, partial_results: bool = False, phrase_audio=None):
         self.account_sid = os.getenv("TWILIO_ACCOUNT_SID")
         self.auth_token = os.getenv("TWILIO_AUTH_TOKEN")
         self.phone_number = os.getenv("TWILIO_PHONE_NUMBER")
         
-        if self.account_sid and self.auth_token:
-            self.client = Client(self.account_sid, self.auth_token)
-            logger.info("Twilio client initialized successfully")
-        else:
-            self.client = None
+        self._client = None
+        self._client_lock = threading.Lock()
+        if not (self.account_sid and self.auth_token):
             logger.warning("Twilio credentials not found. Voice calls will be disabled.")
+        
+        # Ask Twilio for interim transcripts on every <Gather> (speculative replies)
+        self.partial_results = partial_results
+        
+        # Optional PhraseAudioCache: fixed and per-lead phrases are played
+        # from pre-synthesized audio once rendered, instead of <Say>
+        self.phrase_audio = phrase_audio
+        
+        # Rendered TwiML for constant messages and per-lead greetings; also
+        # used from the campaign dialer's threads, hence the lock
+        self.response_cache_size = 10000
+        self._response_cache = {}
+        self._response_cache_lock = threading.Lock()
     
-    def make_call(self, to_number: str, webhook_url: str):
-        """Initiate an outbound call"""
+    @property
+    def client(self):
+        """Twilio REST client, created on first use (None without credentials)
+
+        twilio.rest is only imported here, since TwiML rendering never needs it
+        and importing it slows down cold starts.
+        """
+        if self._client is None and self.account_sid and self.auth_token:
+            with self._client_lock:
+                if self._client is None:
+                    started = time.perf_counter()
+                    from twilio.rest import Client
+
+                    client = Client(self.account_sid, self.auth_token)
+                    # Point the REST client at another host, e.g. a local fake Twilio
+                    api_base_url = os.getenv("TWILIO_API_BASE_URL")
+                    if api_base_url:
+                        client.api.base_url = api_base_url
+                    self._client = client
+                    record_stage("twilio_client_init", time.perf_counter() - started)
+                    logger.info("Twilio client initialized successfully")
+        return self._client
+    
+    @timed("twilio_call")
+    def make_call(self, to_number: str, webhook_url: str, status_callback: Optional[str] = None):
+        """Initiate an outbound call, optionally asking Twilio to report when it ends"""
         if not self.client:
             raise Exception("Twilio client not configured")
         
+        options = {"status_callback": status_callback} if status_callback else {}
         try:
             call = self.client.calls.create(
                 url=webhook_url,  # Webhook URL for TwiML instructions
                 to=to_number,
-                from_=self.phone_number
+                from_=self.phone_number,
+                **options
             )
             logger.info(f"Call initiated: {call.sid}")
             return call.sid
@@ -36,54 +77,68 @@ class TwilioVoiceClient:
             logger.error(f"Error making call: {e}")
             raise
     
+    @timed("twiml")
     def create_voice_response(self, message: str, gather_input: bool = True):
         """Create TwiML response for voice call"""
-        response = VoiceResponse()
-        
         if gather_input:
-            # Use Gather to collect speech input
-            gather = response.gather(
-                input='speech',
-                timeout=10,
-                speech_timeout='auto',
-                action='/voice/process-speech',
-                method='POST'
-            )
-            # Use neural voice for more natural sound with SSML support
-            gather.say(message, voice='Google.en-US-Neural2-F', language='en-US')
-            
-            # If no input is received, repeat the message
-            response.say("I didn't catch that. Let me repeat.", voice='Google.en-US-Neural2-F', language='en-US')
-            response.redirect('/voice/gather')
-        else:
-            # Just say the message without gathering input
-            response.say(message, voice='Google.en-US-Neural2-F', language='en-US')
-            response.hangup()
-        
-        return str(response)
+            # Gather speech; if no input is received, repeat the message
+            return twiml.GATHER_AND_REPEAT.render(message)
+        # Just say the message without gathering input
+        return twiml.SAY_AND_HANGUP.render(message)
     
-    def create_gather_response(self, message: str):
-        """Create a response that gathers speech input"""
-        response = VoiceResponse()
-        gather = response.gather(
-            input='speech',
-            timeout=10,
-            speech_timeout='auto',
-            action='/voice/process-speech',
-            method='POST'
-        )
-        # Use neural voice for more natural sound
-        gather.say(message, voice='Google.en-US-Neural2-F', language='en-US')
-        
-        # If no input is received, end the call
-        response.say("Thank you for your time. Goodbye!", voice='Google.en-US-Neural2-F', language='en-US')
-        response.hangup()
-        
-        return str(response)
+    @timed("twiml")
+    def create_gather_response(self, message: str, action: str = twiml.GATHER_ACTION):
+        """Create a response that gathers speech input and posts it to action"""
+        return self._gather_template(action).render(message)
+    
+    @timed("twiml")
+    def create_say_redirect_response(self, message: str, redirect_url: str):
+        """Speak part of a reply, then fetch the next part from redirect_url"""
+        return twiml.say_and_redirect(message, redirect_url)
     
+    @timed("twiml")
+    def create_hold_response(self, redirect_url: str, message: str = ""):
+        """Say a short filler (if any), pause, then fetch redirect_url"""
+        # Fillers are a handful of fixed phrases
+        return twiml.pause_and_redirect(redirect_url, message, audio_url=self._audio_url(message) if message else None)
+    
+    @timed("twiml")
     def create_final_response(self, message: str):
         """Create final response before ending call"""
-        response = VoiceResponse()
-        response.say(message, voice='Google.en-US-Neural2-F', language='en-US')
-        response.hangup()
-        return str(response) 
\ No newline at end of file
+        return twiml.SAY_AND_HANGUP.render(message)
+    
+    @timed("twiml")
+    def cached_gather_response(self, message: str, action: str = twiml.GATHER_ACTION):
+        """Gather response for a fixed or per-lead message, rendered only once"""
+        audio_url = self._audio_url(message)
+        template = self._gather_template(action, audio=audio_url is not None)
+        return self._cached_response(("gather", action, template), message, template, audio_url)
+    
+    def _gather_template(self, action: str, audio: bool = False) -> twiml.TwimlTemplate:
+        # If no input is received, end the call
+        partial_callback = twiml.partial_result_action(action) if self.partial_results else ""
+        no_input = twiml.goodbye_no_input(self._audio_url(twiml.GOODBYE)) if self.phrase_audio else twiml.GOODBYE_NO_INPUT
+        return twiml.gather_template(action, no_input, partial_callback, audio)
+    
+    @timed("twiml")
+    def cached_final_response(self, message: str):
+        """Final response for a fixed message, rendered only once"""
+        audio_url = self._audio_url(message)
+        template = twiml.SAY_AND_HANGUP if audio_url is None else twiml.PLAY_AND_HANGUP
+        return self._cached_response("final", message, template, audio_url)
+    
+    def _audio_url(self, message: str) -> Optional[str]:
+        return self.phrase_audio.url(message) if self.phrase_audio else None
+    
+    def _cached_response(self, kind, message: str, template: twiml.TwimlTemplate, audio_url: Optional[str] = None):
+        # Keyed by the audio too, so a phrase switches to <Play> once rendered
+        key = (kind, message, audio_url)
+        with self._response_cache_lock:
+            response = self._response_cache.get(key)
+        if response is None:
+            response = template.render(audio_url or message)
+            with self._response_cache_lock:
+                if len(self._response_cache) >= self.response_cache_size:
+                    self._response_cache.pop(next(iter(self._response_cache)), None)
+                self._response_cache[key] = response
+        return response
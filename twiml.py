@@ -0,0 +1,102 @@
+from functools import lru_cache
+from typing import Optional
+from xml.sax.saxutils import escape
+
+# Precompiled TwiML skeletons. Output is byte-identical to what
+# twilio.twiml.voice_response.VoiceResponse serializes, but each response is
+# built by escaping the dynamic text and splicing it between fixed strings
+# instead of constructing and serializing an element tree on every webhook.
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>'
+VOICE = "Google.en-US-Neural2-F"
+SAY_OPEN = f'<Say language="en-US" voice="{VOICE}">'
+SAY_CLOSE = "</Say>"
+PLAY_OPEN = "<Play>"
+PLAY_CLOSE = "</Play>"
+
+# Attribute values additionally escape quotes and whitespace control characters
+ATTRIBUTE_ENTITIES = {'"': "&quot;", "\n": "&#10;", "\r": "&#13;", "\t": "&#09;"}
+
+def escape_attribute(value: str) -> str:
+    return escape(value, ATTRIBUTE_ENTITIES)
+
+def say(text: str) -> str:
+    return SAY_OPEN + escape(text) + SAY_CLOSE
+
+def play(url: str) -> str:
+    return PLAY_OPEN + escape(url) + PLAY_CLOSE
+
+def speak(text: str, audio_url: Optional[str] = None) -> str:
+    """<Play> pre-synthesized audio of text if there is any, else <Say> it"""
+    return play(audio_url) if audio_url else say(text)
+
+class TwimlTemplate:
+    """A response skeleton with a single slot for spoken text (or an audio URL)"""
+
+    __slots__ = ("prefix", "suffix")
+
+    def __init__(self, prefix: str, suffix: str):
+        self.prefix = prefix
+        self.suffix = suffix
+
+    def render(self, text: str) -> str:
+        return self.prefix + escape(text) + self.suffix
+
+GATHER_ACTION = "/voice/process-speech"
+PARTIAL_RESULT_ACTION = "/voice/partial-speech"
+
+def partial_result_action(action: str) -> str:
+    """partialResultCallback URL for a Gather action, keeping its query (turn number)"""
+    if action.startswith(GATHER_ACTION):
+        return PARTIAL_RESULT_ACTION + action[len(GATHER_ACTION):]
+    return PARTIAL_RESULT_ACTION
+
+@lru_cache(maxsize=256)
+def gather_template(
+    action: str = GATHER_ACTION, no_input: str = "", partial_callback: str = "", audio: bool = False
+) -> TwimlTemplate:
+    """<Gather> around a <Say>, followed by fixed TwiML for when nothing is heard
+
+    With a partial_callback Twilio also posts interim transcripts there
+    while the caller is still speaking. With audio the slot is the URL of
+    a recording to <Play> instead.
+    """
+    partial = (
+        f'partialResultCallback="{escape_attribute(partial_callback)}" partialResultCallbackMethod="POST" '
+        if partial_callback else ""
+    )
+    return TwimlTemplate(
+        XML_HEADER
+        + f'<Response><Gather action="{escape_attribute(action)}" input="speech" method="POST" '
+        + partial
+        + 'speechTimeout="auto" timeout="10">'
+        + (PLAY_OPEN if audio else SAY_OPEN),
+        (PLAY_CLOSE if audio else SAY_CLOSE) + "</Gather>" + no_input + "</Response>",
+    )
+
+GOODBYE = "Thank you for your time. Goodbye!"
+
+def goodbye_no_input(audio_url: Optional[str] = None) -> str:
+    return speak(GOODBYE, audio_url) + "<Hangup />"
+
+GOODBYE_NO_INPUT = goodbye_no_input()
+REPEAT_NO_INPUT = say("I didn't catch that. Let me repeat.") + "<Redirect>/voice/gather</Redirect>"
+
+GATHER = gather_template(no_input=GOODBYE_NO_INPUT)
+GATHER_AND_REPEAT = gather_template(no_input=REPEAT_NO_INPUT)
+SAY_AND_HANGUP = TwimlTemplate(XML_HEADER + "<Response>" + SAY_OPEN, SAY_CLOSE + "<Hangup /></Response>")
+PLAY_AND_HANGUP = TwimlTemplate(XML_HEADER + "<Response>" + PLAY_OPEN, PLAY_CLOSE + "<Hangup /></Response>")
+
+def say_and_redirect(text: str, redirect_url: str) -> str:
+    return (
+        XML_HEADER + "<Response>" + say(text)
+        + '<Redirect method="POST">' + escape(redirect_url) + "</Redirect></Response>"
+    )
+
+def pause_and_redirect(redirect_url: str, text: str = "", pause_seconds: int = 1, audio_url: Optional[str] = None) -> str:
+    """Optionally say something, hold the line briefly, then fetch redirect_url"""
+    return (
+        XML_HEADER + "<Response>" + (speak(text, audio_url) if text else "")
+        + f'<Pause length="{pause_seconds}" />'
+        + '<Redirect method="POST">' + escape(redirect_url) + "</Redirect></Response>"
+    )
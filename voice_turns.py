@@ -0,0 +1,150 @@
+import asyncio
+import re
+import time
+import uuid
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A sentence ends at . ! or ? followed by whitespace, unless the word before
+# it is a common abbreviation ("Dr. Smith", "e.g. dental")
+SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+")
+ABBREVIATIONS = {"mr", "mrs", "ms", "dr", "st", "vs", "e.g", "i.e", "etc", "approx"}
+
+def _ends_with_abbreviation(text: str) -> bool:
+    words = text.rstrip(".!? ").rsplit(None, 1)
+    return bool(words) and words[-1].lower() in ABBREVIATIONS
+
+async def iter_sentences(deltas: AsyncIterator[str]) -> AsyncIterator[str]:
+    """Regroup a stream of completion text deltas into whole sentences"""
+    buffer = ""
+    async for delta in deltas:
+        buffer += delta
+        start = 0
+        for match in SENTENCE_END.finditer(buffer):
+            candidate = buffer[start:match.end()]
+            if _ends_with_abbreviation(candidate):
+                continue
+            sentence = candidate.strip()
+            if sentence:
+                yield sentence
+            start = match.end()
+        buffer = buffer[start:]
+    if buffer.strip():
+        yield buffer.strip()
+
+class VoiceTurn:
+    """One in-progress AI reply, consumed sentence by sentence across webhooks"""
+
+    def __init__(self, turn_id: str, lead_id: str, call_sid: Optional[str] = None, start_seq: int = 0):
+        self.turn_id = turn_id
+        self.lead_id = lead_id
+        self.call_sid = call_sid
+        # Conversation length when the turn began: its exchange is recorded at start_seq
+        self.start_seq = start_seq
+        self.created_at = time.monotonic()
+        self.sentences: asyncio.Queue = asyncio.Queue()
+        self.done = asyncio.Event()
+        self.error: Optional[BaseException] = None
+        self.task: Optional[asyncio.Task] = None
+        # Set once the caller has been told to hold while the reply is generated
+        self.handed_off = False
+        # Redirects issued so far, so each /voice/continue URL is unique
+        self.parts = 0
+        # Where the <Gather> after the reply posts the caller's next answer
+        self.gather_action: Optional[str] = None
+        # Every sentence generated, and how many have been handed out to speak
+        self.generated: List[str] = []
+        self.spoken = 0
+
+    async def _run(self, sentences: AsyncIterator[str], on_done: Optional[Callable[["VoiceTurn"], Awaitable[None]]]):
+        try:
+            async for sentence in sentences:
+                self.generated.append(sentence)
+                self.sentences.put_nowait(sentence)
+        except Exception as e:
+            logger.error(f"Voice turn {self.turn_id} failed: {e}")
+            self.error = e
+        finally:
+            self.done.set()
+        if on_done is not None and self.error is None:
+            try:
+                await on_done(self)
+            except Exception as e:
+                logger.error(f"Publishing voice turn {self.turn_id} failed: {e}")
+
+    async def next_sentences(self, timeout: Optional[float] = None) -> List[str]:
+        """Wait up to `timeout` for at least one new sentence, then take everything buffered
+
+        Returns an empty list if nothing arrived in time.
+        """
+        if self.sentences.empty() and not self.done.is_set():
+            waiter = asyncio.ensure_future(self.sentences.get())
+            finished = asyncio.ensure_future(self.done.wait())
+            await asyncio.wait({waiter, finished}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            finished.cancel()
+            if waiter.done():
+                self.sentences.put_nowait(waiter.result())
+            else:
+                waiter.cancel()
+        taken = []
+        while not self.sentences.empty():
+            taken.append(self.sentences.get_nowait())
+        self.spoken += len(taken)
+        return taken
+
+    @property
+    def finished(self) -> bool:
+        """True once generation has ended and every sentence has been taken"""
+        return self.done.is_set() and self.sentences.empty()
+
+class VoiceTurnRegistry:
+    """Tracks streaming turns so redirect webhooks can pick up where they left off
+
+    Turns live in the worker that started them. `on_done` is awaited with
+    each turn that finished generating, e.g. to publish it where the other
+    workers can serve its redirects.
+    """
+
+    def __init__(self, ttl_seconds: float = 300, on_done: Optional[Callable[[VoiceTurn], Awaitable[None]]] = None):
+        self.ttl_seconds = ttl_seconds
+        self.on_done = on_done
+        self.turns: Dict[str, VoiceTurn] = {}
+
+    def start(
+        self,
+        lead_id: str,
+        sentences: AsyncIterator[str],
+        call_sid: Optional[str] = None,
+        start_seq: int = 0,
+        gather_action: Optional[str] = None,
+    ) -> VoiceTurn:
+        """Begin consuming a sentence stream in the background"""
+        self._prune()
+        turn = VoiceTurn(uuid.uuid4().hex, lead_id, call_sid, start_seq)
+        turn.gather_action = gather_action
+        turn.task = asyncio.create_task(turn._run(sentences, self.on_done))
+        self.turns[turn.turn_id] = turn
+        return turn
+
+    def get(self, turn_id: str) -> Optional[VoiceTurn]:
+        return self.turns.get(turn_id)
+
+    def finish(self, turn_id: str):
+        self.turns.pop(turn_id, None)
+
+    def abandon(self, turn_id: str):
+        """Stop generating a turn nobody will hear"""
+        turn = self.turns.pop(turn_id, None)
+        if turn and turn.task and not turn.task.done():
+            turn.task.cancel()
+
+    def _prune(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        for turn_id, turn in list(self.turns.items()):
+            if turn.created_at < cutoff:
+                if turn.task and not turn.task.done():
+                    turn.task.cancel()
+                del self.turns[turn_id]